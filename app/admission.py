@@ -0,0 +1,209 @@
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Lower value is served first
+INTERACTIVE = 0
+BATCH = 1
+
+PRIORITIES = {'interactive': INTERACTIVE, 'batch': BATCH}
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted within its limits"""
+
+    def __init__(self, status_code: int, reason: str, retry_after: float):
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(reason)
+
+
+class Limiter:
+    """Concurrency and rate limit for one key, with a bounded priority queue
+
+    `concurrency` requests may run at once; the rest wait in a heap ordered by
+    priority then arrival. A finishing request hands its slot directly to the
+    next waiter. `rate` (requests/second, 0 = unlimited) is a token bucket
+    holding up to `burst` tokens.
+    """
+
+    def __init__(self, name: str, concurrency: int, rate: float = 0, burst: Optional[int] = None,
+                 max_queue: int = 64):
+        self.name = name
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.max_queue = max_queue
+
+        self.active = 0
+        self.waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.admitted = 0
+        self.rejected = 0
+
+    def _reserve_token(self, now: float) -> float:
+        """Take a token, returning how long to wait before it is actually available"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def _refund_token(self):
+        """Give back the token reserved by a request that was not admitted after all"""
+        if self.rate > 0:
+            self.tokens = min(self.burst, self.tokens + 1)
+
+    async def acquire(self, priority: int, deadline: float, counter: itertools.count):
+        """Wait for a slot until the monotonic deadline"""
+        now = time.monotonic()
+
+        if self.rate > 0:
+            wait = self._reserve_token(now)
+            if now + wait > deadline:
+                self._refund_token()
+                self.rejected += 1
+                raise AdmissionRejected(429, f"Rate limit exceeded for {self.name}", wait)
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+        if self.active < self.concurrency and not self.waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+
+        if len(self.waiters) >= self.max_queue:
+            self._refund_token()
+            self.rejected += 1
+            raise AdmissionRejected(429, f"Too many queued requests for {self.name}", 1)
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (priority, next(counter), future)
+        heapq.heappush(self.waiters, entry)
+        try:
+            await asyncio.wait_for(future, timeout=max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            self._remove(entry)
+            self._refund_token()
+            self.rejected += 1
+            raise AdmissionRejected(503, f"Timed out waiting for {self.name}", 1)
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as the caller went away
+                self.release()
+            else:
+                self._remove(entry)
+            raise
+        self.admitted += 1
+
+    def _remove(self, entry):
+        try:
+            self.waiters.remove(entry)
+            heapq.heapify(self.waiters)
+        except ValueError:
+            pass
+
+    def release(self):
+        """Hand the slot to the next waiter, or free it"""
+        while self.waiters:
+            _, _, future = heapq.heappop(self.waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active = max(0, self.active - 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'active': self.active,
+            'queued': len(self.waiters),
+            'concurrency': self.concurrency,
+            'rate': self.rate,
+            'admitted': self.admitted,
+            'rejected': self.rejected
+        }
+
+
+class AdmissionController:
+    """Per-agent, per-tool and per-upstream-host admission control
+
+    Defaults per scope come from ADMISSION_<SCOPE>_CONCURRENCY and
+    ADMISSION_<SCOPE>_RATE; individual keys can be overridden with
+    ADMISSION_LIMITS, e.g. {"tool:get_weather": {"concurrency": 2, "rate": 5}}.
+    """
+
+    DEFAULT_CONCURRENCY = {'agent': 8, 'tool': 16, 'host': 32}
+
+    def __init__(self):
+        self.max_queue = int(os.getenv('ADMISSION_QUEUE_SIZE', 64))
+        self.queue_timeout = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', 10))
+        self.overrides = self._load_overrides()
+        self.limiters: Dict[str, Limiter] = {}
+        self.counter = itertools.count()
+
+    @staticmethod
+    def _load_overrides() -> Dict[str, Dict[str, Any]]:
+        raw = os.getenv('ADMISSION_LIMITS')
+        if not raw:
+            return {}
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError as e:
+            logger.error(f"Ignoring invalid ADMISSION_LIMITS: {e}")
+            return {}
+
+    def limiter(self, scope: str, key: str) -> Limiter:
+        """Limiter for one scope/key pair, created on first use"""
+        name = f"{scope}:{key}"
+        limiter = self.limiters.get(name)
+        if limiter is None:
+            override = self.overrides.get(name, {})
+            limiter = Limiter(
+                name,
+                concurrency=override.get('concurrency', int(os.getenv(
+                    f'ADMISSION_{scope.upper()}_CONCURRENCY', self.DEFAULT_CONCURRENCY.get(scope, 16)))),
+                rate=override.get('rate', float(os.getenv(f'ADMISSION_{scope.upper()}_RATE', 0))),
+                burst=override.get('burst'),
+                max_queue=override.get('max_queue', self.max_queue)
+            )
+            self.limiters[name] = limiter
+        return limiter
+
+    @asynccontextmanager
+    async def admit(self, keys: List[Tuple[str, str]], priority: int = INTERACTIVE,
+                    timeout: Optional[float] = None):
+        """Hold a slot on every (scope, key) limiter for the duration of the block"""
+        deadline = time.monotonic() + (timeout if timeout is not None else self.queue_timeout)
+        acquired: List[Limiter] = []
+        try:
+            for scope, key in keys:
+                limiter = self.limiter(scope, key)
+                await limiter.acquire(priority, deadline, self.counter)
+                acquired.append(limiter)
+            yield
+        finally:
+            for limiter in reversed(acquired):
+                limiter.release()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: limiter.snapshot() for name, limiter in self.limiters.items()}
+
+
+def parse_priority(value: Optional[str], default: int = INTERACTIVE) -> int:
+    """Map 'interactive'/'batch' (from a request field or header) to a priority"""
+    if not value:
+        return default
+    return PRIORITIES.get(str(value).lower(), default)
+
+
+# Global admission controller for this process
+admission = AdmissionController()
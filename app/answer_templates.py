@@ -0,0 +1,130 @@
+import json
+import logging
+import os
+import threading
+from functools import lru_cache
+from typing import Dict, Any, Optional
+
+from jinja2 import StrictUndefined, TemplateError
+from jinja2.sandbox import SandboxedEnvironment
+
+logger = logging.getLogger(__name__)
+
+# Results larger than this (as JSON) are summarised by the model even when the tool has a template
+ANSWER_TEMPLATE_MAX_RESULT_BYTES = int(os.getenv('ANSWER_TEMPLATE_MAX_RESULT_BYTES', 4096))
+ANSWER_TEMPLATES_ENABLED = os.getenv('ANSWER_TEMPLATES_ENABLED', '1') not in ('0', 'false', 'no')
+
+# Templates come from tool definitions, so they render in a sandbox, and a
+# field the result does not have fails the render instead of printing nothing
+_environment = SandboxedEnvironment(undefined=StrictUndefined, autoescape=False, trim_blocks=True,
+                                    lstrip_blocks=True)
+
+# Reasons an answer went to the model instead of a template
+NO_TEMPLATE = 'no_template'
+ERROR_RESULT = 'error_result'
+LARGE_RESULT = 'large_result'
+RENDER_FAILED = 'render_failed'
+
+
+@lru_cache(maxsize=512)
+def _compile(source: str):
+    return _environment.from_string(source)
+
+
+def validate_template(source: Optional[str]):
+    """Raise ValueError if an answer template does not compile"""
+    if not source:
+        return
+    try:
+        _compile(source)
+    except TemplateError as e:
+        raise ValueError(f"Invalid answer template: {e}")
+
+
+def result_value(tool_result: Any) -> Any:
+    """The structured value of a successful /tools/call result, or None for errors and text-only results"""
+    if not isinstance(tool_result, dict) or tool_result.get('isError') or tool_result.get('success') is False:
+        return None
+    for block in tool_result.get('content') or []:
+        if isinstance(block, dict) and block.get('type') == 'json':
+            return block.get('json')
+    return None
+
+
+def render_answer(source: Optional[str], tool_name: str, server_name: str, arguments: Dict[str, Any],
+                  tool_result: Any) -> Dict[str, Any]:
+    """The tool's answer rendered from its template, or the reason the model has to write it
+
+    Templates see the result's fields directly (when it is an object) and as
+    `result`, plus `tool`, `server` and `arguments`. Returns {'answer': ...}
+    or {'reason': ...}.
+    """
+    if not source or not ANSWER_TEMPLATES_ENABLED:
+        return {'reason': NO_TEMPLATE}
+    value = result_value(tool_result)
+    if value is None:
+        return {'reason': ERROR_RESULT}
+    if len(json.dumps(value, default=str)) > ANSWER_TEMPLATE_MAX_RESULT_BYTES:
+        return {'reason': LARGE_RESULT}
+
+    context = dict(value) if isinstance(value, dict) else {}
+    context.update(result=value, tool=tool_name, server=server_name, arguments=arguments or {})
+    try:
+        answer = _compile(source).render(context).strip()
+    except Exception as e:
+        # Usually a field this result does not have; the model copes with any shape
+        logger.info(f"Answer template for tool '{tool_name}' did not render: {e}")
+        return {'reason': RENDER_FAILED}
+    return {'answer': answer} if answer else {'reason': RENDER_FAILED}
+
+
+class AnswerTemplateStats:
+    """Summaries answered from templates instead of the model, and the model time that saved"""
+
+    def __init__(self):
+        self.templated = 0
+        self.summarized = 0
+        self.fallbacks: Dict[str, int] = {}
+        self.render_ms = 0.0
+        self.summary_ms = 0.0
+        self.tools: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def _tool(self, tool_name: str) -> Dict[str, int]:
+        return self.tools.setdefault(tool_name, {'templated': 0, 'summarized': 0})
+
+    def record_template(self, tool_names, render_ms: float):
+        with self._lock:
+            self.templated += 1
+            self.render_ms += render_ms
+            for tool_name in tool_names:
+                self._tool(tool_name)['templated'] += 1
+
+    def record_summary(self, tool_names, reason: str, summary_ms: float):
+        with self._lock:
+            self.summarized += 1
+            self.summary_ms += summary_ms
+            self.fallbacks[reason] = self.fallbacks.get(reason, 0) + 1
+            for tool_name in tool_names:
+                self._tool(tool_name)['summarized'] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        average_summary_ms = self.summary_ms / self.summarized if self.summarized else None
+        return {
+            'enabled': ANSWER_TEMPLATES_ENABLED,
+            'templated_answers': self.templated,
+            'model_summaries': self.summarized,
+            'llm_calls_saved': self.templated,
+            'average_render_ms': round(self.render_ms / self.templated, 3) if self.templated else None,
+            'average_summary_ms': round(average_summary_ms, 1) if average_summary_ms is not None else None,
+            # Each templated answer saved about one average summary call
+            'estimated_ms_saved': round(self.templated * average_summary_ms - self.render_ms, 1)
+            if average_summary_ms is not None else None,
+            'fallbacks': dict(self.fallbacks),
+            'tools': {name: dict(counts) for name, counts in self.tools.items()}
+        }
+
+
+# Global answer template statistics for this process
+answer_template_stats = AnswerTemplateStats()
+
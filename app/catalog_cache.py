@@ -0,0 +1,98 @@
+import json
+import logging
+import os
+import select
+import threading
+import time
+from typing import Dict, Any, Callable, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Postgres channel DatabaseManager notifies on every catalog write
+CATALOG_CHANNEL = 'mcp_catalog_changed'
+
+
+class CatalogCache:
+    """In-process cache for catalog reads (agents, servers, tools)
+
+    Catalog writes are rare, so any change clears the whole cache and bumps
+    `version`. Entries also expire after `ttl` seconds as a safety net in
+    case a change notification is missed.
+    """
+
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = ttl or float(os.getenv('CATALOG_CACHE_TTL', 60))
+        self.entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self.version = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        """Cached value, or None if missing or expired"""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self.entries.pop(key, None)
+            return None
+        return value
+
+    def set(self, key: Hashable, value: Any, version: Optional[int] = None):
+        """Cache a value; skipped if the catalog changed since `version` was read"""
+        with self._lock:
+            if version is not None and version != self.version:
+                return
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+
+    def invalidate(self, entity: Optional[str] = None, entity_id: Optional[str] = None):
+        """Drop everything after a catalog change"""
+        with self._lock:
+            self.version += 1
+            self.entries.clear()
+        logger.debug(f"Catalog cache invalidated ({entity} {entity_id}), version {self.version}")
+
+
+class CatalogChangeListener(threading.Thread):
+    """LISTEN for catalog change notifications from every process sharing the database"""
+
+    def __init__(self, connect: Callable, on_change: Callable[[Optional[str], Optional[str]], None]):
+        super().__init__(name='catalog-change-listener', daemon=True)
+        self.connect = connect
+        self.on_change = on_change
+        self._stopped = threading.Event()
+
+    def run(self):
+        backoff = 1.0
+        while not self._stopped.is_set():
+            try:
+                conn = self.connect()
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f'LISTEN {CATALOG_CHANNEL}')
+                # Changes may have happened while we were not listening
+                self.on_change(None, None)
+                backoff = 1.0
+
+                while not self._stopped.is_set():
+                    if select.select([conn], [], [], 5.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        try:
+                            payload = json.loads(notify.payload)
+                        except ValueError:
+                            payload = {}
+                        self.on_change(payload.get('entity'), payload.get('id'))
+                conn.close()
+            except Exception as e:
+                logger.error(f"Catalog change listener error: {e}; reconnecting in {backoff:.0f}s")
+                self._stopped.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    def stop(self):
+        self._stopped.set()
+
+
+# Global catalog cache for this process
+catalog_cache = CatalogCache()
@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import os
+import uuid
+from typing import Dict, Any, Awaitable, Callable, Optional
+
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+
+from fast_json import dumps, loads
+from structured_logging import request_id_var, route_var
+
+logger = logging.getLogger(__name__)
+
+# Questions one chat session may have in flight at once
+CHAT_MAX_IN_FLIGHT = int(os.getenv('CHAT_MAX_IN_FLIGHT', 4))
+
+# handler(message, progress) answers one 'ask' message; progress(stage, details) pushes a stage to the client
+Progress = Callable[[str, Dict[str, Any]], Awaitable[None]]
+Handler = Callable[[Dict[str, Any], Progress], Awaitable[Dict[str, Any]]]
+
+
+class ChatSession:
+    """One chat WebSocket carrying many concurrent questions, told apart by message id
+
+    Client messages:
+        {"type": "ask", "id": "...", "question": "..."}
+        {"type": "cancel", "id": "..."}
+        {"type": "ping"}
+
+    Server messages, each carrying the id of the question it is about:
+        {"type": "progress", "id": ..., "stage": ..., ...}
+        {"type": "answer", "id": ..., ...}
+        {"type": "error", "id": ..., "status": ..., "detail": ...}
+        {"type": "cancelled", "id": ...}
+    plus {"type": "pong"} and an initial {"type": "ready", ...}.
+
+    Every question runs in its own task; closing the socket cancels all of
+    them.
+    """
+
+    def __init__(self, websocket: WebSocket, handler: Handler, max_in_flight: int = CHAT_MAX_IN_FLIGHT):
+        self.websocket = websocket
+        self.handler = handler
+        self.max_in_flight = max_in_flight
+        self.session_id = uuid.uuid4().hex[:12]
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self._send_lock = asyncio.Lock()
+        self.closed = False
+
+    async def send(self, message: Dict[str, Any]):
+        """Send one message; messages from concurrent questions are never interleaved"""
+        if self.closed:
+            return
+        async with self._send_lock:
+            try:
+                await self.websocket.send_text(dumps(message).decode('utf-8'))
+            except Exception:
+                # The receive loop notices the disconnect and cleans up
+                self.closed = True
+
+    async def run(self, ready: Optional[Dict[str, Any]] = None):
+        """Serve the socket until the client goes away"""
+        await self.send(dict(ready or {}, type='ready', session=self.session_id))
+        try:
+            while True:
+                raw = await self.websocket.receive_text()
+                try:
+                    message = loads(raw)
+                except ValueError:
+                    await self.send({'type': 'error', 'id': None, 'status': 400, 'detail': 'Invalid JSON'})
+                    continue
+                if not isinstance(message, dict):
+                    await self.send({'type': 'error', 'id': None, 'status': 400, 'detail': 'Expected an object'})
+                    continue
+                await self.dispatch(message)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            self.closed = True
+            for task in list(self.tasks.values()):
+                task.cancel()
+            if self.tasks:
+                logger.info(f"Chat session {self.session_id} closed; cancelled {len(self.tasks)} questions")
+
+    async def dispatch(self, message: Dict[str, Any]):
+        kind = message.get('type')
+        message_id = message.get('id')
+        if kind == 'ping':
+            await self.send({'type': 'pong'})
+        elif kind == 'cancel':
+            task = self.tasks.get(str(message_id))
+            if task is not None:
+                task.cancel()
+        elif kind == 'ask':
+            if not message_id:
+                await self.send({'type': 'error', 'id': None, 'status': 400, 'detail': 'id is required'})
+            elif str(message_id) in self.tasks:
+                await self.send({'type': 'error', 'id': message_id, 'status': 409,
+                                 'detail': 'A question with this id is already in flight'})
+            elif len(self.tasks) >= self.max_in_flight:
+                await self.send({'type': 'error', 'id': message_id, 'status': 429,
+                                 'detail': f'At most {self.max_in_flight} questions may be in flight'})
+            else:
+                message_id = str(message_id)
+                self.tasks[message_id] = asyncio.create_task(self.answer(message_id, message))
+        else:
+            await self.send({'type': 'error', 'id': message_id, 'status': 400,
+                             'detail': f"Unknown message type '{kind}'"})
+
+    async def answer(self, message_id: str, message: Dict[str, Any]):
+        """Run the handler for one question and push its outcome"""
+        # Tasks copy the context, so each question logs under its own request id
+        request_id_var.set(f'{self.session_id}-{message_id}')
+        route_var.set('WS /ws/chat ask')
+
+        async def progress(stage: str, details: Dict[str, Any]):
+            await self.send(dict(details, type='progress', id=message_id, stage=stage))
+
+        try:
+            result = await self.handler(message, progress)
+            await self.send(dict(result, type='answer', id=message_id))
+        except asyncio.CancelledError:
+            await self.send({'type': 'cancelled', 'id': message_id})
+        except HTTPException as e:
+            await self.send({'type': 'error', 'id': message_id, 'status': e.status_code, 'detail': e.detail})
+        except Exception as e:
+            logger.error(f"Error answering chat message {message_id}: {e}")
+            await self.send({'type': 'error', 'id': message_id, 'status': 500,
+                             'detail': f"Failed to process question: {str(e)}"})
+        finally:
+            self.tasks.pop(message_id, None)
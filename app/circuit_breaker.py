@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Dict, Any, Awaitable, Callable, Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint whose breaker is open"""
+
+    def __init__(self, name: str, retry_after: float):
+        self.name = name
+        self.retry_after = max(1, int(retry_after + 0.999))
+        super().__init__(f"Circuit for {name} is open, retry in {self.retry_after}s")
+
+
+class CircuitBreaker:
+    """Per-endpoint circuit breaker with adaptive timeouts
+
+    The breaker looks at the calls made in the last `window_seconds`. It opens
+    when the failure rate or the slow-call rate goes over its threshold, stays
+    open for `open_seconds`, then lets a few trial calls through (half-open)
+    and closes again if they succeed.
+
+    The timeout handed to each call follows the observed p99 latency of
+    successful calls, clamped between `min_timeout` and `max_timeout`.
+    """
+
+    def __init__(self, name: str, max_timeout: float = 30.0, min_timeout: Optional[float] = None,
+                 window_seconds: Optional[float] = None, min_calls: Optional[int] = None,
+                 failure_rate: Optional[float] = None, slow_call_ms: Optional[float] = None,
+                 slow_call_rate: Optional[float] = None, open_seconds: Optional[float] = None,
+                 half_open_calls: Optional[int] = None):
+        self.name = name
+        self.max_timeout = max_timeout
+        self.min_timeout = min_timeout or float(os.getenv('CIRCUIT_MIN_TIMEOUT', 1.0))
+        self.window_seconds = window_seconds or float(os.getenv('CIRCUIT_WINDOW_SECONDS', 30))
+        self.min_calls = min_calls or int(os.getenv('CIRCUIT_MIN_CALLS', 5))
+        self.failure_rate = failure_rate or float(os.getenv('CIRCUIT_FAILURE_RATE', 0.5))
+        self.slow_call_ms = slow_call_ms or float(os.getenv('CIRCUIT_SLOW_CALL_MS', 5000))
+        self.slow_call_rate = slow_call_rate or float(os.getenv('CIRCUIT_SLOW_CALL_RATE', 0.8))
+        self.open_seconds = open_seconds or float(os.getenv('CIRCUIT_OPEN_SECONDS', 15))
+        self.half_open_calls = half_open_calls or int(os.getenv('CIRCUIT_HALF_OPEN_CALLS', 1))
+
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.calls = deque()  # (timestamp, ok, latency_ms)
+        self.latencies = deque(maxlen=200)  # latency_ms of successful calls
+        self.half_open_in_flight = 0
+        self.half_open_successes = 0
+        self.rejected = 0
+
+    def _trim(self, now: float):
+        while self.calls and self.calls[0][0] < now - self.window_seconds:
+            self.calls.popleft()
+
+    def p99_ms(self) -> Optional[float]:
+        """p99 latency of recent successful calls"""
+        if len(self.latencies) < self.min_calls:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+
+    def timeout(self, max_timeout: Optional[float] = None) -> float:
+        """Timeout for the next call, derived from the observed p99"""
+        max_timeout = max_timeout or self.max_timeout
+        p99 = self.p99_ms()
+        if p99 is None:
+            return max_timeout
+        return min(max_timeout, max(self.min_timeout, p99 * 2 / 1000))
+
+    def allow(self):
+        """Raise CircuitOpenError if the call must not go through"""
+        if self.state == OPEN:
+            remaining = self.opened_at + self.open_seconds - time.monotonic()
+            if remaining > 0:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, remaining)
+            self._transition(HALF_OPEN)
+
+        if self.state == HALF_OPEN:
+            if self.half_open_in_flight >= self.half_open_calls:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, 1)
+            self.half_open_in_flight += 1
+
+    def record(self, ok: bool, latency_ms: float):
+        """Record the outcome of a call that was allowed through"""
+        now = time.monotonic()
+        if ok:
+            self.latencies.append(latency_ms)
+
+        if self.state == HALF_OPEN:
+            self.half_open_in_flight = max(0, self.half_open_in_flight - 1)
+            if not ok:
+                self._transition(OPEN)
+                return
+            self.half_open_successes += 1
+            if self.half_open_successes >= self.half_open_calls:
+                self._transition(CLOSED)
+            return
+
+        self.calls.append((now, ok, latency_ms))
+        self._trim(now)
+        if self.state == CLOSED and len(self.calls) >= self.min_calls:
+            failures = sum(1 for _, call_ok, _ in self.calls if not call_ok)
+            slow = sum(1 for _, _, latency in self.calls if latency >= self.slow_call_ms)
+            if failures / len(self.calls) >= self.failure_rate or slow / len(self.calls) >= self.slow_call_rate:
+                self._transition(OPEN)
+
+    def _transition(self, state: str):
+        logger.warning(f"Circuit for {self.name}: {self.state} -> {state}")
+        self.state = state
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+        if state != HALF_OPEN:
+            self.half_open_in_flight = 0
+        self.half_open_successes = 0
+        if state == CLOSED:
+            self.calls.clear()
+
+    async def call(self, fn: Callable[[float], Awaitable[Any]], max_timeout: Optional[float] = None) -> Any:
+        """Call fn(timeout) through the breaker
+
+        HTTP errors below 500 mean the endpoint answered, so they do not count
+        as failures.
+        """
+        self.allow()
+        start = time.perf_counter()
+        try:
+            result = await fn(self.timeout(max_timeout))
+        except asyncio.CancelledError:
+            # The caller gave up; this says nothing about the endpoint
+            if self.state == HALF_OPEN:
+                self.half_open_in_flight = max(0, self.half_open_in_flight - 1)
+            raise
+        except Exception as e:
+            status_code = getattr(getattr(e, 'response', None), 'status_code', 500)
+            self.record(status_code < 500, (time.perf_counter() - start) * 1000)
+            raise
+        self.record(True, (time.perf_counter() - start) * 1000)
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current state for status endpoints"""
+        self._trim(time.monotonic())
+        failures = sum(1 for _, ok, _ in self.calls if not ok)
+        p99 = self.p99_ms()
+        return {
+            'state': self.state,
+            'window_calls': len(self.calls),
+            'window_failures': failures,
+            'p99_ms': round(p99, 2) if p99 is not None else None,
+            'timeout_seconds': round(self.timeout(), 3),
+            'rejected': self.rejected
+        }
+
+
+class CircuitBreakerRegistry:
+    """One breaker per endpoint (scheme://host:port)"""
+
+    def __init__(self):
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    @staticmethod
+    def endpoint(url: str) -> str:
+        parsed = urlparse(url)
+        return f"{parsed.scheme}://{parsed.netloc}" if parsed.netloc else url
+
+    def get(self, url: str) -> CircuitBreaker:
+        """Breaker for the endpoint serving url"""
+        name = self.endpoint(url)
+        breaker = self.breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(name)
+            self.breakers[name] = breaker
+        return breaker
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: breaker.snapshot() for name, breaker in self.breakers.items()}
+
+
+# Global circuit breakers for this process
+circuit_breakers = CircuitBreakerRegistry()
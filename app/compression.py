@@ -0,0 +1,225 @@
+import gzip
+import os
+import time
+import zlib
+from typing import Dict, Any, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+# brotli compresses JSON and JS noticeably better than gzip at similar CPU
+# cost; without it only gzip is offered
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Responses smaller than this are sent as-is; compressing them costs more than it saves
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+
+# Levels for responses compressed per request, chosen for throughput rather
+# than ratio (see benchmarks/bench_compression.py)
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', 5))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', 4))
+
+# Static files are compressed once, so they get the maximum levels
+STATIC_GZIP_LEVEL = 9
+STATIC_BROTLI_QUALITY = 11
+
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'application/x-ndjson',
+                      'application/xml', 'image/svg+xml')
+COMPRESSIBLE_EXTENSIONS = ('.js', '.css', '.html', '.json', '.svg', '.txt', '.map')
+
+
+def available_encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Best encoding the client accepts (brotli over gzip), or None"""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    for encoding in available_encodings():
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    # Event streams are left alone; some proxies buffer them when compressed
+    return (bool(content_type) and content_type.startswith(COMPRESSIBLE_TYPES)
+            and not content_type.startswith('text/event-stream'))
+
+
+def compress(data: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    """Compress a whole body"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY if level is None else level)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL if level is None else level, mtime=0)
+
+
+def precompress(data: bytes) -> Dict[str, bytes]:
+    """Every encoding of a static file that is actually smaller than the original"""
+    variants = {}
+    for encoding in available_encodings():
+        level = STATIC_BROTLI_QUALITY if encoding == 'br' else STATIC_GZIP_LEVEL
+        compressed = compress(data, encoding, level)
+        if len(compressed) < len(data):
+            variants[encoding] = compressed
+    return variants
+
+
+class StreamCompressor:
+    """Incremental compressor that flushes after every chunk, so streamed responses are not held back"""
+
+    def __init__(self, encoding: str):
+        if encoding == 'br':
+            self.compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self.compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        self.encoding = encoding
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == 'br':
+            return self.compressor.process(data) + self.compressor.flush()
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == 'br':
+            return self.compressor.finish()
+        return self.compressor.flush(zlib.Z_FINISH)
+
+
+class CompressionStats:
+    """Bytes in and out and time spent compressing dynamic responses"""
+
+    def __init__(self):
+        self.responses = 0
+        self.skipped_small = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.compress_ms = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'responses': self.responses,
+            'skipped_small': self.skipped_small,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'ratio': round(self.bytes_out / self.bytes_in, 3) if self.bytes_in else None,
+            'compress_ms': round(self.compress_ms, 3),
+            'encodings': available_encodings(),
+            'minimum_size': COMPRESSION_MIN_SIZE
+        }
+
+
+class CompressionMiddleware:
+    """Compress text and JSON responses with the best encoding the client accepts
+
+    Bodies sent in one piece are compressed only when at least
+    `minimum_size` bytes; streamed bodies are compressed chunk by chunk.
+    Responses that already have a Content-Encoding (precompressed static
+    files) pass through untouched.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get('accept-encoding'))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, CompressingSender(send, encoding, self.minimum_size).send)
+
+
+class CompressingSender:
+    """ASGI send wrapper for one response"""
+
+    def __init__(self, send, encoding: str, minimum_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start_message = None
+        self.compressor: Optional[StreamCompressor] = None
+        self.passthrough = False
+
+    async def send(self, message):
+        if message['type'] == 'http.response.start':
+            self.start_message = message
+            return
+        if message['type'] != 'http.response.body' or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get('body', b'')
+        more_body = message.get('more_body', False)
+
+        if self.start_message is not None:
+            start, self.start_message = self.start_message, None
+            headers = MutableHeaders(raw=start['headers'])
+            if (start['status'] in (204, 304) or 'content-encoding' in headers
+                    or not is_compressible(headers.get('content-type'))):
+                self.passthrough = True
+                await self._send(start)
+                await self._send(message)
+                return
+
+            headers.add_vary_header('Accept-Encoding')
+            if not more_body and len(body) < self.minimum_size:
+                compression_stats.skipped_small += 1
+                self.passthrough = True
+                await self._send(start)
+                await self._send(message)
+                return
+
+            headers['Content-Encoding'] = self.encoding
+            etag = headers.get('etag')
+            if etag and not etag.startswith('W/'):
+                # The compressed bytes differ from the identity representation
+                headers['ETag'] = f'W/{etag}'
+            compression_stats.responses += 1
+
+            if not more_body:
+                started = time.perf_counter()
+                compressed = compress(body, self.encoding)
+                self._record(body, compressed, started)
+                headers['Content-Length'] = str(len(compressed))
+                await self._send(start)
+                await self._send({'type': 'http.response.body', 'body': compressed})
+                return
+
+            del headers['Content-Length']
+            self.compressor = StreamCompressor(self.encoding)
+            await self._send(start)
+
+        started = time.perf_counter()
+        compressed = self.compressor.chunk(body) if body else b''
+        if not more_body:
+            compressed += self.compressor.finish()
+        self._record(body, compressed, started)
+        await self._send({'type': 'http.response.body', 'body': compressed, 'more_body': more_body})
+
+    @staticmethod
+    def _record(body: bytes, compressed: bytes, started: float):
+        compression_stats.bytes_in += len(body)
+        compression_stats.bytes_out += len(compressed)
+        compression_stats.compress_ms += (time.perf_counter() - started) * 1000
+
+
+# Compression counters for this process
+compression_stats = CompressionStats()
@@ -0,0 +1,363 @@
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Bytes of conversation text kept in memory across all conversations, and per conversation
+CONVERSATION_MEMORY_BYTES = int(os.getenv('CONVERSATION_MEMORY_BYTES', 32 * 1024 * 1024))
+CONVERSATION_MAX_BYTES = int(os.getenv('CONVERSATION_MAX_BYTES', 64 * 1024))
+# Tokens of history added to each prompt, and how much of that the running summary may take
+CONVERSATION_TOKEN_BUDGET = int(os.getenv('CONVERSATION_TOKEN_BUDGET', 1500))
+SUMMARY_TOKEN_BUDGET = int(os.getenv('CONVERSATION_SUMMARY_TOKEN_BUDGET', 400))
+# Recent turns always kept verbatim; older ones are folded into the summary
+CONVERSATION_RECENT_TURNS = int(os.getenv('CONVERSATION_RECENT_TURNS', 4))
+# Tokens of a single answer kept in a verbatim turn
+TURN_ANSWER_TOKENS = int(os.getenv('CONVERSATION_TURN_ANSWER_TOKENS', 300))
+# Where conversations evicted from memory go: '' (dropped), 'postgres' or 'sqlite:///path/to/file.db'
+CONVERSATION_SPILL = os.getenv('CONVERSATION_SPILL', '')
+# Seconds a spilled conversation is kept after its last turn
+CONVERSATION_TTL = float(os.getenv('CONVERSATION_TTL', 24 * 3600))
+
+# Rough size of English text and JSON for Gemini: about four characters per token
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def clip(text: str, tokens: int) -> str:
+    """Text cut to about `tokens` tokens, marked when cut"""
+    limit = tokens * CHARS_PER_TOKEN
+    text = ' '.join((text or '').split())
+    return text if len(text) <= limit else text[:max(limit - 3, 0)].rstrip() + '...'
+
+
+class Conversation:
+    """Turns of one chat, oldest first, plus a running summary of turns compacted away"""
+
+    def __init__(self, conversation_id: str, agent_id: str, summary: str = '',
+                 turns: Optional[List[Dict[str, Any]]] = None, compacted: int = 0,
+                 updated_at: Optional[float] = None):
+        self.id = conversation_id
+        self.agent_id = agent_id
+        self.summary = summary
+        self.turns: List[Dict[str, Any]] = turns or []
+        self.compacted = compacted
+        self.updated_at = updated_at or time.time()
+        self.size = self._measure()
+
+    @staticmethod
+    def _turn_size(turn: Dict[str, Any]) -> int:
+        return sum(len(str(value).encode('utf-8')) for value in turn.values())
+
+    def _measure(self) -> int:
+        return len(self.summary.encode('utf-8')) + sum(self._turn_size(turn) for turn in self.turns)
+
+    def add(self, question: str, answer: str, tool: Optional[str] = None, server: Optional[str] = None):
+        turn = {'question': question, 'answer': clip(answer, TURN_ANSWER_TOKENS)}
+        if tool:
+            turn['tool'] = tool
+            turn['server'] = server
+        self.turns.append(turn)
+        self.updated_at = time.time()
+        self.compact()
+
+    @staticmethod
+    def _summary_line(turn: Dict[str, Any]) -> str:
+        line = f"- Asked: {clip(turn['question'], 40)} Answered: {clip(turn['answer'], 60)}"
+        if turn.get('tool'):
+            line += f" (tool '{turn['tool']}' on '{turn['server']}')"
+        return line
+
+    def compact(self, budget: int = CONVERSATION_TOKEN_BUDGET, max_bytes: int = CONVERSATION_MAX_BYTES):
+        """Fold old turns into the summary until the rest fit the token budget and byte limit
+
+        The summary keeps one short line per folded turn and drops its oldest
+        lines past SUMMARY_TOKEN_BUDGET, so it stays bounded however long the
+        conversation gets. No model call is involved.
+        """
+        def over() -> bool:
+            verbatim = sum(estimate_tokens(turn['question']) + estimate_tokens(turn['answer']) for turn in self.turns)
+            return estimate_tokens(self.summary) + verbatim > budget or self._measure() > max_bytes
+
+        while len(self.turns) > CONVERSATION_RECENT_TURNS and over():
+            turn = self.turns.pop(0)
+            lines = self.summary.splitlines() + [self._summary_line(turn)]
+            while len(lines) > 1 and estimate_tokens('\n'.join(lines)) > SUMMARY_TOKEN_BUDGET:
+                lines.pop(0)
+            self.summary = '\n'.join(lines)
+            self.compacted += 1
+        self.size = self._measure()
+
+    def history(self, budget: int = CONVERSATION_TOKEN_BUDGET) -> str:
+        """Prompt text for the conversation so far, within `budget` tokens (empty if there is none)"""
+        if not self.turns and not self.summary:
+            return ''
+        summary = f"Summary of earlier turns:\n{self.summary}\n" if self.summary else ''
+        remaining = budget - estimate_tokens(summary)
+        recent = []
+        # Newest turns first, so the ones a follow-up most likely refers to survive the budget
+        for turn in reversed(self.turns):
+            text = f"User: {turn['question']}\nAssistant: {turn['answer']}\n"
+            cost = estimate_tokens(text)
+            if cost > remaining:
+                break
+            recent.append(text)
+            remaining -= cost
+        return summary + ''.join(reversed(recent))
+
+    def to_record(self) -> Dict[str, Any]:
+        return {'summary': self.summary, 'turns': list(self.turns), 'compacted': self.compacted}
+
+    @classmethod
+    def from_record(cls, conversation_id: str, agent_id: str, record: Dict[str, Any],
+                    updated_at: Optional[float] = None) -> 'Conversation':
+        return cls(conversation_id, agent_id, record.get('summary', ''), record.get('turns', []),
+                   record.get('compacted', 0), updated_at)
+
+
+class SqliteSpill:
+    """Evicted conversations in a local SQLite file (one per process)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute('''CREATE TABLE IF NOT EXISTS conversations (
+                                      id TEXT PRIMARY KEY, agent_id TEXT NOT NULL,
+                                      data TEXT NOT NULL, updated_at REAL NOT NULL)''')
+
+    def load(self, conversation_id: str) -> Optional[Conversation]:
+        with self._lock:
+            row = self._conn.execute('SELECT agent_id, data, updated_at FROM conversations WHERE id = ?',
+                                     (conversation_id,)).fetchone()
+        if row is None:
+            return None
+        return Conversation.from_record(conversation_id, row[0], json.loads(row[1]), row[2])
+
+    def save(self, conversation: Conversation, data: str):
+        with self._lock, self._conn:
+            self._conn.execute('INSERT OR REPLACE INTO conversations (id, agent_id, data, updated_at) VALUES (?, ?, ?, ?)',
+                               (conversation.id, conversation.agent_id, data, conversation.updated_at))
+
+    def expire(self, before: float) -> int:
+        with self._lock, self._conn:
+            return self._conn.execute('DELETE FROM conversations WHERE updated_at < ?', (before,)).rowcount
+
+
+class PostgresSpill:
+    """Evicted conversations in the shared database (migration 0004), so any process can resume them"""
+
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+
+    def load(self, conversation_id: str) -> Optional[Conversation]:
+        row = self.db_manager.load_conversation(conversation_id)
+        if row is None:
+            return None
+        return Conversation.from_record(conversation_id, row['agent_id'], row['data'], row['updated_at'])
+
+    def save(self, conversation: Conversation, data: str):
+        self.db_manager.save_conversation(conversation.id, conversation.agent_id, data, conversation.updated_at)
+
+    def expire(self, before: float) -> int:
+        return self.db_manager.delete_conversations_before(before)
+
+
+def make_spill(setting: str, db_manager=None):
+    """Spill tier for a CONVERSATION_SPILL setting, or None to drop evicted conversations"""
+    if not setting:
+        return None
+    if setting == 'postgres':
+        return PostgresSpill(db_manager)
+    if setting.startswith('sqlite:///'):
+        return SqliteSpill(setting[len('sqlite:///'):])
+    raise ValueError(f"Unsupported CONVERSATION_SPILL '{setting}'")
+
+
+class ConversationStore:
+    """Conversations by id: an LRU in memory within a byte budget, with an optional spill tier
+
+    Least recently used conversations are evicted once the total size passes
+    `max_bytes`. With a spill tier they are written there by a background
+    thread and read back on the next `load`; without one they are dropped.
+    Memory hits never touch the spill tier, so only `load` may block.
+    """
+
+    def __init__(self, max_bytes: int = CONVERSATION_MEMORY_BYTES, spill=None, ttl: float = CONVERSATION_TTL):
+        self.max_bytes = max_bytes
+        self.spill = spill
+        self.ttl = ttl
+        self.conversations: 'OrderedDict[str, Conversation]' = OrderedDict()
+        self.bytes = 0
+        # Evicted conversations waiting for the spill writer, readable meanwhile
+        self.spilling: Dict[str, Conversation] = {}
+        self.hits = 0
+        self.spill_hits = 0
+        self.created = 0
+        self.evictions = 0
+        self.agent_mismatches = 0
+        self._lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        if self.spill is not None:
+            self._thread = threading.Thread(target=self._run, name='conversation-spill', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Spill everything still in memory, so conversations survive a restart"""
+        if self._thread is None:
+            return
+        with self._lock:
+            for conversation in self.conversations.values():
+                self.spilling[conversation.id] = conversation
+                self._queue.put(conversation.id)
+        self._stopped.set()
+        self._queue.put(None)
+        self._thread.join(timeout=10)
+
+    def cached(self, conversation_id: str) -> Optional[Conversation]:
+        """The conversation if it is in memory, without touching the spill tier"""
+        with self._lock:
+            conversation = self.conversations.get(conversation_id)
+            if conversation is not None:
+                self.conversations.move_to_end(conversation_id)
+                self.hits += 1
+                return conversation
+            conversation = self.spilling.pop(conversation_id, None)
+            if conversation is not None:
+                self._insert(conversation)
+                self.hits += 1
+            return conversation
+
+    def load(self, conversation_id: str) -> Optional[Conversation]:
+        """The conversation from memory or the spill tier (blocking), or None"""
+        conversation = self.cached(conversation_id)
+        if conversation is not None or self.spill is None:
+            return conversation
+        try:
+            conversation = self.spill.load(conversation_id)
+        except Exception as e:
+            logger.error(f"Could not load conversation {conversation_id}: {e}")
+            conversation = None
+        if conversation is None or conversation.updated_at < time.time() - self.ttl:
+            return None
+        self.spill_hits += 1
+        with self._lock:
+            # A concurrent load may have got there first
+            return self.conversations.get(conversation_id) or self._insert(conversation)
+
+    def create(self, conversation_id: str, agent_id: str) -> Conversation:
+        """A new, empty conversation, replacing any other with the same id"""
+        with self._lock:
+            self._discard(conversation_id)
+            self.spilling.pop(conversation_id, None)
+            self.created += 1
+            return self._insert(Conversation(conversation_id, agent_id))
+
+    def for_agent(self, conversation_id: str, agent_id: str, found: Optional[Conversation]) -> Conversation:
+        """The conversation an agent's question continues, given what `cached` or `load` found
+
+        An id that belongs to another agent's conversation starts a new one
+        under a fresh id, leaving the other agent's history untouched.
+        """
+        if found is None:
+            return self.create(conversation_id, agent_id)
+        if found.agent_id != agent_id:
+            with self._lock:
+                self.agent_mismatches += 1
+            return self.create(uuid.uuid4().hex, agent_id)
+        return found
+
+    def record(self, conversation: Conversation, question: str, answer: str,
+               tool: Optional[str] = None, server: Optional[str] = None):
+        """Add a turn, compacting the conversation and evicting others as needed"""
+        with self._lock:
+            before = conversation.size
+            conversation.add(question, answer, tool, server)
+            if self.conversations.get(conversation.id) is conversation:
+                self.bytes += conversation.size - before
+                self.conversations.move_to_end(conversation.id)
+            else:
+                # Evicted while its question was being answered
+                self._discard(conversation.id)
+                self.spilling.pop(conversation.id, None)
+                self._insert(conversation)
+            self._evict()
+
+    def _insert(self, conversation: Conversation) -> Conversation:
+        self.conversations[conversation.id] = conversation
+        self.bytes += conversation.size
+        self._evict()
+        return conversation
+
+    def _discard(self, conversation_id: str):
+        conversation = self.conversations.pop(conversation_id, None)
+        if conversation is not None:
+            self.bytes -= conversation.size
+
+    def _evict(self):
+        while self.bytes > self.max_bytes and len(self.conversations) > 1:
+            conversation_id, conversation = self.conversations.popitem(last=False)
+            self.bytes -= conversation.size
+            self.evictions += 1
+            if self.spill is not None:
+                self.spilling[conversation_id] = conversation
+                self._queue.put(conversation_id)
+
+    def _run(self):
+        last_expiry = 0.0
+        while True:
+            conversation_id = self._queue.get()
+            if conversation_id is None:
+                if self._queue.empty():
+                    return
+                continue
+            with self._lock:
+                conversation = self.spilling.get(conversation_id)
+                data = json.dumps(conversation.to_record()) if conversation is not None else None
+            if conversation is not None:
+                try:
+                    self.spill.save(conversation, data)
+                except Exception as e:
+                    logger.error(f"Could not spill conversation {conversation_id}: {e}")
+                with self._lock:
+                    # Unless it was loaded back (and maybe changed) meanwhile
+                    if self.spilling.get(conversation_id) is conversation:
+                        del self.spilling[conversation_id]
+            if time.time() - last_expiry > 3600 and not self._stopped.is_set():
+                last_expiry = time.time()
+                try:
+                    expired = self.spill.expire(last_expiry - self.ttl)
+                    if expired:
+                        logger.info(f"Expired {expired} spilled conversations")
+                except Exception as e:
+                    logger.error(f"Could not expire spilled conversations: {e}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'conversations': len(self.conversations),
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'spill': type(self.spill).__name__ if self.spill is not None else None,
+            'pending_spill': len(self.spilling),
+            'hits': self.hits,
+            'spill_hits': self.spill_hits,
+            'created': self.created,
+            'evictions': self.evictions,
+            'agent_mismatches': self.agent_mismatches,
+            'token_budget': CONVERSATION_TOKEN_BUDGET
+        }
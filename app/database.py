@@ -1,12 +1,27 @@
 import os
 import json
+import base64
+import uuid
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
 from psycopg2.extras import RealDictCursor
 import logging
+import tempfile
+import threading
+import time
+from contextlib import closing, contextmanager
 from urllib.parse import urlparse, unquote
 
+from startup_timing import startup_timer
+from catalog_cache import CATALOG_CHANNEL
+from tool_schema import build_mcp_tool
+from queries import queries, SERVER_COLUMNS, AGENT_COLUMNS, TOOL_COLUMNS
+from tool_bulk import COPY_COLUMNS, MAX_REPORTED_ERRORS, copy_line, validate_tool
+from tool_search import prefix_tsquery
+
 # Load environment variables from .env file
 try:
     from dotenv import load_dotenv
@@ -17,13 +32,170 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Listing page sizes
+DEFAULT_PAGE_SIZE = int(os.getenv('DEFAULT_PAGE_SIZE', 100))
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', 1000))
+
+# Connections kept per process
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', 1))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', 10))
+# Seconds to wait for a free pooled connection before giving up
+DB_POOL_CHECKOUT_TIMEOUT = float(os.getenv('DB_POOL_CHECKOUT_TIMEOUT', 5))
+
+# Read replicas: comma-separated URLs in the DATABASE_URL format
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+# Seconds a failed replica is skipped before it is tried again
+REPLICA_RETRY_INTERVAL = float(os.getenv('REPLICA_RETRY_INTERVAL', 30))
+# Seconds after a catalog write during which reads go to the primary, covering replication lag
+REPLICA_READ_AFTER_WRITE = float(os.getenv('REPLICA_READ_AFTER_WRITE', 5))
+
+# Rows fetched per round trip from a server-side cursor
+CURSOR_ITERSIZE = int(os.getenv('CURSOR_ITERSIZE', 500))
+
+# Columns that listings may select, per table
+LISTING_COLUMNS = {
+    'mcp_servers': ('id', 'name', 'url', 'status', 'enabled', 'created_at', 'updated_at'),
+    'agents': ('id', 'name', 'description', 'created_at', 'updated_at'),
+    'tools': ('id', 'name', 'description', 'parameters', 'server_id', 'created_at', 'updated_at',
+              'api_url', 'http_method', 'request_headers', 'request_body', 'speculative',
+              'answer_template'),
+}
+
+
+def encode_page_cursor(name: Optional[str], row_id: Any) -> str:
+    """Opaque cursor for the (name, id) of the last row of a page"""
+    raw = json.dumps([name, str(row_id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_page_cursor(cursor: str):
+    """(name, id) from a cursor made by encode_page_cursor; ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        name, row_id = json.loads(raw)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return name, row_id
+
+
+def escape_like(value: str) -> str:
+    """Escape LIKE wildcards so a user prefix matches literally"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+class PoolExhausted(Exception):
+    """Raised when no pooled connection became free within DB_POOL_CHECKOUT_TIMEOUT"""
+
+    def __init__(self, name: str, retry_after: float = 1):
+        self.name = name
+        self.retry_after = max(1, int(retry_after + 0.999))
+        super().__init__(f"No free {name} database connection, retry in {self.retry_after}s")
+
+
+class PreparedConnection(psycopg2.extensions.connection):
+    """Connection that remembers which registry statements it has prepared"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+        self.stale_statements = False
+
+
+class ConnectionPool:
+    """Pooled connections to one database server, with load and failure tracking"""
+
+    def __init__(self, name: str, params: Dict[str, Any], minconn: int = DB_POOL_MIN, maxconn: int = DB_POOL_MAX):
+        self.name = name
+        self.params = params
+        self.minconn = minconn
+        self._pool = None
+        self._lock = threading.Lock()
+        # ThreadedConnectionPool fails instead of waiting when exhausted
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self.maxconn = maxconn
+        self.in_use = 0
+        self.checkouts = 0
+        self.failures = 0
+        self.exhausted = 0
+        self.down_until = 0.0
+
+    def _get_pool(self) -> psycopg2.pool.ThreadedConnectionPool:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = psycopg2.pool.ThreadedConnectionPool(
+                        self.minconn, self.maxconn, connection_factory=PreparedConnection, **self.params
+                    )
+        return self._pool
+
+    def available(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+    def mark_down(self, retry_after: float):
+        """Skip this server for `retry_after` seconds"""
+        self.failures += 1
+        self.down_until = time.monotonic() + retry_after
+        logger.warning(f"Database {self.name} unavailable; retrying in {retry_after:.0f}s")
+
+    def checkout(self, timeout: float = DB_POOL_CHECKOUT_TIMEOUT):
+        """Take a connection, waiting up to `timeout` seconds for a free slot"""
+        if not self._slots.acquire(timeout=timeout):
+            self.exhausted += 1
+            raise PoolExhausted(self.name)
+        try:
+            conn = self._get_pool().getconn()
+        except BaseException:
+            self._slots.release()
+            raise
+        self.in_use += 1
+        self.checkouts += 1
+        return conn
+
+    def checkin(self, conn, close: bool = False):
+        """Return a connection taken with checkout"""
+        self.in_use -= 1
+        try:
+            pool = self._pool
+            if pool is not None:
+                pool.putconn(conn, close=close or bool(conn.closed))
+            elif not conn.closed:
+                conn.close()
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """Close every idle pooled connection"""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'host': self.params.get('host'),
+            'in_use': self.in_use,
+            'checkouts': self.checkouts,
+            'failures': self.failures,
+            'exhausted': self.exhausted,
+            'available': self.available()
+        }
+
+
 class DatabaseManager:
     def __init__(self):
         self.connection_params = self._parse_database_url()
+        self.catalog_listeners = []
+        self.primary = ConnectionPool('primary', self.connection_params)
+        self.replicas = [
+            ConnectionPool(f'replica-{i}', self._parse_database_url(url))
+            for i, url in enumerate(DATABASE_REPLICA_URLS)
+        ]
+        self.last_write = 0.0
+        # Slow-query plans are captured on a dedicated primary connection
+        queries.slow_log.configure(self.connect)
 
-    def _parse_database_url(self) -> dict:
-        """Parse DATABASE_URL and return connection parameters"""
-        database_url = os.getenv('DATABASE_URL')
+    def _parse_database_url(self, database_url: Optional[str] = None) -> dict:
+        """Parse DATABASE_URL (or the given URL) and return connection parameters"""
+        database_url = database_url or os.getenv('DATABASE_URL')
         if not database_url:
             raise ValueError("DATABASE_URL environment variable not set")
 
@@ -45,10 +217,251 @@ class DatabaseManager:
             'database': database
         }
 
-    def get_connection(self):
-        """Get database connection"""
+    def connect(self):
+        """Open a new dedicated database connection"""
         return psycopg2.connect(**self.connection_params)
 
+    def note_write(self):
+        """Send reads to the primary until replicas have caught up with a write"""
+        self.last_write = time.monotonic()
+
+    def _route(self, read_only: bool) -> ConnectionPool:
+        """Least-loaded available replica for reads, otherwise the primary"""
+        if not read_only or not self.replicas:
+            return self.primary
+        if time.monotonic() - self.last_write < REPLICA_READ_AFTER_WRITE:
+            return self.primary
+        candidates = [replica for replica in self.replicas if replica.available()]
+        if not candidates:
+            return self.primary
+        return min(candidates, key=lambda replica: (replica.in_use, replica.checkouts))
+
+    @contextmanager
+    def get_connection(self, read_only: bool = False):
+        """Borrow a pooled connection for one transaction
+
+        Commits when the block succeeds, rolls back when it raises, and
+        returns the connection to the pool either way. `read_only` blocks may
+        run on a replica; a replica that fails is skipped for
+        REPLICA_RETRY_INTERVAL seconds and its reads go to the primary.
+        """
+        pool = self._route(read_only)
+        try:
+            conn = pool.checkout()
+        except psycopg2.OperationalError:
+            if pool is self.primary:
+                raise
+            pool.mark_down(REPLICA_RETRY_INTERVAL)
+            pool = self.primary
+            conn = pool.checkout()
+
+        broken = False
+        try:
+            yield conn
+            conn.commit()
+        except BaseException as e:
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+            if isinstance(e, psycopg2.OperationalError) and pool is not self.primary:
+                broken = True
+                pool.mark_down(REPLICA_RETRY_INTERVAL)
+            raise
+        finally:
+            pool.checkin(conn, close=broken)
+
+    def close_pool(self):
+        """Close every pooled connection"""
+        for pool in [self.primary] + self.replicas:
+            pool.close()
+
+    def pool_snapshot(self) -> Dict[str, Any]:
+        return {
+            'primary': self.primary.snapshot(),
+            'replicas': {replica.name: replica.snapshot() for replica in self.replicas}
+        }
+
+    def iter_rows(self, query: str, params: Optional[List[Any]] = None, itersize: int = CURSOR_ITERSIZE,
+                  name: str = 'iter_rows'):
+        """Yield rows from a server-side cursor, `itersize` rows per round trip
+
+        Runs on a replica when one is available. The connection stays checked
+        out until the generator is exhausted or closed. Time spent in the
+        database (not in the consumer) is recorded in the query registry
+        under `name`.
+        """
+        elapsed = 0.0
+        count = 0
+        try:
+            with self.get_connection(read_only=True) as conn:
+                with conn.cursor(name=f'iter_{uuid.uuid4().hex}', cursor_factory=RealDictCursor) as cursor:
+                    cursor.itersize = itersize
+                    start = time.perf_counter()
+                    cursor.execute(query, params)
+                    rows = iter(cursor)
+                    while True:
+                        try:
+                            row = next(rows)
+                        except StopIteration:
+                            break
+                        finally:
+                            elapsed += time.perf_counter() - start
+                        count += 1
+                        yield row
+                        start = time.perf_counter()
+        finally:
+            queries.record(name, elapsed * 1000, count, sql=query, params=params)
+
+    def list_page(self, table: str, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                  fields: Optional[List[str]] = None, name: Optional[str] = None,
+                  prefix: Optional[str] = None, filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """One page of a config table ordered by (name, id)
+
+        Pagination is keyset based: `cursor` is the next_cursor of the previous
+        page, so every page costs the same regardless of its depth. `fields`
+        limits the selected columns (id and name are always included), `name`
+        is an exact match, `prefix` a name prefix, and `filters` exact matches
+        on other columns. Raises ValueError for unknown fields or a bad cursor.
+        """
+        allowed = LISTING_COLUMNS[table]
+        if fields:
+            unknown = [field for field in fields if field not in allowed]
+            if unknown:
+                raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+            columns = ['id', 'name'] + [field for field in fields if field not in ('id', 'name')]
+        else:
+            columns = list(allowed)
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+        conditions, params = [], []
+        for column, value in (filters or {}).items():
+            if column not in allowed:
+                raise ValueError(f"Unknown filter: {column}")
+            conditions.append(f'{column} = %s')
+            params.append(value)
+        if name is not None:
+            conditions.append('name = %s')
+            params.append(name)
+        if prefix:
+            conditions.append("name LIKE %s ESCAPE '\\'")
+            params.append(escape_like(prefix) + '%')
+        if cursor:
+            last_name, last_id = decode_page_cursor(cursor)
+            if last_name is None:
+                # NULL names sort last
+                conditions.append('name IS NULL AND id > %s')
+                params.append(last_id)
+            else:
+                conditions.append('((name, id) > (%s, %s) OR name IS NULL)')
+                params.extend([last_name, last_id])
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        query = f"SELECT {', '.join(columns)} FROM {table} {where} ORDER BY name, id LIMIT %s"
+        params.append(limit + 1)
+
+        items = []
+        next_cursor = None
+        with closing(self.iter_rows(query, params, itersize=min(limit + 1, CURSOR_ITERSIZE),
+                                    name=f'list_{table}')) as rows:
+            for row in rows:
+                if len(items) == limit:
+                    # There is at least one more row
+                    last = items[-1]
+                    next_cursor = encode_page_cursor(last['name'], last['id'])
+                    break
+                items.append(row)
+        return {'items': items, 'next_cursor': next_cursor}
+
+    def get_servers_page(self, **options) -> Dict[str, Any]:
+        """Page of servers; see list_page for the options"""
+        page = self.list_page('mcp_servers', **options)
+        # Selected fields are returned as-is; full rows get the server_a/server_b mapping
+        serialize = self._serialize_row if options.get('fields') else self._map_server
+        page['items'] = [serialize(row) for row in page['items']]
+        return page
+
+    def get_agents_page(self, **options) -> Dict[str, Any]:
+        """Page of agents; see list_page for the options"""
+        page = self.list_page('agents', **options)
+        page['items'] = [self._serialize_row(row) for row in page['items']]
+        return page
+
+    def get_tools_page(self, server_id: str, **options) -> Dict[str, Any]:
+        """Page of one server's tools; see list_page for the options"""
+        page = self.list_page('tools', filters={'server_id': server_id}, **options)
+        page['items'] = [self._serialize_row(row) for row in page['items']]
+        return page
+
+    @staticmethod
+    def _serialize_row(row: Dict[str, Any]) -> Dict[str, Any]:
+        """JSON-ready copy of a row: ids and timestamps as strings, parameters as a list"""
+        result = {}
+        for key, value in row.items():
+            if key == 'parameters':
+                value = DatabaseManager._parse_parameters(value)
+            elif isinstance(value, datetime):
+                value = value.isoformat()
+            elif isinstance(value, uuid.UUID):
+                value = str(value)
+            result[key] = value
+        return result
+
+    def add_catalog_listener(self, listener):
+        """Call listener(entity, entity_id) after this process changes the catalog"""
+        self.catalog_listeners.append(listener)
+
+    def _notify_catalog_change(self, cursor, entity: str, entity_id: Any):
+        """Tell other processes (LISTEN mcp_catalog_changed) about a catalog write; sent on commit"""
+        payload = json.dumps({'entity': entity, 'id': str(entity_id) if entity_id is not None else None})
+        queries.execute(cursor, 'notify_catalog_change', [CATALOG_CHANNEL, payload])
+
+    def _catalog_changed(self, entity: str, entity_id: Any):
+        """Run local catalog listeners after a committed write"""
+        self.note_write()
+        for listener in self.catalog_listeners:
+            try:
+                listener(entity, str(entity_id) if entity_id is not None else None)
+            except Exception as e:
+                logger.error(f"Catalog listener failed: {e}")
+
+    @staticmethod
+    def _parse_parameters(value: Any) -> List[Dict[str, Any]]:
+        """Tool parameters as a list, whether stored as JSON or as a JSON string"""
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except json.JSONDecodeError:
+                return []
+        if isinstance(value, dict):
+            return [value]
+        return value if isinstance(value, list) else []
+
+    @staticmethod
+    def _map_server(result: Dict[str, Any]) -> Dict[str, Any]:
+        """Map an mcp_servers row to our server_a/server_b naming convention"""
+        if 'finance' in (result['name'] or '').lower() or result['id'] == 'finance-server-001':
+            server_name = 'server_a'
+            port = 3001
+        elif 'test' in (result['name'] or '').lower() or result['id'] == '3d24c70b-7e99-4bb2-8c18-54caa48e5c6e':
+            server_name = 'server_b'
+            port = 3002
+        else:
+            # For unknown servers, assign as server_b or create generic mapping
+            server_name = 'server_b'
+            port = 3002
+
+        return {
+            'id': result['id'],
+            'name': result['name'],
+            'url': result['url'],
+            'status': result['status'],
+            'enabled': result['enabled'],
+            'server_name': server_name,
+            'port': port,
+            'is_active': result['enabled']
+        }
+
     def test_connection(self) -> bool:
         """Test database connection"""
         try:
@@ -63,19 +476,15 @@ class DatabaseManager:
     def get_server_by_name(self, server_name: str) -> Optional[Dict[str, Any]]:
         """Get server information by name"""
         try:
-            with self.get_connection() as conn:
+            with self.get_connection(read_only=True) as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cursor:
                     if server_name == 'server_a':
                         # Look for finance server
-                        cursor.execute(
-                            'SELECT * FROM mcp_servers WHERE name LIKE %s OR id = %s',
-                            ['%finance%', 'finance-server-001']
-                        )
+                        queries.execute(cursor, 'server_by_name', ['%finance%', 'finance-server-001'])
                     else:
                         # Look for weather/general server
-                        cursor.execute(
-                            'SELECT * FROM mcp_servers WHERE name LIKE %s OR id = %s',
-                            ['%MCP Server 2%', 'f2f47d1f-3fcd-4cee-b560-2a89f510a6f2']
+                        queries.execute(
+                            cursor, 'server_by_name', ['%MCP Server 2%', 'f2f47d1f-3fcd-4cee-b560-2a89f510a6f2']
                         )
 
                     result = cursor.fetchone()
@@ -97,9 +506,9 @@ class DatabaseManager:
     def get_server_by_url(self, url: str) -> Optional[Dict[str, Any]]:
         """Get server information by URL"""
         try:
-            with self.get_connection() as conn:
+            with self.get_connection(read_only=True) as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                    cursor.execute('SELECT * FROM mcp_servers WHERE url = %s', [url])
+                    queries.execute(cursor, 'server_by_url', [url])
                     result = cursor.fetchone()
                     return result
         except Exception as e:
@@ -111,9 +520,8 @@ class DatabaseManager:
         try:
             with self.get_connection() as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                    cursor.execute(
-                        '''INSERT INTO mcp_servers (id, name, url, status, enabled)
-                           VALUES (%s, %s, %s, %s, %s) RETURNING *''',
+                    queries.execute(
+                        cursor, 'insert_server',
                         [
                             server_data['id'],
                             server_data['name'],
@@ -123,7 +531,9 @@ class DatabaseManager:
                         ]
                     )
                     row = cursor.fetchone()
+                    self._notify_catalog_change(cursor, 'server', server_data['id'])
                     conn.commit()
+                    self._catalog_changed('server', server_data['id'])
                     return row
         except Exception as e:
             logger.error(f"Error creating server: {e}")
@@ -133,79 +543,24 @@ class DatabaseManager:
         """Get all servers"""
         servers = []
         try:
-            with self.get_connection() as conn:
-                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                    cursor.execute('SELECT * FROM mcp_servers ORDER BY name')
-                    results = cursor.fetchall()
-
-                    logger.info(f"Found {len(results)} servers in database")
-
-                    for result in results:
-                        logger.info(f"Processing server: {result['name']} (ID: {result['id']})")
-
-                        # Map existing servers to our naming convention
-                        if 'finance' in result['name'].lower() or result['id'] == 'finance-server-001':
-                            server_name = 'server_a'
-                            port = 3001
-                        elif 'test' in result['name'].lower() or result['id'] == '3d24c70b-7e99-4bb2-8c18-54caa48e5c6e':
-                            server_name = 'server_b'
-                            port = 3002
-                        else:
-                            # For unknown servers, assign as server_b or create generic mapping
-                            server_name = 'server_b'
-                            port = 3002
-
-                        servers.append({
-                            'id': result['id'],
-                            'name': result['name'],
-                            'url': result['url'],
-                            'status': result['status'],
-                            'enabled': result['enabled'],
-                            'server_name': server_name,
-                            'port': port,
-                            'is_active': result['enabled']
-                        })
+            for result in self.iter_rows(f'SELECT {SERVER_COLUMNS} FROM mcp_servers ORDER BY name', name='all_servers'):
+                logger.debug(f"Processing server: {result['name']} (ID: {result['id']})")
+                servers.append(self._map_server(result))
 
-                    logger.info(f"Returning {len(servers)} mapped servers")
+            logger.debug(f"Returning {len(servers)} mapped servers")
         except Exception as e:
             logger.error(f"Error getting all servers: {e}")
         return servers
 
     def get_tools_by_server(self, server_id: str) -> List[Dict[str, Any]]:
         """Get all tools for a specific server"""
-        logger.info(f"Fetching tools for server_id: {server_id}")
+        logger.debug(f"Fetching tools for server_id: {server_id}")
         tools = []
         try:
-            with self.get_connection() as conn:
-                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                    cursor.execute('SELECT * FROM tools WHERE server_id = %s ORDER BY name', [server_id])
-                    results = cursor.fetchall()
-                    logger.info(f"Found {len(results)} tools for server_id: {server_id}")
-
-                    for row in results:
-                        parameters = []
-                        if row['parameters']:
-                            if isinstance(row['parameters'], str):
-                                try:
-                                    parameters = json.loads(row['parameters'])
-                                except json.JSONDecodeError:
-                                    parameters = [] # Or handle error appropriately
-                            elif isinstance(row['parameters'], list):
-                                parameters = row['parameters']
-
-                        tools.append({
-                            'id': row['id'],
-                            'name': row['name'],
-                            'description': row['description'],
-                            'parameters': parameters,
-                            'server_id': row['server_id'],
-                            'created_at': row['created_at'].isoformat() if row['created_at'] else None,
-                            'updated_at': row['updated_at'].isoformat() if row['updated_at'] else None,
-                            'api_url': row['api_url'],
-                            'http_method': row['http_method'],
-                            'request_headers': row['request_headers'],
-                            'request_body': row['request_body']
-                        })
+            rows = self.iter_rows(f'SELECT {TOOL_COLUMNS} FROM tools WHERE server_id = %s ORDER BY name', [server_id],
+                                  name='tools_by_server')
+            tools = [self._serialize_row(row) for row in rows]
+            logger.debug(f"Found {len(tools)} tools for server_id: {server_id}")
         except Exception as e:
             logger.error(f"Error getting tools for server {server_id}: {e}")
         return tools
@@ -218,12 +573,9 @@ class DatabaseManager:
     def get_tool_by_name(self, server_id: str, tool_name: str) -> Optional[Dict[str, Any]]:
         """Get a specific tool by name"""
         try:
-            with self.get_connection() as conn:
+            with self.get_connection(read_only=True) as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                    cursor.execute(
-                        'SELECT * FROM tools WHERE server_id = %s AND name = %s',
-                        [server_id, tool_name]
-                    )
+                    queries.execute(cursor, 'tool_by_name', [server_id, tool_name])
                     row = cursor.fetchone()
 
                     if row:
@@ -269,9 +621,8 @@ class DatabaseManager:
         try:
             with self.get_connection() as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                    cursor.execute(
-                        '''INSERT INTO tools (id, name, description, parameters, server_id, api_url, http_method)
-                           VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING *''',
+                    queries.execute(
+                        cursor, 'insert_tool',
                         [
                             tool_data['id'],
                             tool_data['name'],
@@ -279,22 +630,143 @@ class DatabaseManager:
                             json.dumps(tool_data['parameters']),
                             tool_data['server_id'],
                             tool_data['api_url'],
-                            tool_data['http_method']
+                            tool_data['http_method'],
+                            tool_data.get('speculative'),
+                            tool_data.get('answer_template')
                         ]
                     )
                     row = cursor.fetchone()
+                    self._notify_catalog_change(cursor, 'tool', tool_data['id'])
                     conn.commit()
+                    self._catalog_changed('tool', tool_data['id'])
                     return row
         except Exception as e:
             logger.error(f"Error registering tool: {e}")
             raise
 
+    def get_server_refs(self) -> Dict[str, str]:
+        """Server ids keyed by id and by server_a/server_b name, for resolving imported rows"""
+        refs = {}
+        for row in self.iter_rows(f'SELECT {SERVER_COLUMNS} FROM mcp_servers ORDER BY id', name='server_refs'):
+            refs[row['id']] = row['id']
+            refs.setdefault(self._map_server(row)['server_name'], row['id'])
+        return refs
+
+    def import_tools(self, rows, default_server_id: Optional[str] = None, upsert: bool = False,
+                     strict: bool = False) -> Dict[str, Any]:
+        """Validate and load tools in bulk with COPY, in one transaction
+
+        `rows` yields (line number, row, parse error) as from tool_bulk.read_rows.
+        Invalid rows are reported and left out; with `strict` any invalid row
+        aborts the whole import. Rows whose id (or server and name) already
+        exists are skipped, or updated by id when `upsert` is set.
+        """
+        servers = self.get_server_refs()
+        errors = []
+        rejected = 0
+        valid = 0
+        seen_ids = set()
+        seen_names = set()
+
+        def reject(line_no: int, messages: List[str]):
+            nonlocal rejected
+            rejected += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({'line': line_no, 'errors': messages})
+
+        # Valid rows are spooled in COPY format, so memory stays bounded for large imports
+        with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024, mode='w+') as spool:
+            for line_no, row, parse_error in rows:
+                if parse_error:
+                    reject(line_no, [parse_error])
+                    continue
+                tool, messages = validate_tool(row, servers, default_server_id)
+                if tool is not None:
+                    if tool['id'] in seen_ids:
+                        messages = [f"Duplicate id '{tool['id']}' in this import"]
+                    elif (tool['server_id'], tool['name']) in seen_names:
+                        messages = [f"Duplicate tool name '{tool['name']}' for this server in this import"]
+                if messages:
+                    reject(line_no, messages)
+                    continue
+                seen_ids.add(tool['id'])
+                seen_names.add((tool['server_id'], tool['name']))
+                spool.write(copy_line(tool))
+                valid += 1
+
+            report = {'received': valid + rejected, 'imported': 0, 'skipped': 0,
+                      'rejected': rejected, 'errors': errors}
+            if valid == 0 or (strict and rejected):
+                return report
+
+            spool.seek(0)
+            columns = ', '.join(COPY_COLUMNS)
+            if upsert:
+                updates = ', '.join(f'{column} = EXCLUDED.{column}' for column in COPY_COLUMNS if column != 'id')
+                conflict = f'ON CONFLICT (id) DO UPDATE SET {updates}, updated_at = now()'
+            else:
+                conflict = 'ON CONFLICT DO NOTHING'
+
+            start = time.perf_counter()
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute('CREATE TEMP TABLE tools_import (LIKE tools INCLUDING DEFAULTS) ON COMMIT DROP')
+                    cursor.copy_expert(f'COPY tools_import ({columns}) FROM STDIN', spool)
+                    cursor.execute(f'INSERT INTO tools ({columns}) SELECT {columns} FROM tools_import {conflict}')
+                    report['imported'] = cursor.rowcount
+                    report['skipped'] = valid - cursor.rowcount
+                    self._notify_catalog_change(cursor, 'tool', None)
+            queries.record('import_tools', (time.perf_counter() - start) * 1000, valid)
+
+        self._catalog_changed('tool', None)
+        logger.info(f"Imported {report['imported']} tools ({report['skipped']} skipped, {rejected} rejected)")
+        return report
+
+    def iter_tools_export(self, server_id: Optional[str] = None):
+        """Yield every tool (optionally one server's) as JSON-ready dicts from a server-side cursor"""
+        query = f'SELECT {TOOL_COLUMNS} FROM tools'
+        params = []
+        if server_id:
+            query += ' WHERE server_id = %s'
+            params.append(server_id)
+        query += ' ORDER BY server_id, name, id'
+        for row in self.iter_rows(query, params, name='export_tools'):
+            yield self._serialize_row(row)
+
+    def get_tool_by_id(self, tool_id: str) -> Optional[Dict[str, Any]]:
+        """A tool as a JSON-ready dict, or None if it does not exist"""
+        with self.get_connection(read_only=True) as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                queries.execute(cursor, 'tool_by_id', [tool_id])
+                row = cursor.fetchone()
+                return self._serialize_row(row) if row else None
+
+    def iter_tool_search_rows(self):
+        """Yield every tool's id, name, description and server_id, for building the search index"""
+        query = 'SELECT id, name, description, server_id FROM tools'
+        for row in self.iter_rows(query, name='search_index_load'):
+            yield dict(row, id=str(row['id']))
+
+    def search_tools(self, query: str, server_id: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Tools matching a search by name and description words (as prefixes) or by a similar name
+
+        Ranked by full-text rank plus name trigram similarity; needs migration 0003.
+        """
+        tsquery = prefix_tsquery(query)
+        if not tsquery:
+            return []
+        with self.get_connection(read_only=True) as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                queries.execute(cursor, 'search_tools', [tsquery, query, server_id, limit])
+                return [dict(row, id=str(row['id']), score=round(float(row['score']), 4))
+                        for row in cursor.fetchall()]
+
     def get_server_tools_count(self, server_id: str) -> int:
         """Get count of tools for a server"""
         try:
-            with self.get_connection() as conn:
+            with self.get_connection(read_only=True) as conn:
                 with conn.cursor() as cursor:
-                    cursor.execute('SELECT COUNT(*) as count FROM tools WHERE server_id = %s', [server_id])
+                    queries.execute(cursor, 'count_tools_by_server', [server_id])
                     result = cursor.fetchone()
                     return result[0] if result else 0
         except Exception as e:
@@ -310,20 +782,23 @@ class DatabaseManager:
         try:
             with self.get_connection() as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                    cursor.execute(
-                        '''UPDATE tools SET name = %s, description = %s, parameters = %s, api_url = %s, http_method = %s
-                           WHERE id = %s RETURNING *''',
+                    queries.execute(
+                        cursor, 'update_tool',
                         [
                             tool_data['name'],
                             tool_data['description'],
                             json.dumps(tool_data['parameters']),
                             tool_data['api_url'],
                             tool_data['http_method'],
-                            tool_id
+                            tool_id,
+                            tool_data.get('speculative'),
+                            tool_data.get('answer_template')
                         ]
                     )
                     row = cursor.fetchone()
+                    self._notify_catalog_change(cursor, 'tool', tool_id)
                     conn.commit()
+                    self._catalog_changed('tool', tool_id)
                     return row
         except Exception as e:
             logger.error(f"Error updating tool {tool_id}: {e}")
@@ -334,33 +809,67 @@ class DatabaseManager:
         try:
             with self.get_connection() as conn:
                 with conn.cursor() as cursor:
-                    cursor.execute('DELETE FROM tools WHERE id = %s', [tool_id])
+                    queries.execute(cursor, 'delete_tool', [tool_id])
+                    changed = cursor.rowcount > 0
+                    self._notify_catalog_change(cursor, 'tool', tool_id)
                     conn.commit()
-                    return cursor.rowcount > 0
+                    self._catalog_changed('tool', tool_id)
+                    return changed
         except Exception as e:
             logger.error(f"Error deleting tool {tool_id}: {e}")
             return False
 
+    def load_conversation(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """A spilled conversation's agent_id, data (decoded) and updated_at (epoch seconds), or None"""
+        with self.get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                queries.execute(cursor, 'conversation_by_id', [conversation_id])
+                row = cursor.fetchone()
+                if row is None:
+                    return None
+                data = row['data']
+                return {
+                    'agent_id': str(row['agent_id']),
+                    'data': json.loads(data) if isinstance(data, str) else data,
+                    'updated_at': float(row['updated_at'])
+                }
+
+    def save_conversation(self, conversation_id: str, agent_id: str, data: str, updated_at: float):
+        """Insert or replace a spilled conversation; `data` is its JSON record"""
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                queries.execute(cursor, 'upsert_conversation', [conversation_id, agent_id, data, updated_at])
+
+    def delete_conversations_before(self, before: float) -> int:
+        """Drop spilled conversations last updated before `before` (epoch seconds)"""
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                queries.execute(cursor, 'delete_conversations_before', [before])
+                return cursor.rowcount
+
     def log_tool_execution(self, tool_id: str, server_id: str, params: Dict[str, Any],
                           result: Dict[str, Any], status: str, execution_time_ms: int):
         """Log tool execution (simplified for existing structure)"""
-        logger.info(f"[{datetime.now().isoformat()}] Tool {tool_id} execution: {status} ({execution_time_ms}ms)")
+        logger.info(f"Tool {tool_id} execution: {status} ({execution_time_ms}ms)", extra={
+            'tool_id': tool_id, 'server_id': server_id, 'status': status, 'execution_time_ms': execution_time_ms
+        })
 
     def create_agent(self, agent_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create a new agent"""
         try:
             with self.get_connection() as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                    cursor.execute(
-                        '''INSERT INTO agents (name, description)
-                           VALUES (%s, %s) RETURNING *''',
+                    queries.execute(
+                        cursor, 'insert_agent',
                         [
                             agent_data['name'],
                             agent_data['description']
                         ]
                     )
                     row = cursor.fetchone()
+                    self._notify_catalog_change(cursor, 'agent', row['id'] if row else None)
                     conn.commit()
+                    self._catalog_changed('agent', row['id'] if row else None)
                     return row
         except Exception as e:
             logger.error(f"Error creating agent: {e}")
@@ -369,11 +878,7 @@ class DatabaseManager:
     def get_all_agents(self) -> List[Dict[str, Any]]:
         """Get all agents"""
         try:
-            with self.get_connection() as conn:
-                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                    cursor.execute('SELECT * FROM agents ORDER BY name')
-                    results = cursor.fetchall()
-                    return results
+            return list(self.iter_rows(f'SELECT {AGENT_COLUMNS} FROM agents ORDER BY name', name='all_agents'))
         except Exception as e:
             logger.error(f"Error getting all agents: {e}")
             return []
@@ -381,9 +886,9 @@ class DatabaseManager:
     def get_agent_by_id(self, agent_id: str) -> Optional[Dict[str, Any]]:
         """Get agent information by id"""
         try:
-            with self.get_connection() as conn:
+            with self.get_connection(read_only=True) as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                    cursor.execute('SELECT * FROM agents WHERE id = %s', [agent_id])
+                    queries.execute(cursor, 'agent_by_id', [agent_id])
                     result = cursor.fetchone()
                     return result
         except Exception as e:
@@ -395,9 +900,8 @@ class DatabaseManager:
         try:
             with self.get_connection() as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                    cursor.execute(
-                        '''UPDATE agents SET name = %s, description = %s, updated_at = CURRENT_TIMESTAMP
-                           WHERE id = %s RETURNING *''',
+                    queries.execute(
+                        cursor, 'update_agent',
                         [
                             agent_data['name'],
                             agent_data['description'],
@@ -405,7 +909,9 @@ class DatabaseManager:
                         ]
                     )
                     row = cursor.fetchone()
+                    self._notify_catalog_change(cursor, 'agent', agent_id)
                     conn.commit()
+                    self._catalog_changed('agent', agent_id)
                     return row
         except Exception as e:
             logger.error(f"Error updating agent {agent_id}: {e}")
@@ -416,9 +922,12 @@ class DatabaseManager:
         try:
             with self.get_connection() as conn:
                 with conn.cursor() as cursor:
-                    cursor.execute('DELETE FROM agents WHERE id = %s', [agent_id])
+                    queries.execute(cursor, 'delete_agent', [agent_id])
+                    changed = cursor.rowcount > 0
+                    self._notify_catalog_change(cursor, 'agent', agent_id)
                     conn.commit()
-                    return cursor.rowcount > 0
+                    self._catalog_changed('agent', agent_id)
+                    return changed
         except Exception as e:
             logger.error(f"Error deleting agent {agent_id}: {e}")
             return False
@@ -428,12 +937,10 @@ class DatabaseManager:
         try:
             with self.get_connection() as conn:
                 with conn.cursor() as cursor:
-                    cursor.execute(
-                        '''INSERT INTO agent_mcp_servers (agent_id, server_id)
-                           VALUES (%s, %s)''',
-                        [agent_id, server_id]
-                    )
+                    queries.execute(cursor, 'insert_agent_server', [agent_id, server_id])
+                    self._notify_catalog_change(cursor, 'agent', agent_id)
                     conn.commit()
+                    self._catalog_changed('agent', agent_id)
                     return True
         except Exception as e:
             logger.error(f"Error adding server {server_id} to agent {agent_id}: {e}")
@@ -444,13 +951,12 @@ class DatabaseManager:
         try:
             with self.get_connection() as conn:
                 with conn.cursor() as cursor:
-                    cursor.execute(
-                        '''DELETE FROM agent_mcp_servers
-                           WHERE agent_id = %s AND server_id = %s''',
-                        [agent_id, server_id]
-                    )
+                    queries.execute(cursor, 'delete_agent_server', [agent_id, server_id])
+                    changed = cursor.rowcount > 0
+                    self._notify_catalog_change(cursor, 'agent', agent_id)
                     conn.commit()
-                    return cursor.rowcount > 0
+                    self._catalog_changed('agent', agent_id)
+                    return changed
         except Exception as e:
             logger.error(f"Error removing server {server_id} from agent {agent_id}: {e}")
             return False
@@ -459,40 +965,65 @@ class DatabaseManager:
         """Get all servers for a specific agent"""
         servers = []
         try:
-            with self.get_connection() as conn:
+            with self.get_connection(read_only=True) as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                    cursor.execute(
-                        '''SELECT s.* FROM mcp_servers s
-                           JOIN agent_mcp_servers ams ON s.id = ams.server_id
-                           WHERE ams.agent_id = %s''',
-                        [agent_id]
-                    )
+                    queries.execute(cursor, 'servers_for_agent', [agent_id])
                     results = cursor.fetchall()
-
-                    for result in results:
-                        if 'finance' in result['name'].lower() or result['id'] == 'finance-server-001':
-                            server_name = 'server_a'
-                            port = 3001
-                        elif 'test' in result['name'].lower() or result['id'] == '3d24c70b-7e99-4bb2-8c18-54caa48e5c6e':
-                            server_name = 'server_b'
-                            port = 3002
-                        else:
-                            server_name = 'server_b'
-                            port = 3002
-
-                        servers.append({
-                            'id': result['id'],
-                            'name': result['name'],
-                            'url': result['url'],
-                            'status': result['status'],
-                            'enabled': result['enabled'],
-                            'server_name': server_name,
-                            'port': port,
-                            'is_active': result['enabled']
-                        })
+                    servers = [self._map_server(result) for result in results]
         except Exception as e:
             logger.error(f"Error getting servers for agent {agent_id}: {e}")
         return servers
 
-# Global database manager instance
-db_manager = DatabaseManager()
\ No newline at end of file
+    def get_agent_context(self, agent_id: str) -> Optional[Dict[str, Any]]:
+        """Get an agent with its servers and their tools in one query"""
+        try:
+            with self.get_connection(read_only=True) as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                    queries.execute(cursor, 'agent_context', [agent_id])
+                    row = cursor.fetchone()
+                    if not row:
+                        return None
+
+                    servers = []
+                    for server_row in row['servers']:
+                        server = self._map_server(server_row)
+                        server['tools'] = []
+                        for tool in server_row['tools']:
+                            tool['parameters'] = self._parse_parameters(tool['parameters'])
+                            server['tools'].append(build_mcp_tool(tool, server['server_name']))
+                        servers.append(server)
+
+                    return {
+                        'agent': {
+                            'id': str(row['id']),
+                            'name': row['name'],
+                            'description': row['description'],
+                            'created_at': row['created_at'].isoformat() if row['created_at'] else None,
+                            'updated_at': row['updated_at'].isoformat() if row['updated_at'] else None
+                        },
+                        'servers': servers
+                    }
+        except Exception as e:
+            logger.error(f"Error getting context for agent {agent_id}: {e}")
+        return None
+
+class LazyDatabaseManager:
+    """Create the DatabaseManager on first use instead of at import time"""
+
+    def __init__(self):
+        self._instance = None
+        self._lock = threading.Lock()
+
+    def _get_instance(self) -> DatabaseManager:
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    with startup_timer.phase('DatabaseManager()'):
+                        self._instance = DatabaseManager()
+        return self._instance
+
+    def __getattr__(self, name):
+        return getattr(self._get_instance(), name)
+
+# Global database manager instance (created lazily on first attribute access)
+db_manager = LazyDatabaseManager()
@@ -0,0 +1,78 @@
+import asyncio
+import os
+import time
+from typing import Dict, Any, Awaitable, Mapping, Optional
+
+# Remaining time budget of a request in milliseconds, passed from service to service
+DEADLINE_HEADER = 'X-Request-Timeout-Ms'
+
+# Upper bound for any request's budget, in seconds
+MAX_DEADLINE = float(os.getenv('REQUEST_DEADLINE_MAX', 30))
+
+# How often a waiting handler checks whether its client went away
+DISCONNECT_POLL_INTERVAL = float(os.getenv('DISCONNECT_POLL_INTERVAL', 0.25))
+
+
+class ClientDisconnected(Exception):
+    """The client went away before the response was ready"""
+
+
+class Deadline:
+    """A point in (monotonic) time by which a request must finish"""
+
+    def __init__(self, timeout: float):
+        self.expires_at = time.monotonic() + timeout
+
+    @classmethod
+    def from_headers(cls, headers: Mapping[str, str], default: float,
+                     maximum: float = MAX_DEADLINE) -> 'Deadline':
+        """Deadline from the caller's DEADLINE_HEADER, or `default` seconds, capped at `maximum`"""
+        timeout = default
+        value = headers.get(DEADLINE_HEADER)
+        if value:
+            try:
+                timeout = float(value) / 1000
+            except ValueError:
+                pass
+        return cls(max(0.0, min(timeout, maximum)))
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def headers(self) -> Dict[str, str]:
+        """Header passing the remaining budget to the next service"""
+        return {DEADLINE_HEADER: str(int(self.remaining() * 1000))}
+
+
+async def cancel_on_disconnect(request, awaitable: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+    """Await `awaitable`, cancelling it if the client disconnects or `timeout` passes
+
+    Raises ClientDisconnected or asyncio.TimeoutError in those cases. The
+    request body must already have been read.
+    """
+    work = asyncio.ensure_future(awaitable)
+
+    async def watch():
+        while not await request.is_disconnected():
+            await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+
+    watcher = asyncio.ensure_future(watch())
+    try:
+        done, _ = await asyncio.wait({work, watcher}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        work.cancel()
+        raise
+    finally:
+        watcher.cancel()
+
+    if work in done:
+        return work.result()
+    work.cancel()
+    if watcher in done:
+        # is_disconnected() failing also means the connection is unusable
+        watcher.exception()
+        raise ClientDisconnected()
+    raise asyncio.TimeoutError()
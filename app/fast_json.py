@@ -0,0 +1,60 @@
+import json
+from typing import Any, Mapping, Optional
+
+from fastapi.responses import JSONResponse, Response
+
+# orjson is several times faster than the json module for both directions;
+# the json module is used when it is not installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    """Fallback for values neither encoder handles natively (Decimal, sets, ...)"""
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    return str(value)
+
+
+def dumps(value: Any) -> bytes:
+    """Compact UTF-8 JSON"""
+    if orjson is not None:
+        return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data: Any) -> Any:
+    """Parse JSON from bytes or str"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with dumps"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class RawJSONResponse(Response):
+    """Response for a body that is already JSON bytes, sent as-is"""
+
+    media_type = 'application/json'
+
+    def __init__(self, content: bytes, status_code: int = 200, headers: Optional[Mapping[str, str]] = None):
+        super().__init__(content=content, status_code=status_code, headers=headers)
+
+
+def splice_prefix(fields: Mapping[str, Any], raw_field: str) -> bytes:
+    """Start of a JSON object of `fields`, ending just before the value of `raw_field`"""
+    head = dumps(dict(fields))
+    separator = b',' if len(head) > 2 else b''
+    return head[:-1] + separator + dumps(raw_field) + b':'
+
+
+def splice_object(fields: Mapping[str, Any], raw_field: str, raw: bytes) -> bytes:
+    """JSON object of `fields` plus `raw_field` whose value is the already-encoded `raw`"""
+    return splice_prefix(fields, raw_field) + raw + b'}'
@@ -1,16 +1,18 @@
+import asyncio
 import json
 import logging
 import os
 from datetime import datetime
-from typing import Dict, List, Any, Optional
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import HTMLResponse, JSONResponse
-from fastapi.staticfiles import StaticFiles
+from typing import Dict, List, Any, AsyncIterator, Awaitable, Callable, Iterator, Optional, Tuple
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
 import uvicorn
-import google.generativeai as genai
 import re
+import tempfile
+import time
 import uuid
+from contextlib import AsyncExitStack
 
 import sys
 import os
@@ -18,12 +20,49 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 if current_dir not in sys.path:
     sys.path.insert(0, current_dir)
 
-from database import db_manager
+from startup_timing import startup_timer
+from structured_logging import logging_pipeline, request_context_middleware, outgoing_headers
+from health import health_monitor, http_check
+from circuit_breaker import circuit_breakers, CircuitOpenError
+from single_flight import single_flight, payload_key
+from admission import admission, AdmissionRejected, parse_priority, INTERACTIVE, BATCH
+from catalog_cache import catalog_cache, CatalogChangeListener
+from tool_search import ToolSearchService
+from database import db_manager, PoolExhausted, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from queries import queries
+from fast_json import FastJSONResponse, loads, splice_prefix
+from deadlines import Deadline, ClientDisconnected, cancel_on_disconnect
+from compression import CompressionMiddleware, compression_stats
+from chat_session import ChatSession, Progress
+from speculation import Speculation, speculation_stats, SPECULATION_ENABLED, SPECULATION_MAX_CANDIDATES, SPECULATION_MIN_SCORE
+from answer_templates import answer_template_stats, render_answer, validate_template
+from tool_plans import PLAN_DEADLINE, PLAN_INSTRUCTIONS, OK as PLAN_OK, PlanError, execute_plan, parse_plan
+from conversations import Conversation, ConversationStore, CONVERSATION_SPILL, make_spill
+from http_cache import NO_STORE, HashedStaticFiles, version_etag, etag_matches, validator_headers, not_modified
+from tool_bulk import FORMATS, read_rows, export_ndjson, export_csv
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+logging_pipeline.configure('frontend_api')
 logger = logging.getLogger(__name__)
 
+# google.generativeai takes longer to import than the rest of this service
+# combined, so it is loaded on the first request that needs it
+_genai = None
+
+def get_genai():
+    """Import and configure the Gemini SDK on first use"""
+    global _genai
+    if _genai is None:
+        api_key = os.getenv('GOOGLE_API_KEY')
+        if not api_key:
+            raise HTTPException(status_code=500, detail="Gemini API key not configured")
+
+        with startup_timer.phase('google.generativeai', 'lazy'):
+            import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        _genai = genai
+    return _genai
+
 # Setup templates and static files
 current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(current_dir)  # Go up one level to project root
@@ -36,37 +75,356 @@ os.makedirs(static_dir, exist_ok=True)
 
 templates = Jinja2Templates(directory=templates_dir)
 
-app = FastAPI(title="MCP Frontend API", description="Unified API for both MCP Servers")
+# Static files are served under content-hashed names; templates link them with static_url()
+static_files = HashedStaticFiles(directory=static_dir)
+templates.env.globals['static_url'] = static_files.url
+
+app = FastAPI(title="MCP Frontend API", description="Unified API for both MCP Servers",
+              default_response_class=FastJSONResponse)
 
-# Add middleware to prevent caching for all responses
+# Innermost, so it compresses the final body and headers of every route
+app.add_middleware(CompressionMiddleware)
+
+# Responses are not stored unless their route chose a caching policy
 @app.middleware("http")
 async def add_cache_control_headers(request, call_next):
     response = await call_next(request)
+    if "Cache-Control" not in response.headers:
+        response.headers["Cache-Control"] = NO_STORE
+    return response
 
-    # Add cache control headers to all responses
-    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate, max-age=0"
-    response.headers["Pragma"] = "no-cache"
-    response.headers["Expires"] = "0"
+# Registered last so it is the outermost middleware and its context covers the access log
+app.middleware("http")(request_context_middleware)
 
-    return response
 
-# Mount static files with cache control
-class NoCacheStaticFiles(StaticFiles):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+# Database calls not made through db_call still shed load instead of failing with a 500
+@app.exception_handler(PoolExhausted)
+async def pool_exhausted_handler(request: Request, e: PoolExhausted):
+    return FastJSONResponse(status_code=503, content={'detail': str(e)}, headers={"Retry-After": str(e.retry_after)})
+
+app.mount("/static", static_files, name="static")
+
+
+def on_remote_catalog_change(entity: Optional[str], entity_id: Optional[str]):
+    """A catalog write from another process: read from the primary for a while and drop cached reads"""
+    db_manager.note_write()
+    catalog_cache.invalidate(entity, entity_id)
+    tool_search.on_catalog_change(entity, entity_id)
+
+catalog_listener = CatalogChangeListener(lambda: db_manager.connect(), on_remote_catalog_change)
+
+# In-process tool search index, built in the background and updated per changed tool
+tool_search = ToolSearchService(db_manager.iter_tool_search_rows, db_manager.get_tool_by_id)
+
+# Chat history per conversation id, so follow-up questions have context
+conversation_store = ConversationStore(spill=make_spill(CONVERSATION_SPILL, db_manager))
+
+CONVERSATION_ID = re.compile(r'[A-Za-z0-9_-]{1,64}')
+
+# Tools offered to Gemini for selection; larger catalogs are narrowed down by search first
+ROUTER_MAX_TOOLS = int(os.getenv('ROUTER_MAX_TOOLS', 50))
+
+# Host key used to limit concurrent Gemini calls
+GEMINI_HOST = 'generativelanguage.googleapis.com'
+
+# MCP servers this API talks to, checked in the background for /readyz and status pages
+MCP_SERVER_URLS = {
+    'server_a': 'http://localhost:3001',
+    'server_b': 'http://localhost:3002'
+}
+
+# Connections kept open to each MCP server by the shared client
+HTTP_MAX_CONNECTIONS = int(os.getenv('HTTP_MAX_CONNECTIONS', 100))
+HTTP_MAX_KEEPALIVE = int(os.getenv('HTTP_MAX_KEEPALIVE', 20))
+
+# Seconds browsers may reuse a remote server's tool list on the chat page
+REMOTE_TOOLS_MAX_AGE = int(os.getenv('REMOTE_TOOLS_MAX_AGE', 30))
+
+# Budget of a /tools/execute call when the client does not send one
+TOOL_EXECUTE_DEADLINE = float(os.getenv('TOOL_EXECUTE_DEADLINE', 30))
+
+_http_client = None
+
+def get_http_client():
+    """Shared httpx client, so calls to the MCP servers reuse pooled keep-alive connections"""
+    global _http_client
+    if _http_client is None:
+        import httpx
+        _http_client = httpx.AsyncClient(limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE
+        ))
+    return _http_client
+
+
+@app.on_event("startup")
+async def startup_event():
+    """Start background health checks and log how long startup took"""
+    health_monitor.add_check('database', lambda: asyncio.to_thread(db_manager.test_connection))
+    for name, url in MCP_SERVER_URLS.items():
+        health_monitor.add_check(name, http_check(f"{url}/livez"), critical=False)
+    health_monitor.start()
+
+    # Cached agent contexts are dropped on catalog writes from this or any other process
+    db_manager.add_catalog_listener(catalog_cache.invalidate)
+    catalog_listener.start()
+
+    db_manager.add_catalog_listener(tool_search.on_catalog_change)
+    tool_search.start()
+    conversation_store.start()
+
+    startup_timer.mark_ready()
+    startup_timer.log_report('MCP Frontend API')
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background work"""
+    await health_monitor.stop()
+    catalog_listener.stop()
+    tool_search.stop()
+    await asyncio.to_thread(conversation_store.stop)
+    if _http_client is not None:
+        await _http_client.aclose()
+    db_manager.close_pool()
+    logging_pipeline.stop()
+
+
+@app.get("/livez")
+async def liveness_probe():
+    """Liveness probe: the process is up and serving requests"""
+    return health_monitor.liveness()
+
+
+@app.get("/readyz")
+async def readiness_probe():
+    """Readiness probe: cached database and MCP server state"""
+    ready, details = health_monitor.readiness()
+    details['admission'] = admission.snapshot()
+    details['database_pools'] = db_manager.pool_snapshot()
+    return FastJSONResponse(content=details, status_code=200 if ready else 503)
+
+
+# Last tool catalog fetched from each MCP server, served while its breaker is open
+_catalog_cache: Dict[str, List[Dict[str, Any]]] = {}
+
+
+async def fetch_server_tools(server: Dict[str, Any], priority: int = INTERACTIVE) -> List[Dict[str, Any]]:
+    """Fetch a server's tools through its circuit breaker, falling back to the last known catalog
+
+    Concurrent fetches for the same server share one request.
+    """
+    import httpx
+    url = server['url']
+
+    async def fetch(timeout: float) -> List[Dict[str, Any]]:
+        tools_response = await get_http_client().get(f"{url}/tools", timeout=timeout, headers=outgoing_headers())
+        tools_response.raise_for_status()
+        return tools_response.json().get('tools', [])
+
+    async def fetch_admitted() -> List[Dict[str, Any]]:
+        async with admission.admit([('host', circuit_breakers.endpoint(url))], priority):
+            return await circuit_breakers.get(url).call(fetch, max_timeout=10.0)
+
+    try:
+        tools = await single_flight.do(('tools', url), fetch_admitted)
+    except (CircuitOpenError, AdmissionRejected) as e:
+        logger.warning(f"{e}; using cached catalog for server {server['name']}")
+        return _catalog_cache.get(url, [])
+    except (httpx.TimeoutException, httpx.ConnectError):
+        logger.error(f"Could not connect to server {server['name']}")
+        return _catalog_cache.get(url, [])
+
+    _catalog_cache[url] = tools
+    return tools
+
+
+async def call_server_tool(server_url: str, tool_name: str, arguments: Dict[str, Any],
+                           priority: int = INTERACTIVE, deadline: Optional[Deadline] = None) -> bytes:
+    """Call a tool on an MCP server through admission control and its circuit breaker
+
+    Returns the server's JSON body undecoded, so it can be passed through
+    without a parse/re-encode round trip; use loads() where the result is needed.
+    A `deadline` caps the call's timeout and is passed on to the server.
+    """
+    async def call(timeout: float) -> bytes:
+        headers = outgoing_headers()
+        if deadline is not None:
+            headers = {**headers, **deadline.headers()}
+            timeout = min(timeout, deadline.remaining())
+        tool_response = await get_http_client().post(
+            f"{server_url}/tools/call",
+            json={"name": tool_name, "arguments": arguments},
+            timeout=timeout,
+            headers=headers
+        )
+        tool_response.raise_for_status()
+        return tool_response.content
+
+    async def call_admitted() -> bytes:
+        keys = [('tool', tool_name), ('host', circuit_breakers.endpoint(server_url))]
+        async with admission.admit(keys, priority):
+            return await circuit_breakers.get(server_url).call(call, max_timeout=30.0)
+
+    # Identical calls already in flight share one execution (and one admission slot)
+    return await single_flight.do(payload_key('call', server_url, tool_name, arguments), call_admitted)
+
+
+async def load_agent_context(agent_id: str) -> Optional[Dict[str, Any]]:
+    """Agent, servers and tools from one cached query (None if the agent does not exist)"""
+    key = ('agent_context', agent_id)
+    context = catalog_cache.get(key)
+    if context is None:
+        version = catalog_cache.version
+        context = await single_flight.do(key, lambda: asyncio.to_thread(db_manager.get_agent_context, agent_id))
+        if context is not None:
+            catalog_cache.set(key, context, version)
+    return context
+
+
+async def resolve_agent_servers(context: Dict[str, Any], priority: int = INTERACTIVE) -> List[Dict[str, Any]]:
+    """Agent servers with their tools
+
+    Tools normally come from the context query. Servers registered by URL
+    whose tools are not in our database are still asked over HTTP.
+    """
+    servers = context['servers']
+    remote = [server for server in servers if not server['tools']]
+    if not remote:
+        return servers
+
+    catalogs = await asyncio.gather(*(fetch_server_tools(server, priority) for server in remote))
+    fetched = {server['id']: tools for server, tools in zip(remote, catalogs)}
+    # The context is shared through the cache, so copy instead of mutating it
+    return [dict(server, tools=fetched[server['id']]) if server['id'] in fetched else server for server in servers]
+
+
+async def load_servers_for_agent(agent_id: str) -> List[Dict[str, Any]]:
+    """Servers for an agent; concurrent lookups for the same agent share one query"""
+    return await single_flight.do(
+        ('servers_for_agent', agent_id),
+        lambda: asyncio.to_thread(db_manager.get_servers_for_agent, agent_id)
+    )
+
+
+def circuit_open_exception(e: CircuitOpenError) -> HTTPException:
+    """503 with Retry-After for a request to an endpoint whose breaker is open"""
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+def admission_exception(e: AdmissionRejected) -> HTTPException:
+    """429/503 with Retry-After for a request that could not be admitted"""
+    return HTTPException(status_code=e.status_code, detail=e.reason, headers={"Retry-After": str(e.retry_after)})
+
+
+def pool_exhausted_exception(e: PoolExhausted) -> HTTPException:
+    """503 with Retry-After for a request that found every database connection in use"""
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+async def db_call(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking db_manager call in a worker thread, so waiting for a connection never blocks the loop"""
+    try:
+        return await asyncio.to_thread(fn, *args, **kwargs)
+    except PoolExhausted as e:
+        raise pool_exhausted_exception(e)
+
+
+def page_options(limit: int, cursor: Optional[str], fields: Optional[str], name: Optional[str],
+                 prefix: Optional[str]) -> Dict[str, Any]:
+    """Listing query parameters as DatabaseManager.list_page options"""
+    return {
+        "limit": limit,
+        "cursor": cursor,
+        "fields": [field.strip() for field in fields.split(',') if field.strip()] if fields else None,
+        "name": name,
+        "prefix": prefix
+    }
+
+
+def catalog_etag() -> str:
+    """ETag of catalog responses; changes with every catalog write this process hears about
+
+    Read it before the data, so a write landing in between makes the next
+    request fetch again rather than keep the older response.
+    """
+    return version_etag(catalog_cache.version, catalog_cache.ttl)
+
+
+def render_template(name: str, **context) -> str:
+    """Render a template to a string, without a request (pages link static files with static_url)"""
+    return templates.get_template(name).render(**context)
+
+
+async def cached_page(request: Request, key: Tuple[str, ...], render: Callable[[], Awaitable[str]]) -> Response:
+    """HTML page from the fragment cache, rendered by `render` on a miss
+
+    Pages only hold catalog data (agents, servers, tool names), so they are
+    cached and validated by catalog version like the JSON listings.
+    """
+    etag = catalog_etag()
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return not_modified(etag)
+    version = catalog_cache.version
+    html = catalog_cache.get(key)
+    if html is None:
+        html = await render()
+        catalog_cache.set(key, html, version)
+    return HTMLResponse(html, headers=validator_headers(etag))
+
+
+@app.get("/startup")
+async def startup_report():
+    """Startup timing breakdown for this process"""
+    return startup_timer.report()
+
+
+@app.get("/admin/db/queries")
+async def query_stats():
+    """Per-query call counts and timings for this process"""
+    return {"queries": queries.snapshot()}
+
+
+@app.get("/admin/logging")
+async def logging_stats():
+    """Log queue depth and dropped, suppressed and sampled records for this process"""
+    return logging_pipeline.snapshot()
+
 
-    async def __call__(self, scope, receive, send):
-        response = await super().__call__(scope, receive, send)
+@app.get("/admin/search-index")
+async def search_index_stats():
+    """Size, build time and pending updates of the in-process tool search index"""
+    return tool_search.snapshot()
 
-        # Add no-cache headers to static files
-        if hasattr(response, 'headers'):
-            response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-            response.headers["Pragma"] = "no-cache"
-            response.headers["Expires"] = "0"
 
-        return response
+@app.get("/admin/conversations")
+async def conversation_stats():
+    """Conversations and bytes held in memory, spill activity and the prompt history budget"""
+    return conversation_store.snapshot()
 
-app.mount("/static", NoCacheStaticFiles(directory=static_dir), name="static")
+
+@app.get("/admin/speculation")
+async def speculation_report():
+    """Speculative tool calls started, used (hits) and wasted, overall and per tool"""
+    return speculation_stats.snapshot()
+
+
+@app.get("/admin/answer-templates")
+async def answer_template_report():
+    """Answers rendered from tool templates instead of a summary call, fallback reasons and time saved"""
+    return answer_template_stats.snapshot()
+
+
+@app.get("/admin/compression")
+async def compression_report():
+    """Bytes saved and time spent compressing responses in this process"""
+    return compression_stats.snapshot()
+
+
+@app.get("/admin/db/slow-queries")
+async def slow_queries(limit: Optional[int] = Query(None, ge=1)):
+    """Recent slow queries in this process, with redacted parameters and sampled plans"""
+    return queries.slow_log.snapshot(limit)
 
 
 @app.get("/api")
@@ -98,6 +456,9 @@ async def root():
             "delete_tool": "DELETE /tools/{tool_id}",
             "execute_tool": "/tools/execute",
             "server_tools": "/servers/{server_name}/tools",
+            "import_tools": "POST /tools/import",
+            "export_tools": "/tools/export",
+            "agent_context": "/agents/{agent_id}/context",
             "ask_question": "/ask",
             "ask_get": "/ask?question=your_question&server_name=server_a",
             "server_status": "/servers/{server_name}/status",
@@ -112,74 +473,127 @@ async def root():
         "Expires": "0"
     }
 
-    return JSONResponse(content=response_data, headers=headers)
+    return FastJSONResponse(content=response_data, headers=headers)
 
 
 
 
-@app.post("/tools/execute")
-async def execute_tool(request: Dict[str, Any]):
-    """Execute tool on specified server"""
+async def stream_server_tool(http_request: Request, server_url: str, tool_name: str, arguments: Dict[str, Any],
+                             priority: int, deadline: Deadline, head: bytes) -> StreamingResponse:
+    """Call a tool on an MCP server and stream its body back, after `head`, as it arrives
+
+    The admission slots and the upstream connection are held until the body
+    has been sent. Waiting for the server's response is abandoned when the
+    deadline passes or the client disconnects.
+    """
+    import httpx
+    endpoint = circuit_breakers.endpoint(server_url)
+    client = get_http_client()
+    headers = {**outgoing_headers(), **deadline.headers(), 'Accept-Encoding': 'identity'}
+
+    async def open_stream(timeout: float):
+        upstream_request = client.build_request(
+            "POST", f"{server_url}/tools/call",
+            json={"name": tool_name, "arguments": arguments},
+            headers=headers,
+            timeout=min(timeout, deadline.remaining())
+        )
+        upstream = await client.send(upstream_request, stream=True)
+        if upstream.status_code >= 400:
+            await upstream.aread()
+            await upstream.aclose()
+            upstream.raise_for_status()
+        return upstream
+
+    stack = AsyncExitStack()
     try:
-        tool_name = request.get('tool_name')
-        server_name = request.get('server')
-        args = request.get('arguments', {})
+        await stack.enter_async_context(
+            admission.admit([('tool', tool_name), ('host', endpoint)], priority, timeout=deadline.remaining())
+        )
+        upstream = await cancel_on_disconnect(
+            http_request,
+            circuit_breakers.get(server_url).call(open_stream, max_timeout=TOOL_EXECUTE_DEADLINE),
+            timeout=deadline.remaining()
+        )
+        stack.push_async_callback(upstream.aclose)
+    except BaseException:
+        await stack.aclose()
+        raise
 
-        if not tool_name:
-            raise HTTPException(status_code=400, detail="tool_name is required")
-        if not server_name:
-            raise HTTPException(status_code=400, detail="server is required")
+    async def body():
+        start = time.perf_counter()
+        try:
+            yield head
+            async for chunk in upstream.aiter_raw():
+                yield chunk
+            yield b'}'
+        except httpx.HTTPError:
+            # The breaker counted the call a success once the headers arrived
+            circuit_breakers.get(server_url).record(False, (time.perf_counter() - start) * 1000)
+            raise
+        finally:
+            # However the body ends, including a client disconnect cancelling it mid-stream
+            await asyncio.shield(stack.aclose())
 
-        # Validate server
-        server = db_manager.get_server_by_name(server_name)
-        if not server:
-            raise HTTPException(status_code=404, detail=f"Server '{server_name}' not found")
+    # Add cache control headers
+    response_headers = {
+        "Cache-Control": "no-cache, no-store, must-revalidate",
+        "Pragma": "no-cache",
+        "Expires": "0"
+    }
 
-        # Validate tool exists on the server
-        tool = db_manager.get_tool_by_name(server['id'], tool_name)
-        if not tool:
-            raise HTTPException(status_code=404, detail=f"Tool '{tool_name}' not found on server '{server_name}'")
-
-        # Route to appropriate server
-        if server_name == 'server_a':
-            # Call Server A
-            import httpx
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    "http://localhost:3001/tools/call",
-                    json={"name": tool_name, "arguments": args},
-                    timeout=30.0
-                )
-                response_data = {
-                    "tool": tool_name,
-                    "server": server_name,
-                    "result": response.json(),
-                    "status": "success"
-                }
-        else:
-            # Call Server B
-            import httpx
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    "http://localhost:3002/tools/call",
-                    json={"name": tool_name, "arguments": args},
-                    timeout=30.0
-                )
-                response_data = {
-                    "tool": tool_name,
-                    "server": server_name,
-                    "result": response.json(),
-                    "status": "success"
-                }
+    return StreamingResponse(body(), media_type='application/json', headers=response_headers)
 
-        # Add cache control headers
-        headers = {
-            "Cache-Control": "no-cache, no-store, must-revalidate",
-            "Pragma": "no-cache",
-            "Expires": "0"
-        }
 
-        return JSONResponse(content=response_data, headers=headers)
+async def proxy_tool_call(http_request: Request, request: Dict[str, Any]) -> StreamingResponse:
+    """Validate a tool call and stream the MCP server's result back to the client"""
+    tool_name = request.get('tool_name')
+    server_name = request.get('server')
+    args = request.get('arguments', {})
+
+    if not tool_name:
+        raise HTTPException(status_code=400, detail="tool_name is required")
+    if not server_name:
+        raise HTTPException(status_code=400, detail="server is required")
+
+    # Validate server
+    server = await db_call(db_manager.get_server_by_name, server_name)
+    if not server:
+        raise HTTPException(status_code=404, detail=f"Server '{server_name}' not found")
+
+    # Validate tool exists on the server
+    tool = await db_call(db_manager.get_tool_by_name, server['id'], tool_name)
+    if not tool:
+        raise HTTPException(status_code=404, detail=f"Tool '{tool_name}' not found on server '{server_name}'")
+
+    # Route to appropriate server
+    import httpx
+    server_url = MCP_SERVER_URLS['server_a' if server_name == 'server_a' else 'server_b']
+    priority = parse_priority(request.get('priority'), BATCH)
+    deadline = Deadline.from_headers(http_request.headers, default=TOOL_EXECUTE_DEADLINE)
+
+    # The server's body is streamed in as the result instead of being decoded and re-encoded
+    head = splice_prefix({"tool": tool_name, "server": server_name, "status": "success"}, "result")
+    try:
+        return await stream_server_tool(http_request, server_url, tool_name, args, priority, deadline, head)
+    except CircuitOpenError as e:
+        raise circuit_open_exception(e)
+    except AdmissionRejected as e:
+        raise admission_exception(e)
+    except (asyncio.TimeoutError, httpx.TimeoutException):
+        raise HTTPException(status_code=504, detail=f"Tool '{tool_name}' did not respond in time")
+    except ClientDisconnected:
+        # Nobody is left to read this; 499 is what the access log should show
+        raise HTTPException(status_code=499, detail="Client disconnected")
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=f"Error executing tool: {e.response.text}")
+
+
+@app.post("/tools/execute")
+async def execute_tool(http_request: Request):
+    """Execute tool on specified server"""
+    try:
+        return await proxy_tool_call(http_request, await http_request.json())
 
     except HTTPException:
         raise
@@ -188,28 +602,21 @@ async def execute_tool(request: Dict[str, Any]):
         raise HTTPException(status_code=500, detail=f"Failed to execute tool: {str(e)}")
 
 @app.get("/tools/{tool_name}/execute")
-async def execute_tool_get(tool_name: str, server: str, **kwargs):
+async def execute_tool_get(http_request: Request, tool_name: str, server: str, **kwargs):
     """Execute tool using GET request (for simple tools)"""
     try:
         # Convert query parameters to arguments
         args = kwargs
 
-        # Use POST endpoint
-        result = await execute_tool({
+        # Same path as the POST endpoint; its response already carries the cache control headers
+        return await proxy_tool_call(http_request, {
             "tool_name": tool_name,
             "server": server,
             "arguments": args
         })
 
-        # Add cache control headers
-        headers = {
-            "Cache-Control": "no-cache, no-store, must-revalidate",
-            "Pragma": "no-cache",
-            "Expires": "0"
-        }
-
-        return JSONResponse(content=result, headers=headers)
-
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to execute tool: {str(e)}")
 
@@ -219,136 +626,338 @@ async def ask_question(request: Dict[str, Any]):
     try:
         question = request.get('question')
         agent_id = request.get('agent_id')
+        priority = parse_priority(request.get('priority'))
 
         if not question:
             raise HTTPException(status_code=400, detail="question is required")
         if not agent_id:
             raise HTTPException(status_code=400, detail="agent_id is required")
+        conversation = await load_conversation(request.get('conversation_id') or uuid.uuid4().hex, agent_id)
 
-        servers = db_manager.get_servers_for_agent(agent_id)
-        if not servers:
-            raise HTTPException(status_code=404, detail="No servers found for this agent")
-
-        all_tools = []
-        for server in servers:
-            try:
-                import httpx
-                async with httpx.AsyncClient() as client:
-                    tools_response = await client.get(f"{server['url']}/tools", timeout=10.0)
-                    tools_response.raise_for_status()
-                    tools_data = tools_response.json()
-                    all_tools.extend(tools_data.get('tools', []))
-            except (httpx.TimeoutException, httpx.ConnectError):
-                logger.error(f"Could not connect to server {server['name']}")
-
-        if not all_tools:
-            response_data = {"answer": "There are no tools available for this agent."}
-            headers = {
-                "Cache-Control": "no-cache, no-store, must-revalidate",
-                "Pragma": "no-cache",
-                "Expires": "0"
-            }
-            return JSONResponse(content=response_data, headers=headers)
+        async with admission.admit([('agent', agent_id)], priority):
+            response_data = await answer_question(question, agent_id, priority, conversation=conversation)
+        response_data["conversation_id"] = conversation.id
 
-        api_key = os.getenv('GOOGLE_API_KEY')
-        if not api_key:
-            raise HTTPException(status_code=500, detail="Gemini API key not configured")
+        headers = {
+            "Cache-Control": "no-cache, no-store, must-revalidate",
+            "Pragma": "no-cache",
+            "Expires": "0"
+        }
 
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-2.5-flash')
+        return FastJSONResponse(content=response_data, headers=headers)
 
-        tools_for_prompt = [{k: v for k, v in tool.items() if k in ['name', 'description', 'inputSchema', 'server_name']} for tool in all_tools]
+    except HTTPException:
+        raise
+    except AdmissionRejected as e:
+        raise admission_exception(e)
+    except Exception as e:
+        logger.error(f"Error in ask endpoint: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to process question: {str(e)}")
 
-        prompt_select_tool = f"""
-        You are an expert at selecting the correct tool to answer a user's question.
-        Here is the user's question: "{question}"
-        Here is a list of available tools:
-        {json.dumps(tools_for_prompt, indent=2)}
 
-        Based on the user's question, which tool should be used?
-        You must respond with a JSON object with three keys: "tool_name", "arguments", and "server_name".
-        "tool_name" must be the name of the selected tool.
-        "arguments" must be an object containing the arguments for the tool. If the tool has parameters, you must extract the values from the user's question.
-        "server_name" must be the name of the server where the tool is located.
-        If no tool is suitable, respond with {{"tool_name": "none", "arguments": {{}}, "server_name": "none"}}.
-        """
-        response_select_tool = model.generate_content(prompt_select_tool)
-        logger.info(f"Gemini tool selection response: {response_select_tool.text}")
+@app.websocket("/ws/chat/{agent_id}")
+async def chat_socket(websocket: WebSocket, agent_id: str):
+    """Chat session for one agent: many questions over one socket, see ChatSession for the protocol
 
+    The agent's servers are resolved when the session opens and reused for
+    every question, until a catalog change makes them stale. Questions share
+    the conversation named by the `conversation` query parameter (a new one
+    by default), so a reconnecting client keeps its history. The ready
+    message carries the id actually used, which differs when the parameter
+    named another agent's conversation.
+    """
+    await websocket.accept()
+    try:
+        conversation = await load_conversation(websocket.query_params.get('conversation') or uuid.uuid4().hex,
+                                               agent_id)
+        conversation_id = conversation.id
+        servers = await agent_servers(agent_id, INTERACTIVE)
+    except HTTPException as e:
+        await websocket.close(code=4000 + e.status_code, reason=str(e.detail))
+        return
+    resolved = {'servers': servers, 'version': catalog_cache.version}
+
+    async def session_servers() -> List[Dict[str, Any]]:
+        if resolved['version'] != catalog_cache.version:
+            version = catalog_cache.version
+            resolved['servers'] = await agent_servers(agent_id, INTERACTIVE)
+            resolved['version'] = version
+        return resolved['servers']
+
+    async def handle(message: Dict[str, Any], progress: Progress) -> Dict[str, Any]:
+        question = message.get('question')
+        if not question:
+            raise HTTPException(status_code=400, detail="question is required")
+        priority = parse_priority(message.get('priority'))
         try:
-            json_str = response_select_tool.text
-            match = re.search(r"```json\n({.*?})\n```", json_str, re.DOTALL)
-            if match:
-                json_str = match.group(1)
-
-            tool_selection = json.loads(json_str)
-            tool_name = tool_selection.get("tool_name")
-            arguments = tool_selection.get("arguments", {})
-            server_name = tool_selection.get("server_name")
-        except (json.JSONDecodeError, AttributeError):
-            raise HTTPException(status_code=500, detail="Gemini did not return a valid tool selection.")
-
-        if tool_name == "none" or not tool_name:
-            response_data = {"answer": "I'm sorry, I don't have a tool that can answer that question."}
-            headers = {
-                "Cache-Control": "no-cache, no-store, must-revalidate",
-                "Pragma": "no-cache",
-                "Expires": "0"
-            }
-            return JSONResponse(content=response_data, headers=headers)
-
-        target_server = next((s for s in servers if s['server_name'] == server_name), None)
-        if not target_server:
-            raise HTTPException(status_code=404, detail=f"Server '{server_name}' not found for this agent.")
+            async with admission.admit([('agent', agent_id)], priority):
+                return await answer_question(question, agent_id, priority, await session_servers(), progress,
+                                             await load_conversation(conversation_id, agent_id))
+        except AdmissionRejected as e:
+            raise admission_exception(e)
+
+    session = ChatSession(websocket, handle)
+    await session.run({'agent_id': agent_id, 'conversation_id': conversation_id,
+                       'servers': [server['server_name'] for server in servers]})
+
+
+async def load_conversation(conversation_id: str, agent_id: str) -> Conversation:
+    """The agent's conversation with this id from memory or the spill tier, or a new one
+
+    The new one has a different id when this id is another agent's
+    conversation, so callers hand the returned conversation's id back.
+    """
+    if not CONVERSATION_ID.fullmatch(str(conversation_id)):
+        raise HTTPException(status_code=400, detail="conversation_id must be 1-64 letters, digits, '-' or '_'")
+    conversation = conversation_store.cached(conversation_id)
+    if conversation is None and conversation_store.spill is not None:
+        conversation = await asyncio.to_thread(conversation_store.load, conversation_id)
+    return conversation_store.for_agent(conversation_id, agent_id, conversation)
+
+
+async def agent_servers(agent_id: str, priority: int) -> List[Dict[str, Any]]:
+    """The agent's servers with their tools, or 404 when it has none"""
+    context = await load_agent_context(agent_id)
+    if not context or not context['servers']:
+        raise HTTPException(status_code=404, detail="No servers found for this agent")
+    return await resolve_agent_servers(context, priority)
+
+
+async def generate_content(model, prompt: str, priority: int):
+    """Call Gemini without blocking the event loop, within the Gemini host limits"""
+    async with admission.admit([('host', GEMINI_HOST)], priority):
+        return await model.generate_content_async(prompt)
+
+
+def shortlist_tools(question: str, tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """The tools most relevant to the question, when there are too many for one selection prompt
+
+    Tools the search index ranks come first; the rest keep their order.
+    """
+    if len(tools) <= ROUTER_MAX_TOOLS or not tool_search.ready:
+        return tools
+    ids = {str(tool['id']) for tool in tools if tool.get('id')}
+    ranked = [result['id'] for result in tool_search.search(question, tool_ids=ids, limit=ROUTER_MAX_TOOLS)]
+    order = {tool_id: position for position, tool_id in enumerate(ranked)}
+    ordered = sorted(tools, key=lambda tool: order.get(str(tool.get('id')), len(order)))
+    return ordered[:ROUTER_MAX_TOOLS]
+
+
+def speculative_candidates(question: str, tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Calls worth starting before the model has chosen: the best-ranked opted-in tools
+
+    Only tools marked speculative (cheap and idempotent) qualify, and only
+    when they need no arguments, since the arguments are not known until the
+    model has read the question.
+    """
+    if not SPECULATION_ENABLED or not tool_search.ready:
+        return []
+    eligible = {
+        str(tool['id']): tool for tool in tools
+        if tool.get('speculative') and tool.get('id')
+        and not [name for name in tool.get('inputSchema', {}).get('required', []) if name != 'operation']
+    }
+    if not eligible:
+        return []
+    ranked = tool_search.search(question, tool_ids=set(eligible), limit=SPECULATION_MAX_CANDIDATES)
+    return [
+        {'tool_name': eligible[result['id']]['name'], 'server_name': eligible[result['id']]['server_name'],
+         'arguments': {}}
+        for result in ranked if result['score'] >= SPECULATION_MIN_SCORE
+    ]
+
+
+async def answer_question(question: str, agent_id: str, priority: int = INTERACTIVE,
+                          servers: Optional[List[Dict[str, Any]]] = None,
+                          progress: Optional[Progress] = None,
+                          conversation: Optional[Conversation] = None) -> Dict[str, Any]:
+    """Plan tool calls for the question, run them and summarise the results in one answer
+
+    Calls the plan marks as independent run concurrently, all within
+    PLAN_DEADLINE; calls that fail or run out of time are reported in the
+    answer instead of failing it, unless none succeeded.
+
+    `servers` are the agent's resolved servers when the caller already has
+    them (a chat session resolves them once); `progress(stage, details)` is
+    awaited as each stage starts. With a `conversation`, its compacted
+    history goes into the tool selection prompt, so follow-up questions can
+    refer to earlier ones, and the answer is added to it.
+    """
+    async def report(stage: str, **details):
+        if progress is not None:
+            await progress(stage, details)
+
+    def done(result: Dict[str, Any]) -> Dict[str, Any]:
+        if conversation is not None:
+            conversation_store.record(conversation, question, result["answer"],
+                                      result.get("selected_tool"), result.get("server"))
+        return result
+
+    if servers is None:
+        servers = await agent_servers(agent_id, priority)
+    all_tools = shortlist_tools(question, [tool for server in servers for tool in server['tools']])
+
+    if not all_tools:
+        return done({"answer": "There are no tools available for this agent."})
+
+    genai = get_genai()
+    model = genai.GenerativeModel('gemini-2.5-flash')
+
+    tools_for_prompt = [{k: v for k, v in tool.items() if k in ['name', 'description', 'inputSchema', 'server_name']} for tool in all_tools]
+
+    history = conversation.history() if conversation is not None else ''
+    context_for_prompt = f"""
+    Earlier in this conversation (use it to resolve references such as "there" or "the same"):
+    {history}""" if history else ''
+
+    prompt_select_tool = f"""
+    You are an expert at selecting the correct tools to answer a user's question.{context_for_prompt}
+    Here is the user's question: "{question}"
+    Here is a list of available tools:
+    {json.dumps(tools_for_prompt, indent=2)}
+    {PLAN_INSTRUCTIONS}"""
+    servers_by_name = {server['server_name']: server for server in servers}
+
+    # Likely calls start now and overlap the selection call; the plan decides whether they are used
+    speculation = Speculation(speculation_stats)
+
+    async def launch(candidate: Dict[str, Any]) -> bytes:
+        # At batch priority, so speculative calls are the first shed under load
+        return await call_server_tool(servers_by_name[candidate['server_name']]['url'], candidate['tool_name'],
+                                      {"operation": "execute", **candidate['arguments']}, BATCH, Deadline(PLAN_DEADLINE))
+
+    speculation.start([candidate for candidate in speculative_candidates(question, all_tools)
+                       if candidate['server_name'] in servers_by_name], launch)
+    try:
+        return await run_plan(question, model, prompt_select_tool, all_tools, servers_by_name, speculation,
+                              priority, report, done)
+    finally:
+        speculation.close()
+
+
+async def run_plan(question: str, model, prompt_select_tool: str, all_tools: List[Dict[str, Any]],
+                   servers_by_name: Dict[str, Dict[str, Any]], speculation: Speculation, priority: int,
+                   report: Callable[..., Awaitable[None]],
+                   done: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Dict[str, Any]:
+    """The selection, tool calls and summary of answer_question"""
+    import httpx
+    await report("selecting_tool", candidates=len(all_tools))
+    response_select_tool = await generate_content(model, prompt_select_tool, priority)
+    logger.debug(f"Gemini tool selection response: {response_select_tool.text}")
 
-        try:
-            async with httpx.AsyncClient() as client:
-                tool_response = await client.post(
-                    f"{target_server['url']}/tools/call",
-                    json={"name": tool_name, "arguments": {"operation": "execute", **arguments}},
-                    timeout=30.0
-                )
-                tool_response.raise_for_status()
-                tool_result = tool_response.json()
-        except (httpx.TimeoutException, httpx.ConnectError):
-            raise HTTPException(status_code=503, detail=f"Could not execute tool '{tool_name}'.")
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(status_code=e.response.status_code, detail=f"Error executing tool: {e.response.text}")
+    try:
+        plan = parse_plan(response_select_tool.text)
+    except PlanError as e:
+        logger.warning(f"Unusable tool plan: {e}")
+        raise HTTPException(status_code=500, detail="Gemini did not return a valid tool selection.")
 
-        prompt_summarize = f"""
-        You are an expert at summarizing technical information for a user.
-        The user asked: "{question}"
-        To answer this, the tool "{tool_name}" on server "{server_name}" was used.
-        The result from the tool is:
-        {json.dumps(tool_result, indent=2)}
+    speculation.settle(plan)
+    if not plan:
+        return done({"answer": "I'm sorry, I don't have a tool that can answer that question."})
 
-        Based on this information, generate a friendly and concise answer for the user.
-        You MUST mention the tool and the server in your answer. Start your answer with "Using the '{tool_name}' tool on the '{server_name}' server, ...".
-        """
-        response_summarize = model.generate_content(prompt_summarize)
+    errors: Dict[str, HTTPException] = {}
 
-        response_data = {
-            "answer": response_summarize.text,
-            "question": question,
-            "server": server_name,
-            "selected_tool": tool_name,
-            "tool_result": tool_result,
-            "status": "success"
-        }
+    async def run_call(call: Dict[str, Any], arguments: Dict[str, Any], deadline: Deadline) -> Any:
+        tool_name, server_name = call['tool_name'], call['server_name']
+        try:
+            target_server = servers_by_name.get(server_name)
+            if not target_server:
+                raise HTTPException(status_code=404, detail=f"Server '{server_name}' not found for this agent.")
+            await report("executing_tool", call=call['id'], tool=tool_name, server=server_name)
+            try:
+                started = speculation.claim(tool_name, server_name, arguments)
+                if started is not None:
+                    try:
+                        return loads(await started)
+                    except AdmissionRejected:
+                        pass  # Shed as batch work; make the call for real
+                return loads(await call_server_tool(
+                    target_server['url'], tool_name, {"operation": "execute", **arguments}, priority, deadline
+                ))
+            except CircuitOpenError as e:
+                raise circuit_open_exception(e)
+            except (httpx.TimeoutException, httpx.ConnectError):
+                raise HTTPException(status_code=503, detail=f"Could not execute tool '{tool_name}'.")
+            except httpx.HTTPStatusError as e:
+                raise HTTPException(status_code=e.response.status_code, detail=f"Error executing tool: {e.response.text}")
+        except HTTPException as e:
+            errors[call['id']] = e
+            raise
+
+    outcomes = await execute_plan(plan, run_call, Deadline(PLAN_DEADLINE))
+    succeeded = [outcome for outcome in outcomes if outcome['status'] == PLAN_OK]
+    if not succeeded:
+        # Nothing to summarise: report the first failure as a single call always has
+        first = outcomes[0]
+        if first['id'] in errors:
+            raise errors[first['id']]
+        raise HTTPException(status_code=504, detail=first.get('error') or "No tool call succeeded.")
+
+    tool_names = ', '.join(dict.fromkeys(outcome['tool_name'] for outcome in succeeded))
+    server_names = ', '.join(dict.fromkeys(outcome['server_name'] for outcome in succeeded))
+    response = {
+        "question": question,
+        "server": server_names,
+        "selected_tool": tool_names,
+        "tool_result": outcomes[0]['result'] if len(outcomes) == 1
+        else {outcome['id']: outcome['result'] for outcome in succeeded},
+        "plan": [{key: value for key, value in outcome.items() if key != 'result'} for outcome in outcomes],
+        "status": "success" if len(succeeded) == len(outcomes) else "partial"
+    }
+    called = [outcome['tool_name'] for outcome in succeeded]
+
+    # Tools with an answer template answer without a second model call, when every call succeeded
+    reason = 'partial_plan'
+    if len(succeeded) == len(outcomes):
+        start = time.perf_counter()
+        answer_templates = {(tool.get('server_name'), tool['name']): tool.get('answer_template') for tool in all_tools}
+        rendered = [
+            render_answer(answer_templates.get((outcome['server_name'], outcome['tool_name'])), outcome['tool_name'],
+                          outcome['server_name'], outcome.get('arguments'), outcome['result'])
+            for outcome in outcomes
+        ]
+        failed = [attempt['reason'] for attempt in rendered if 'answer' not in attempt]
+        if not failed:
+            answer_template_stats.record_template(called, (time.perf_counter() - start) * 1000)
+            return done(dict(response, answer='\n'.join(attempt['answer'] for attempt in rendered),
+                             answer_source='template'))
+        reason = failed[0]
+
+    if len(outcomes) == 1:
+        tool_name, server_name = outcomes[0]['tool_name'], outcomes[0]['server_name']
+        tool_result = outcomes[0]['result']
+        prompt_summarize = f"""
+    You are an expert at summarizing technical information for a user.
+    The user asked: "{question}"
+    To answer this, the tool "{tool_name}" on server "{server_name}" was used.
+    The result from the tool is:
+    {json.dumps(tool_result, indent=2)}
+
+    Based on this information, generate a friendly and concise answer for the user.
+    You MUST mention the tool and the server in your answer. Start your answer with "Using the '{tool_name}' tool on the '{server_name}' server, ...".
+    """
+    else:
+        calls_for_prompt = [
+            {key: outcome[key] for key in ('tool_name', 'server_name', 'arguments', 'status', 'result', 'error')
+             if key in outcome}
+            for outcome in outcomes
+        ]
+        prompt_summarize = f"""
+    You are an expert at summarizing technical information for a user.
+    The user asked: "{question}"
+    To answer this, these tool calls were made (status "ok" calls have a result, the others an error):
+    {json.dumps(calls_for_prompt, indent=2)}
 
-        headers = {
-            "Cache-Control": "no-cache, no-store, must-revalidate",
-            "Pragma": "no-cache",
-            "Expires": "0"
-        }
+    Based on this information, generate one friendly and concise answer for the user covering every part of the question.
+    You MUST mention each tool used and its server. If a call did not succeed, say briefly which part of the question could not be answered.
+    """
+    await report("summarizing", tool=tool_names, server=server_names)
+    start = time.perf_counter()
+    response_summarize = await generate_content(model, prompt_summarize, priority)
+    answer_template_stats.record_summary(called, reason, (time.perf_counter() - start) * 1000)
 
-        return JSONResponse(content=response_data, headers=headers)
+    return done(dict(response, answer=response_summarize.text, answer_source='model'))
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error in ask endpoint: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to process question: {str(e)}")
 @app.get("/ask")
 async def ask_question_get(question: str, server_url: str = None, server_name: str = None):
     """Ask question using GET request"""
@@ -369,19 +978,26 @@ async def ask_question_get(question: str, server_url: str = None, server_name: s
             "Expires": "0"
         }
 
-        return JSONResponse(content=result, headers=headers)
+        return FastJSONResponse(content=result, headers=headers)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to process question: {str(e)}")
 
 @app.get("/servers")
-async def get_all_servers():
-    """Get all available servers"""
+async def get_all_servers(request: Request, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                          cursor: Optional[str] = None, fields: Optional[str] = None,
+                          name: Optional[str] = None, prefix: Optional[str] = None):
+    """Get a page of servers ordered by name; pass next_cursor back as cursor for the next page"""
+    etag = catalog_etag()
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return not_modified(etag)
     try:
-        servers = db_manager.get_all_servers()
+        options = page_options(limit, cursor, fields, name, prefix)
+        page = await db_call(db_manager.get_servers_page, **options)
+        servers = page['items']
 
-        response_data = {
-            "servers": [
+        if not options['fields']:
+            servers = [
                 {
                     "id": server['id'],
                     "name": server['name'],
@@ -393,51 +1009,46 @@ async def get_all_servers():
                     "is_active": server['is_active']
                 }
                 for server in servers
-            ],
+            ]
+
+        response_data = {
+            "servers": servers,
             "total_servers": len(servers),
+            "next_cursor": page['next_cursor'],
             "timestamp": datetime.now().isoformat()
         }
 
-        # Add cache control headers to prevent caching
-        headers = {
-            "Cache-Control": "no-cache, no-store, must-revalidate",
-            "Pragma": "no-cache",
-            "Expires": "0"
-        }
-
-        return JSONResponse(content=response_data, headers=headers)
+        return FastJSONResponse(content=response_data, headers=validator_headers(etag))
 
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting all servers: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to get servers: {str(e)}")
 
 
 @app.get("/servers/{server_name}/status")
-async def get_server_status(server_name: str):
-    """Get detailed status of a specific server including tools"""
+async def get_server_status(server_name: str, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                            cursor: Optional[str] = None, name: Optional[str] = None,
+                            prefix: Optional[str] = None):
+    """Get detailed status of a specific server including a page of its tools"""
     try:
-        server = db_manager.get_server_by_name(server_name)
+        server = await db_call(db_manager.get_server_by_name, server_name)
         if not server:
             raise HTTPException(status_code=404, detail=f"Server '{server_name}' not found")
 
         # Get tools for this server
-        tools = db_manager.get_tools_by_server(server['id'])
+        page = await db_call(
+            db_manager.get_tools_page, server['id'], **page_options(limit, cursor, None, name, prefix)
+        )
+        tools = page['items']
 
-        # Check if server is responding
-        import httpx
-        server_url = f"http://localhost:{3001 if server_name == 'server_a' else 3002}"
-        status = "unknown"
-
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{server_url}/health", timeout=5.0)
-                if response.status_code == 200:
-                    health_data = response.json()
-                    status = health_data.get('status', 'unknown')
-                else:
-                    status = f"error_{response.status_code}"
-        except:
-            status = "unreachable"
+        # Server and database state come from the background health checker
+        server_url = MCP_SERVER_URLS.get(server_name, f"http://localhost:{3001 if server_name == 'server_a' else 3002}")
+        server_ok = health_monitor.is_ok(server_name)
+        status = "unknown" if server_ok is None else ("healthy" if server_ok else "unreachable")
 
         response_data = {
             "server": {
@@ -448,7 +1059,8 @@ async def get_server_status(server_name: str):
                 "url": server_url,
                 "status": status,
                 "enabled": server['enabled'],
-                "database_status": "connected" if db_manager.test_connection() else "disconnected"
+                "database_status": "connected" if health_monitor.is_ok('database') else "disconnected",
+                "circuit_breaker": circuit_breakers.get(server_url).snapshot()
             },
             "tools": [
                 {
@@ -463,6 +1075,7 @@ async def get_server_status(server_name: str):
                 for tool in tools
             ],
             "tools_count": len(tools),
+            "next_cursor": page['next_cursor'],
             "timestamp": datetime.now().isoformat()
         }
 
@@ -473,13 +1086,49 @@ async def get_server_status(server_name: str):
             "Expires": "0"
         }
 
-        return JSONResponse(content=response_data, headers=headers)
+        return FastJSONResponse(content=response_data, headers=headers)
 
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get server status: {str(e)}")
 
+
+@app.get("/servers/{server_name}/tools")
+async def get_server_tools(request: Request, server_name: str,
+                           limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                           cursor: Optional[str] = None, fields: Optional[str] = None,
+                           name: Optional[str] = None, prefix: Optional[str] = None):
+    """Get a page of a server's tools ordered by name
+
+    The first page of an unfiltered listing also reports the server's total
+    number of tools, so clients can size a scrollable list up front.
+    """
+    etag = catalog_etag()
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return not_modified(etag)
+    server = await db_call(db_manager.get_server_by_name, server_name)
+    if not server:
+        raise HTTPException(status_code=404, detail=f"Server '{server_name}' not found")
+    try:
+        page = await db_call(
+            db_manager.get_tools_page, server['id'], **page_options(limit, cursor, fields, name, prefix)
+        )
+        total = None
+        if not cursor and name is None and not prefix:
+            total = (len(page['items']) if page['next_cursor'] is None
+                     else await db_call(db_manager.get_server_tools_count, server['id']))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get tools: {str(e)}")
+    return FastJSONResponse(content={"tools": page['items'], "next_cursor": page['next_cursor'], "total": total},
+                            headers=validator_headers(etag))
+
 @app.post("/select-server")
 async def select_server(request: Dict[str, Any]):
     """Select a server and get its information with tools"""
@@ -500,11 +1149,11 @@ async def select_server(request: Dict[str, Any]):
                 raise HTTPException(status_code=400, detail="Cannot determine server name from URL")
 
         # Get server info and tools
-        server = db_manager.get_server_by_name(server_name)
+        server = await db_call(db_manager.get_server_by_name, server_name)
         if not server:
             raise HTTPException(status_code=404, detail=f"Server '{server_name}' not found")
 
-        tools = db_manager.get_tools_by_server(server['id'])
+        tools = await db_call(db_manager.get_tools_by_server, server['id'])
 
         response_data = {
             "selected_server": {
@@ -537,7 +1186,7 @@ async def select_server(request: Dict[str, Any]):
             "Expires": "0"
         }
 
-        return JSONResponse(content=response_data, headers=headers)
+        return FastJSONResponse(content=response_data, headers=headers)
 
     except HTTPException:
         raise
@@ -548,6 +1197,10 @@ async def select_server(request: Dict[str, Any]):
 @app.post("/tools")
 async def create_tool(request: Dict[str, Any]):
     """Create a new tool"""
+    try:
+        validate_template(request.get('answer_template'))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     try:
         tool_data = request
         server_name = request.get('server_name')
@@ -556,7 +1209,7 @@ async def create_tool(request: Dict[str, Any]):
             raise HTTPException(status_code=400, detail="server_name is required")
 
         # Get server info
-        server = db_manager.get_server_by_name(server_name)
+        server = await db_call(db_manager.get_server_by_name, server_name)
         if not server:
             raise HTTPException(status_code=404, detail=f"Server '{server_name}' not found")
 
@@ -564,7 +1217,7 @@ async def create_tool(request: Dict[str, Any]):
         tool_data['server_id'] = server['id']
 
         # Create tool in database
-        tool = db_manager.register_tool(tool_data)
+        tool = await db_call(db_manager.register_tool, tool_data)
 
         response_data = {
             "tool": tool,
@@ -578,7 +1231,7 @@ async def create_tool(request: Dict[str, Any]):
             "Expires": "0"
         }
 
-        return JSONResponse(content=response_data, headers=headers)
+        return FastJSONResponse(content=response_data, headers=headers)
 
     except HTTPException:
         raise
@@ -586,35 +1239,195 @@ async def create_tool(request: Dict[str, Any]):
         logger.error(f"Error creating tool: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to create tool: {str(e)}")
 
+def bulk_format(fmt: Optional[str], content_type: Optional[str]) -> str:
+    """ndjson or csv, from the format parameter or the content type"""
+    if not fmt:
+        fmt = 'csv' if content_type and 'csv' in content_type else 'ndjson'
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(FORMATS)}")
+    return fmt
+
+async def iterate_in_thread(chunks: Iterator[str], first: Optional[str]) -> AsyncIterator[str]:
+    """Stream a blocking iterator, whose first chunk was already read, from worker threads
+
+    The iterator (and so the database connection it holds) is closed however
+    the response ends, including when the client disconnects mid-stream.
+    """
+    step = None
+    try:
+        chunk = first
+        while chunk is not None:
+            yield chunk
+            # Shielded so a cancelled response never leaves next() running while close() is called
+            step = asyncio.ensure_future(asyncio.to_thread(next, chunks, None))
+            chunk = await asyncio.shield(step)
+    finally:
+        await asyncio.shield(close_in_thread(chunks, step))
+
+async def close_in_thread(chunks: Iterator[str], step: Optional[asyncio.Future]):
+    if step is not None:
+        await asyncio.wait([step])
+    try:
+        await asyncio.to_thread(chunks.close)
+    except Exception as e:
+        logger.warning(f"Error closing export stream: {e}")
+
+@app.post("/tools/import")
+async def import_tools(request: Request, format: Optional[str] = None, server_name: Optional[str] = None,
+                       upsert: bool = False, strict: bool = False):
+    """Bulk-create tools from an NDJSON or CSV body
+
+    Each row needs a name and a server (server_id or server_name column, or the
+    server_name parameter for the whole file). Rows are validated one by one
+    and loaded with COPY in a single transaction; the response lists the
+    rejected lines.
+    """
+    fmt = bulk_format(format, request.headers.get('content-type'))
+
+    default_server_id = None
+    if server_name:
+        server = await db_call(db_manager.get_server_by_name, server_name)
+        if not server:
+            raise HTTPException(status_code=404, detail=f"Server '{server_name}' not found")
+        default_server_id = server['id']
+
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as upload:
+        async for chunk in request.stream():
+            upload.write(chunk)
+        upload.seek(0)
+
+        started = datetime.now()
+        try:
+            report = await db_call(
+                db_manager.import_tools, read_rows(upload, fmt), default_server_id, upsert, strict
+            )
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail="Upload must be UTF-8")
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error importing tools: {e}")
+            # Integrity constraint violations (class 23) come from conflicts with existing tools
+            conflict = str(getattr(e, 'pgcode', None) or '').startswith('23')
+            raise HTTPException(status_code=409 if conflict else 500,
+                                detail=f"Failed to import tools: {str(e)}")
+
+    report['elapsed_ms'] = round((datetime.now() - started).total_seconds() * 1000, 1)
+    status_code = 422 if strict and report['rejected'] else 200
+    return FastJSONResponse(content=report, status_code=status_code)
+
+@app.get("/tools/search")
+async def search_tools(q: str = Query(..., min_length=1), server_name: Optional[str] = None,
+                       limit: int = Query(20, ge=1, le=100), source: str = 'auto'):
+    """Search tools by name and description, best match first
+
+    Query words match whole words, word prefixes and (in the in-process
+    index) near misses. The in-process index answers once it has been
+    built; before that, or with source=database, Postgres full-text and
+    trigram search does.
+    """
+    if source not in ('auto', 'index', 'database'):
+        raise HTTPException(status_code=400, detail="source must be auto, index or database")
+
+    server_id = None
+    if server_name:
+        server = await db_call(db_manager.get_server_by_name, server_name)
+        if not server:
+            raise HTTPException(status_code=404, detail=f"Server '{server_name}' not found")
+        server_id = str(server['id'])
+
+    start = time.perf_counter()
+    if source != 'database' and tool_search.ready:
+        results = tool_search.search(q, server_ids={server_id} if server_id else None, limit=limit)
+        used = 'index'
+    elif source == 'index':
+        raise HTTPException(status_code=503, detail="Search index is still being built",
+                            headers={"Retry-After": "5"})
+    else:
+        try:
+            results = await db_call(db_manager.search_tools, q, server_id, limit)
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Database tool search failed: {e}")
+            raise HTTPException(status_code=500, detail=f"Failed to search tools: {str(e)}")
+        used = 'database'
+
+    return {
+        "query": q,
+        "source": used,
+        "results": results,
+        "took_ms": round((time.perf_counter() - start) * 1000, 3)
+    }
+
+
+@app.get("/tools/export")
+async def export_tools(format: str = 'ndjson', server_name: Optional[str] = None):
+    """Stream every tool (or one server's tools) as NDJSON or CSV"""
+    fmt = bulk_format(format, None)
+
+    server_id = None
+    if server_name:
+        server = await db_call(db_manager.get_server_by_name, server_name)
+        if not server:
+            raise HTTPException(status_code=404, detail=f"Server '{server_name}' not found")
+        server_id = server['id']
+
+    rows = db_manager.iter_tools_export(server_id)
+    chunks = export_csv(rows) if fmt == 'csv' else export_ndjson(rows)
+    # Reading the first chunk checks out the connection, so an exhausted pool is still a 503
+    first = await db_call(next, chunks, None)
+    if fmt == 'csv':
+        return StreamingResponse(iterate_in_thread(chunks, first), media_type="text/csv",
+                                 headers={"Content-Disposition": "attachment; filename=tools.csv"})
+    return StreamingResponse(iterate_in_thread(chunks, first), media_type="application/x-ndjson")
+
 # Agent Management API
 @app.post("/agents")
 async def create_agent(request: Dict[str, Any]):
     """Create a new agent"""
     try:
         agent_data = request
-        agent = db_manager.create_agent(agent_data)
+        agent = await db_call(db_manager.create_agent, agent_data)
         return {"agent": agent, "message": "Agent created successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create agent: {str(e)}")
 
 @app.get("/agents")
-async def get_all_agents():
-    """Get all agents"""
+async def get_all_agents(request: Request, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                         cursor: Optional[str] = None, fields: Optional[str] = None,
+                         name: Optional[str] = None, prefix: Optional[str] = None):
+    """Get a page of agents ordered by name"""
+    etag = catalog_etag()
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return not_modified(etag)
     try:
-        agents = db_manager.get_all_agents()
-        return {"agents": agents}
+        page = await db_call(db_manager.get_agents_page, **page_options(limit, cursor, fields, name, prefix))
+        return FastJSONResponse(content={"agents": page['items'], "next_cursor": page['next_cursor']},
+                                headers=validator_headers(etag))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get agents: {str(e)}")
 
 @app.get("/agents/{agent_id}")
-async def get_agent(agent_id: str):
+async def get_agent(request: Request, agent_id: str):
     """Get a specific agent"""
+    etag = catalog_etag()
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return not_modified(etag)
     try:
-        agent = db_manager.get_agent_by_id(agent_id)
+        agent = await db_call(db_manager.get_agent_by_id, agent_id)
         if not agent:
             raise HTTPException(status_code=404, detail="Agent not found")
-        agent['servers'] = db_manager.get_servers_for_agent(agent_id)
-        return {"agent": agent}
+        agent['servers'] = await load_servers_for_agent(agent_id)
+        return FastJSONResponse(content={"agent": agent}, headers=validator_headers(etag))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get agent: {str(e)}")
 
@@ -623,10 +1436,12 @@ async def update_agent(agent_id: str, request: Dict[str, Any]):
     """Update an existing agent"""
     try:
         agent_data = request
-        agent = db_manager.update_agent(agent_id, agent_data)
+        agent = await db_call(db_manager.update_agent, agent_id, agent_data)
         if not agent:
             raise HTTPException(status_code=404, detail="Agent not found")
         return {"agent": agent, "message": "Agent updated successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update agent: {str(e)}")
 
@@ -634,10 +1449,12 @@ async def update_agent(agent_id: str, request: Dict[str, Any]):
 async def delete_agent(agent_id: str):
     """Delete an agent"""
     try:
-        deleted = db_manager.delete_agent(agent_id)
+        deleted = await db_call(db_manager.delete_agent, agent_id)
         if not deleted:
             raise HTTPException(status_code=404, detail="Agent not found")
         return {"message": "Agent deleted successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete agent: {str(e)}")
 
@@ -648,10 +1465,12 @@ async def add_server_to_agent(agent_id: str, request: Dict[str, Any]):
         server_id = request.get('server_id')
         if not server_id:
             raise HTTPException(status_code=400, detail="server_id is required")
-        added = db_manager.add_server_to_agent(agent_id, server_id)
+        added = await db_call(db_manager.add_server_to_agent, agent_id, server_id)
         if not added:
             raise HTTPException(status_code=500, detail="Failed to add server to agent")
         return {"message": "Server added to agent successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to add server to agent: {str(e)}")
 
@@ -663,7 +1482,7 @@ async def add_server_to_agent_by_url(agent_id: str, request: Dict[str, Any]):
         if not url:
             raise HTTPException(status_code=400, detail="url is required")
 
-        server = db_manager.get_server_by_url(url)
+        server = await db_call(db_manager.get_server_by_url, url)
         if not server:
             try:
                 import httpx
@@ -683,13 +1502,15 @@ async def add_server_to_agent_by_url(agent_id: str, request: Dict[str, Any]):
                 "status": "connected",
                 "enabled": True
             }
-            server = db_manager.create_server(server_data)
+            server = await db_call(db_manager.create_server, server_data)
 
-        added = db_manager.add_server_to_agent(agent_id, server['id'])
+        added = await db_call(db_manager.add_server_to_agent, agent_id, server['id'])
         if not added:
             raise HTTPException(status_code=500, detail="Failed to add server to agent")
 
         return {"message": "Server added to agent successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to add server to agent: {str(e)}")
 
@@ -697,19 +1518,52 @@ async def add_server_to_agent_by_url(agent_id: str, request: Dict[str, Any]):
 async def remove_server_from_agent(agent_id: str, server_id: str):
     """Remove a server from an agent"""
     try:
-        removed = db_manager.remove_server_from_agent(agent_id, server_id)
+        removed = await db_call(db_manager.remove_server_from_agent, agent_id, server_id)
         if not removed:
             raise HTTPException(status_code=404, detail="Server not found for this agent")
         return {"message": "Server removed from agent successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to remove server from agent: {str(e)}")
 
+@app.get("/agents/{agent_id}/context")
+async def get_agent_context(request: Request, agent_id: str):
+    """Get an agent with its servers and their tools"""
+    etag = catalog_etag()
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return not_modified(etag)
+    context = await load_agent_context(agent_id)
+    if not context:
+        raise HTTPException(status_code=404, detail="Agent not found")
+    return FastJSONResponse(content=context, headers=validator_headers(etag))
+
+@app.get("/agents/{agent_id}/servers/{server_id}/tools")
+async def get_agent_server_tools(agent_id: str, server_id: str):
+    """Tools of one of an agent's servers, asked over HTTP if they are not in our database
+
+    Used by the chat page to fill in each server's panel on its own.
+    """
+    context = await load_agent_context(agent_id)
+    if not context:
+        raise HTTPException(status_code=404, detail="Agent not found")
+    server = next((server for server in context['servers'] if server['id'] == server_id), None)
+    if server is None:
+        raise HTTPException(status_code=404, detail=f"Server '{server_id}' is not connected to this agent")
+    tools = server['tools'] or await fetch_server_tools(server)
+    # Remote catalogs are not covered by the catalog version, so they are only kept briefly
+    return FastJSONResponse(content={"tools": tools},
+                            headers={"Cache-Control": f"private, max-age={REMOTE_TOOLS_MAX_AGE}"})
+
 @app.get("/agents/{agent_id}/servers")
-async def get_servers_for_agent(agent_id: str):
+async def get_servers_for_agent(request: Request, agent_id: str):
     """Get all servers for a specific agent"""
+    etag = catalog_etag()
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return not_modified(etag)
     try:
-        servers = db_manager.get_servers_for_agent(agent_id)
-        return {"servers": servers}
+        servers = await load_servers_for_agent(agent_id)
+        return FastJSONResponse(content={"servers": servers}, headers=validator_headers(etag))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get servers for agent: {str(e)}")
 
@@ -718,11 +1572,15 @@ async def get_servers_for_agent(agent_id: str):
 @app.put("/tools/{tool_id}")
 async def update_tool(tool_id: str, request: Dict[str, Any]):
     """Update an existing tool"""
+    try:
+        validate_template(request.get('answer_template'))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     try:
         tool_data = request
 
         # Update tool in database
-        updated_tool = db_manager.updateTool(tool_id, tool_data)
+        updated_tool = await db_call(db_manager.update_tool, tool_id, tool_data)
 
         response_data = {
             "tool": updated_tool,
@@ -736,8 +1594,10 @@ async def update_tool(tool_id: str, request: Dict[str, Any]):
             "Expires": "0"
         }
 
-        return JSONResponse(content=response_data, headers=headers)
+        return FastJSONResponse(content=response_data, headers=headers)
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error updating tool: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to update tool: {str(e)}")
@@ -747,7 +1607,7 @@ async def delete_tool(tool_id: str):
     """Delete a tool"""
     try:
         # Delete tool from database
-        deleted = db_manager.deleteTool(tool_id)
+        deleted = await db_call(db_manager.delete_tool, tool_id)
 
         if not deleted:
             raise HTTPException(status_code=404, detail="Tool not found")
@@ -763,7 +1623,7 @@ async def delete_tool(tool_id: str):
             "Expires": "0"
         }
 
-        return JSONResponse(content=response_data, headers=headers)
+        return FastJSONResponse(content=response_data, headers=headers)
 
     except HTTPException:
         raise
@@ -776,13 +1636,12 @@ async def delete_tool(tool_id: str):
 async def home(request: Request):
     """Main page for agent selection"""
     try:
-        # Get all agents from database
-        agents = db_manager.get_all_agents()
+        async def render() -> str:
+            # Get all agents from database
+            agents = await db_call(db_manager.get_all_agents)
+            return render_template("index.html", agents=agents)
 
-        return templates.TemplateResponse("index.html", {
-            "request": request,
-            "agents": agents
-        })
+        return await cached_page(request, ('page', 'index'), render)
 
     except Exception as e:
         logger.error(f"Error loading home page: {e}")
@@ -794,36 +1653,23 @@ async def home(request: Request):
 
 @app.get("/chat/{agent_id}", response_class=HTMLResponse)
 async def chat_page(request: Request, agent_id: str):
-    """Chat page for selected agent"""
+    """Chat page for selected agent
+
+    The page is only the shell; chat.js loads the server and tool panels
+    from /agents/{agent_id}/context afterwards.
+    """
     try:
-        agent = db_manager.get_agent_by_id(agent_id)
-        if not agent:
+        context = await load_agent_context(agent_id)
+        if not context:
             return templates.TemplateResponse("index.html", {
                 "request": request,
                 "error": f"Agent '{agent_id}' not found"
             })
 
-        servers = db_manager.get_servers_for_agent(agent_id)
-        all_tools = []
-        for server in servers:
-            try:
-                import httpx
-                async with httpx.AsyncClient() as client:
-                    tools_response = await client.get(f"{server['url']}/tools", timeout=10.0)
-                    tools_response.raise_for_status()
-                    tools_data = tools_response.json()
-                    server['tools'] = tools_data.get('tools', [])
-                    all_tools.extend(server['tools'])
-            except (httpx.TimeoutException, httpx.ConnectError):
-                logger.error(f"Could not connect to server {server['name']}")
-                server['tools'] = []
+        async def render() -> str:
+            return render_template("chat.html", agent=context['agent'])
 
-        return templates.TemplateResponse("chat.html", {
-            "request": request,
-            "agent": agent,
-            "servers": servers,
-            "all_tools": all_tools
-        })
+        return await cached_page(request, ('page', 'chat', agent_id), render)
 
     except Exception as e:
         logger.error(f"Error loading chat page: {e}")
@@ -836,12 +1682,12 @@ async def chat_page(request: Request, agent_id: str):
 async def agent_manage_page(request: Request, agent_id: str):
     """Agent management page"""
     try:
-        agent = db_manager.get_agent_by_id(agent_id)
+        agent = await db_call(db_manager.get_agent_by_id, agent_id)
         if not agent:
             raise HTTPException(status_code=404, detail="Agent not found")
 
-        agent_servers = db_manager.get_servers_for_agent(agent_id)
-        all_servers = db_manager.get_all_servers()
+        agent_servers = await load_servers_for_agent(agent_id)
+        all_servers = await db_call(db_manager.get_all_servers)
 
         return templates.TemplateResponse("agent_manage.html", {
             "request": request,
@@ -858,27 +1704,26 @@ async def agent_manage_page(request: Request, agent_id: str):
 
 @app.get("/manage-tools/{server_name}", response_class=HTMLResponse)
 async def manage_tools_page(request: Request, server_name: str):
-    """Tools management page for selected server"""
+    """Tools management page for selected server
+
+    The page is only the shell; tools.js loads the tool list from
+    /servers/{server_name}/tools afterwards.
+    """
     try:
         # Validate server exists
-        server = db_manager.get_server_by_name(server_name)
+        server = await db_call(db_manager.get_server_by_name, server_name)
         if not server:
             return templates.TemplateResponse("index.html", {
                 "request": request,
                 "error": f"Server '{server_name}' not found"
             })
 
-        # Get server status and tools (extract data from JSONResponse)
-        status_response = await get_server_status(server_name)
-        status_data = json.loads(status_response.body.decode())
-        status_json = status_data
+        async def render() -> str:
+            server_url = MCP_SERVER_URLS.get(server_name, f"http://localhost:{3001 if server_name == 'server_a' else 3002}")
+            return render_template("tools.html", server_name=server_name,
+                                   server_info={"server": {"name": server['name'], "url": server_url}})
 
-        return templates.TemplateResponse("tools.html", {
-            "request": request,
-            "server_name": server_name,
-            "server_info": status_json,
-            "tools": status_json.get("tools", [])
-        })
+        return await cached_page(request, ('page', 'tools', server_name), render)
 
     except Exception as e:
         logger.error(f"Error loading tools management page: {e}")
@@ -908,7 +1753,7 @@ async def gemini_status():
         "Expires": "0"
     }
 
-    return JSONResponse(content=response_data, headers=headers)
+    return FastJSONResponse(content=response_data, headers=headers)
 
 @app.post("/api/gemini/chat")
 async def gemini_chat(request: Dict[str, Any]):
@@ -918,14 +1763,7 @@ async def gemini_chat(request: Dict[str, Any]):
         if not message:
             raise HTTPException(status_code=400, detail="message is required")
 
-        # Import here to avoid issues if not installed
-        import google.generativeai as genai
-
-        api_key = os.getenv('GOOGLE_API_KEY')
-        if not api_key:
-            raise HTTPException(status_code=500, detail="Gemini API key not configured")
-
-        genai.configure(api_key=api_key)
+        genai = get_genai()
         model = genai.GenerativeModel('gemini-2.5-flash')
 
         response = model.generate_content(message)
@@ -943,7 +1781,7 @@ async def gemini_chat(request: Dict[str, Any]):
             "Expires": "0"
         }
 
-        return JSONResponse(content=response_data, headers=headers)
+        return FastJSONResponse(content=response_data, headers=headers)
 
     except ImportError:
         raise HTTPException(status_code=500, detail="Google Generative AI not installed")
@@ -955,12 +1793,7 @@ async def gemini_chat(request: Dict[str, Any]):
 async def list_gemini_models():
     """List available Gemini models"""
     try:
-        import google.generativeai as genai
-        api_key = os.getenv('GOOGLE_API_KEY')
-        if not api_key:
-            raise HTTPException(status_code=500, detail="Gemini API key not configured")
-
-        genai.configure(api_key=api_key)
+        genai = get_genai()
 
         models = [m.name for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
         response_data = {"models": models}
@@ -972,7 +1805,7 @@ async def list_gemini_models():
             "Expires": "0"
         }
 
-        return JSONResponse(content=response_data, headers=headers)
+        return FastJSONResponse(content=response_data, headers=headers)
 
     except ImportError:
         raise HTTPException(status_code=500, detail="Google Generative AI not installed")
@@ -982,4 +1815,4 @@ async def list_gemini_models():
 
 if __name__ == "__main__":
     logger.info("🚀 Starting MCP Frontend API on port 3000")
-    uvicorn.run(app, host="0.0.0.0", port=3000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=3000, log_config=None)
\ No newline at end of file
@@ -0,0 +1,117 @@
+import asyncio
+import inspect
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, Any, Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class HealthMonitor:
+    """Run health checks in the background and serve their cached results
+
+    Probes (/livez, /readyz, /health) only read the cached state, so they
+    never open database connections or make HTTP calls themselves.
+    """
+
+    def __init__(self, interval: Optional[float] = None, timeout: Optional[float] = None):
+        self.interval = interval or float(os.getenv('HEALTH_CHECK_INTERVAL', 5))
+        self.timeout = timeout or float(os.getenv('HEALTH_CHECK_TIMEOUT', 2))
+        self.checks: Dict[str, Dict[str, Any]] = {}
+        self.state: Dict[str, Dict[str, Any]] = {}
+        self.started_at = time.time()
+        self._task = None
+
+    def add_check(self, name: str, check: Callable, critical: bool = True):
+        """Register a check; it may be sync or async and returns True when healthy
+
+        Critical checks decide readiness, the others are reported as dependencies.
+        """
+        self.checks[name] = {'check': check, 'critical': critical}
+
+    async def _run_check(self, name: str, entry: Dict[str, Any]):
+        start = time.perf_counter()
+        error = None
+        try:
+            result = entry['check']()
+            if inspect.isawaitable(result):
+                result = await asyncio.wait_for(result, timeout=self.timeout)
+            ok = bool(result)
+        except Exception as e:
+            ok = False
+            error = str(e) or e.__class__.__name__
+
+        self.state[name] = {
+            'ok': ok,
+            'critical': entry['critical'],
+            'latency_ms': round((time.perf_counter() - start) * 1000, 2),
+            'checked_at': datetime.now().isoformat(),
+            'error': error
+        }
+
+    async def run_checks(self):
+        """Run every registered check once, concurrently"""
+        await asyncio.gather(*(self._run_check(name, entry) for name, entry in self.checks.items()))
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_checks()
+            except Exception as e:
+                logger.error(f"Health checks failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Start the background checker on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self):
+        """Stop the background checker"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def is_ok(self, name: str) -> Optional[bool]:
+        """Cached result of one check, or None if it has not run yet"""
+        entry = self.state.get(name)
+        return entry['ok'] if entry else None
+
+    def liveness(self) -> Dict[str, Any]:
+        """In-process liveness, no I/O"""
+        return {
+            'status': 'alive',
+            'uptime_seconds': round(time.time() - self.started_at, 1)
+        }
+
+    def readiness(self) -> Tuple[bool, Dict[str, Any]]:
+        """Readiness from cached check results; not ready until every critical check passed"""
+        ready = all(
+            self.is_ok(name) for name, entry in self.checks.items() if entry['critical']
+        )
+        return ready, {
+            'status': 'ready' if ready else 'not_ready',
+            'checks': {name: state for name, state in self.state.items() if state['critical']},
+            'dependencies': {name: state for name, state in self.state.items() if not state['critical']},
+            'interval_seconds': self.interval
+        }
+
+
+def http_check(url: str, timeout: float = 2.0) -> Callable:
+    """Build a check that passes when GET url returns 200"""
+    async def check() -> bool:
+        import httpx
+        async with httpx.AsyncClient() as client:
+            response = await client.get(url, timeout=timeout)
+            return response.status_code == 200
+    return check
+
+
+# Global health monitor for this process
+health_monitor = HealthMonitor()
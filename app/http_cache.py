@@ -0,0 +1,140 @@
+import hashlib
+import mimetypes
+import os
+import time
+import uuid
+from typing import Dict, Optional
+
+from fastapi.responses import Response
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+
+from compression import COMPRESSIBLE_EXTENSIONS, COMPRESSION_MIN_SIZE, choose_encoding, precompress
+
+# Responses that must never be stored (the default for anything not cached on purpose)
+NO_STORE = 'no-store'
+
+# Responses a cache may keep but must revalidate with If-None-Match before reuse
+REVALIDATE = 'no-cache'
+
+# Content-hashed assets never change under the same URL
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+# Length of the content hash embedded in static file names
+ASSET_HASH_LENGTH = 12
+
+# Versions restart at 0 with the process, so ETags also name the process they came from
+BOOT_ID = uuid.uuid4().hex[:8]
+
+
+def version_etag(version: int, window: Optional[float] = None) -> str:
+    """Weak ETag for data identified by an in-process version counter
+
+    With `window`, the ETag also changes every `window` seconds, so a change
+    notification that never arrived cannot keep a stale response valid forever.
+    """
+    tag = f"{BOOT_ID}-{version}"
+    if window:
+        tag += f"-{int(time.time() // window)}"
+    return f'W/"{tag}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches `etag` (weak comparison)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def validator_headers(etag: str, cache_control: str = REVALIDATE) -> Dict[str, str]:
+    """Headers for a response that can be revalidated with its ETag"""
+    return {'ETag': etag, 'Cache-Control': cache_control}
+
+
+def not_modified(etag: str, cache_control: str = REVALIDATE) -> Response:
+    """304 telling the client its copy is still current"""
+    return Response(status_code=304, headers=validator_headers(etag, cache_control))
+
+
+class HashedStaticFiles(StaticFiles):
+    """Static files, also served under content-hashed names with immutable caching
+
+    Every file is hashed once at startup: js/chat.js becomes
+    js/chat.<hash>.js, which `url` returns for templates. Hashed names are
+    cached for a year; the plain names still work but must be revalidated.
+    Text files are also compressed then (brotli and gzip at their highest
+    levels), and those copies are served to clients that accept them.
+    Files changed after startup keep their old hash and copies until the
+    next restart.
+    """
+
+    def __init__(self, *, directory: str, prefix: str = '/static', **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self.prefix = prefix.rstrip('/')
+        self.hashed: Dict[str, str] = {}
+        self.originals: Dict[str, str] = {}
+        self.digests: Dict[str, str] = {}
+        self.compressed: Dict[str, Dict[str, bytes]] = {}
+        self.scan(directory)
+
+    def scan(self, directory: str):
+        """Hash every file under `directory` and compress the text ones"""
+        for root, _, files in os.walk(directory):
+            for filename in files:
+                full_path = os.path.join(root, filename)
+                path = os.path.relpath(full_path, directory)
+                with open(full_path, 'rb') as f:
+                    data = f.read()
+                digest = hashlib.sha256(data).hexdigest()[:ASSET_HASH_LENGTH]
+                base, ext = os.path.splitext(path)
+                hashed = f"{base}.{digest}{ext}"
+                self.hashed[path] = hashed
+                self.originals[hashed] = path
+                self.digests[path] = digest
+                if ext in COMPRESSIBLE_EXTENSIONS and len(data) >= COMPRESSION_MIN_SIZE:
+                    self.compressed[path] = precompress(data)
+
+    def url(self, path: str) -> str:
+        """URL of a static file, using its hashed name when there is one"""
+        path = path.lstrip('/')
+        return f"{self.prefix}/{self.hashed.get(os.path.normpath(path), path)}"
+
+    async def get_response(self, path: str, scope) -> Response:
+        original = self.originals.get(path)
+        cache_control = IMMUTABLE if original else REVALIDATE
+        path = original or path
+
+        variants = self.compressed.get(path)
+        if variants and scope['method'] in ('GET', 'HEAD'):
+            headers = Headers(scope=scope)
+            encoding = choose_encoding(headers.get('accept-encoding'))
+            if encoding in variants:
+                return self.compressed_response(path, encoding, variants[encoding], headers, cache_control)
+
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            response.headers['Cache-Control'] = cache_control
+            if variants:
+                response.headers['Vary'] = 'Accept-Encoding'
+        return response
+
+    def compressed_response(self, path: str, encoding: str, data: bytes, headers: Headers,
+                            cache_control: str) -> Response:
+        """A precompressed copy, or 304 if the client already has it"""
+        etag = f'"{self.digests[path]}-{encoding}"'
+        response_headers = validator_headers(etag, cache_control)
+        response_headers['Vary'] = 'Accept-Encoding'
+        if etag_matches(headers.get('if-none-match'), etag):
+            return Response(status_code=304, headers=response_headers)
+        response_headers['Content-Encoding'] = encoding
+        media_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        return Response(content=data, media_type=media_type, headers=response_headers)
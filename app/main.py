@@ -3,6 +3,7 @@ import logging
 import os
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 from multiprocessing import Process
 from dotenv import load_dotenv
 
@@ -13,39 +14,72 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 if current_dir not in sys.path:
     sys.path.insert(0, current_dir)
 
+from startup_timing import startup_timer
+from structured_logging import logging_pipeline
 from database import db_manager
-import uvicorn
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# Configure logging (each service process reconfigures it for itself when it starts)
+logging_pipeline.configure('main')
 logger = logging.getLogger(__name__)
 
+# Third-party modules every service needs; imported one by one so the
+# startup report shows what each of them costs
+SERVICE_IMPORTS = ('uvicorn', 'fastapi', 'psycopg2', 'httpx')
+
 def run_server_a():
     """Run Server A"""
+    startup_timer.reset()
     os.environ['SERVER_NAME'] = 'server_a'
-    import server_a
+    startup_timer.measure_imports(*SERVICE_IMPORTS)
+    with startup_timer.phase('server_a', 'import'):
+        import server_a
+    import uvicorn
     port = int(os.getenv('PORT_A', 3001))
     logger.info(f"🚀 Starting MCP Server A on port {port}")
-    uvicorn.run(server_a.app, host="0.0.0.0", port=port)
+    uvicorn.run(server_a.app, host="0.0.0.0", port=port, log_config=None)
 
 def run_server_b():
     """Run Server B"""
+    startup_timer.reset()
     os.environ['SERVER_NAME'] = 'server_b'
-    import server_b
+    startup_timer.measure_imports(*SERVICE_IMPORTS)
+    with startup_timer.phase('server_b', 'import'):
+        import server_b
+    import uvicorn
     port = int(os.getenv('PORT_B', 3002))
     logger.info(f"🚀 Starting MCP Server B on port {port}")
-    uvicorn.run(server_b.app, host="0.0.0.0", port=port)
+    uvicorn.run(server_b.app, host="0.0.0.0", port=port, log_config=None)
 
 def run_frontend_api():
     """Run Frontend API"""
+    startup_timer.reset()
     # Add current directory to Python path for imports
     current_dir = os.path.dirname(os.path.abspath(__file__))
     if current_dir not in sys.path:
         sys.path.insert(0, current_dir)
 
-    import frontend_api
+    startup_timer.measure_imports(*SERVICE_IMPORTS, 'jinja2')
+    with startup_timer.phase('frontend_api', 'import'):
+        import frontend_api
+    import uvicorn
     logger.info("🚀 Starting MCP Frontend API on port 3000")
-    uvicorn.run(frontend_api.app, host="0.0.0.0", port=3000)
+    uvicorn.run(frontend_api.app, host="0.0.0.0", port=3000, log_config=None)
+
+def check_server(server_name: str) -> bool:
+    """Check that a server and its tools are registered in the database"""
+    label = 'Server A' if server_name == 'server_a' else 'Server B'
+    server = db_manager.get_server_by_name(server_name)
+    if not server:
+        logger.warning(f"⚠️ {label} not found in database")
+        return False
+
+    tools_count = db_manager.get_server_tools_count(server['id'])
+    logger.info(f"📊 {label} found: {server['name']} with {tools_count} tools")
+
+    if tools_count > 0:
+        tools = db_manager.get_tools_by_server(server['id'])
+        logger.info(f"🔧 {label} tools: {[tool['name'] for tool in tools]}")
+    return True
 
 def initialize_database():
     """Initialize database with default tools if needed"""
@@ -58,31 +92,10 @@ def initialize_database():
 
     logger.info("✅ Database connected successfully")
 
-    # Check existing servers and tools
+    # Check both servers in parallel instead of one after the other
     try:
-        # Check Server A (finance-server)
-        server_a = db_manager.get_server_by_name('server_a')
-        if server_a:
-            tools_count = db_manager.get_server_tools_count(server_a['id'])
-            logger.info(f"📊 Server A found: {server_a['name']} with {tools_count} tools")
-
-            if tools_count > 0:
-                tools = db_manager.get_tools_by_server(server_a['id'])
-                logger.info(f"🔧 Server A tools: {[tool['name'] for tool in tools]}")
-        else:
-            logger.warning("⚠️ Server A not found in database")
-
-        # Check Server B (weather-server)
-        server_b = db_manager.get_server_by_name('server_b')
-        if server_b:
-            tools_count = db_manager.get_server_tools_count(server_b['id'])
-            logger.info(f"📊 Server B found: {server_b['name']} with {tools_count} tools")
-
-            if tools_count > 0:
-                tools = db_manager.get_tools_by_server(server_b['id'])
-                logger.info(f"🔧 Server B tools: {[tool['name'] for tool in tools]}")
-        else:
-            logger.warning("⚠️ Server B not found in database")
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            list(executor.map(check_server, ['server_a', 'server_b']))
 
         logger.info("✅ Database initialization completed")
         return True
@@ -95,11 +108,6 @@ def main():
     """Main function to run both servers"""
     logger.info("🎯 Starting MCP Multi-Server System")
 
-    # Initialize database
-    if not initialize_database():
-        logger.error("❌ Failed to initialize database. Exiting...")
-        sys.exit(1)
-
     # Run servers in parallel processes
     try:
         logger.info("🚀 Starting both MCP servers...")
@@ -114,6 +122,15 @@ def main():
         process_b.start()
         process_frontend.start()
 
+        # Database checks run while the servers are importing and binding
+        # instead of holding them back
+        if not initialize_database():
+            logger.error("❌ Failed to initialize database. Exiting...")
+            process_a.terminate()
+            process_b.terminate()
+            process_frontend.terminate()
+            sys.exit(1)
+
         logger.info("✅ All servers started successfully!")
         logger.info("📊 Server A: http://localhost:3001")
         logger.info("📊 Server B: http://localhost:3002")
@@ -0,0 +1,316 @@
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any, Callable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+SERVER_COLUMNS = 'id, name, url, status, enabled, created_at, updated_at'
+AGENT_COLUMNS = 'id, name, description, created_at, updated_at'
+TOOL_COLUMNS = ('id, name, description, parameters, server_id, created_at, updated_at, '
+                'api_url, http_method, request_headers, request_body, speculative, answer_template')
+
+# Named statements used by DatabaseManager. They are PREPAREd once per pooled
+# connection, so they use $n placeholders instead of %s.
+QUERIES = {
+    'notify_catalog_change': 'SELECT pg_notify($1, $2)',
+
+    'server_by_name': f'SELECT {SERVER_COLUMNS} FROM mcp_servers WHERE name LIKE $1 OR id = $2',
+    'server_by_url': f'SELECT {SERVER_COLUMNS} FROM mcp_servers WHERE url = $1',
+    'insert_server': f'''INSERT INTO mcp_servers (id, name, url, status, enabled)
+                         VALUES ($1, $2, $3, $4, $5) RETURNING {SERVER_COLUMNS}''',
+
+    'tool_by_name': f'SELECT {TOOL_COLUMNS} FROM tools WHERE server_id = $1 AND name = $2',
+    'tool_by_id': f'SELECT {TOOL_COLUMNS} FROM tools WHERE id = $1',
+    # $1 tsquery text (prefix terms), $2 raw query for trigram matching, $3 server id or NULL, $4 limit.
+    # Uses search_vector and the trigram index from migration 0003.
+    'search_tools': '''SELECT id, name, description, server_id,
+                              ts_rank(search_vector, to_tsquery('simple', $1)) * 2
+                              + similarity(name, $2) AS score
+                       FROM tools
+                       WHERE (search_vector @@ to_tsquery('simple', $1) OR name % $2)
+                         AND ($3::varchar IS NULL OR server_id = $3)
+                       ORDER BY score DESC, name
+                       LIMIT $4''',
+    'count_tools_by_server': 'SELECT COUNT(*) AS count FROM tools WHERE server_id = $1',
+    'insert_tool': f'''INSERT INTO tools (id, name, description, parameters, server_id, api_url, http_method,
+                                         speculative, answer_template)
+                       VALUES ($1, $2, $3, $4, $5, $6, $7, COALESCE($8::boolean, false), NULLIF($9::text, ''))
+                       RETURNING {TOOL_COLUMNS}''',
+    # $7 and $8 NULL leave speculative and answer_template unchanged; an empty template removes it
+    'update_tool': f'''UPDATE tools SET name = $1, description = $2, parameters = $3, api_url = $4, http_method = $5,
+                              speculative = COALESCE($7::boolean, speculative),
+                              answer_template = CASE WHEN $8::text IS NULL THEN answer_template
+                                                     ELSE NULLIF($8::text, '') END
+                       WHERE id = $6 RETURNING {TOOL_COLUMNS}''',
+    'delete_tool': 'DELETE FROM tools WHERE id = $1',
+
+    'agent_by_id': f'SELECT {AGENT_COLUMNS} FROM agents WHERE id = $1',
+    'insert_agent': f'INSERT INTO agents (name, description) VALUES ($1, $2) RETURNING {AGENT_COLUMNS}',
+    'update_agent': f'''UPDATE agents SET name = $1, description = $2, updated_at = CURRENT_TIMESTAMP
+                        WHERE id = $3 RETURNING {AGENT_COLUMNS}''',
+    'delete_agent': 'DELETE FROM agents WHERE id = $1',
+    'insert_agent_server': 'INSERT INTO agent_mcp_servers (agent_id, server_id) VALUES ($1, $2)',
+    'delete_agent_server': 'DELETE FROM agent_mcp_servers WHERE agent_id = $1 AND server_id = $2',
+    'servers_for_agent': '''SELECT s.id, s.name, s.url, s.status, s.enabled, s.created_at, s.updated_at
+                            FROM mcp_servers s
+                            JOIN agent_mcp_servers ams ON s.id = ams.server_id
+                            WHERE ams.agent_id = $1''',
+    'agent_context': '''SELECT a.id, a.name, a.description, a.created_at, a.updated_at,
+                               COALESCE(agent_servers.servers, '[]'::json) AS servers
+                        FROM agents a
+                        LEFT JOIN LATERAL (
+                            SELECT json_agg(json_build_object(
+                                       'id', s.id, 'name', s.name, 'url', s.url,
+                                       'status', s.status, 'enabled', s.enabled,
+                                       'tools', COALESCE(server_tools.tools, '[]'::json)
+                                   ) ORDER BY s.name) AS servers
+                            FROM agent_mcp_servers ams
+                            JOIN mcp_servers s ON s.id = ams.server_id
+                            LEFT JOIN LATERAL (
+                                SELECT json_agg(json_build_object(
+                                           'id', t.id, 'name', t.name, 'description', t.description,
+                                           'parameters', t.parameters, 'server_id', t.server_id,
+                                           'api_url', t.api_url, 'http_method', t.http_method,
+                                           'speculative', t.speculative, 'answer_template', t.answer_template
+                                       ) ORDER BY t.name) AS tools
+                                FROM tools t
+                                WHERE t.server_id = s.id
+                            ) server_tools ON TRUE
+                            WHERE ams.agent_id = a.id
+                        ) agent_servers ON TRUE
+                        WHERE a.id = $1''',
+
+    # Conversations spilled from memory (conversations.py, migration 0004); $4 is epoch seconds
+    'conversation_by_id': '''SELECT agent_id, data, EXTRACT(EPOCH FROM updated_at) AS updated_at
+                             FROM conversations WHERE id = $1''',
+    'upsert_conversation': '''INSERT INTO conversations (id, agent_id, data, updated_at)
+                              VALUES ($1, $2, $3, to_timestamp($4))
+                              ON CONFLICT (id) DO UPDATE
+                              SET agent_id = EXCLUDED.agent_id, data = EXCLUDED.data, updated_at = EXCLUDED.updated_at''',
+    'delete_conversations_before': 'DELETE FROM conversations WHERE updated_at < to_timestamp($1)',
+}
+
+# SQLSTATEs after which a connection's prepared statements can no longer be used:
+# the schema changed under a cached plan, or the statement is gone
+STALE_STATEMENT_CODES = ('0A000', '26000')
+
+
+# Queries slower than this are recorded in the slow-query log
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 200))
+# Fraction of slow queries re-run under EXPLAIN (ANALYZE, BUFFERS)
+SLOW_QUERY_EXPLAIN_SAMPLE = float(os.getenv('SLOW_QUERY_EXPLAIN_SAMPLE', 0.1))
+# Slow queries kept in memory
+SLOW_QUERY_LOG_SIZE = int(os.getenv('SLOW_QUERY_LOG_SIZE', 200))
+
+
+def redact(params: Optional[Sequence[Any]]) -> Optional[List[str]]:
+    """Parameter types and sizes without their values"""
+    if params is None:
+        return None
+    redacted = []
+    for value in params:
+        if value is None:
+            redacted.append('NULL')
+        elif isinstance(value, (str, bytes)):
+            redacted.append(f'<{type(value).__name__} len={len(value)}>')
+        else:
+            redacted.append(f'<{type(value).__name__}>')
+    return redacted
+
+
+class SlowQueryLog:
+    """Ring buffer of slow queries, with sampled EXPLAIN (ANALYZE, BUFFERS) plans
+
+    Plans are captured by a background thread on its own connection, so the
+    slow request is not delayed further. Only SELECT statements are explained
+    and the EXPLAIN runs in a transaction that is rolled back. Parameter values
+    are used for the EXPLAIN but never stored.
+    """
+
+    def __init__(self, threshold_ms: float = SLOW_QUERY_MS, sample_rate: float = SLOW_QUERY_EXPLAIN_SAMPLE,
+                 size: int = SLOW_QUERY_LOG_SIZE):
+        self.threshold_ms = threshold_ms
+        self.sample_rate = sample_rate
+        self.entries = deque(maxlen=size)
+        self.total = 0
+        self.connect: Optional[Callable] = None
+        self._explain_queue: queue.Queue = queue.Queue(maxsize=16)
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def configure(self, connect: Callable):
+        """Set how the EXPLAIN worker opens its connection"""
+        self.connect = connect
+
+    def observe(self, name: str, sql: str, params: Optional[Sequence[Any]], elapsed_ms: float, rows: int,
+                prepared: bool):
+        """Record a query if it was slow; `prepared` means `sql` uses $n placeholders"""
+        if elapsed_ms < self.threshold_ms:
+            return
+        self.total += 1
+        entry = {
+            'name': name,
+            'elapsed_ms': round(elapsed_ms, 3),
+            'rows': rows,
+            'params': redact(params),
+            'timestamp': datetime.now().isoformat(),
+            'plan': None
+        }
+        self.entries.append(entry)
+        logger.warning(f"Slow query {name}: {elapsed_ms:.1f}ms ({rows} rows)")
+
+        explainable = sql.lstrip().upper().startswith(('SELECT', 'WITH'))
+        if self.connect and explainable and random.random() < self.sample_rate:
+            try:
+                self._explain_queue.put_nowait((entry, sql, list(params or []), prepared))
+            except queue.Full:
+                return
+            self._ensure_worker()
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            with self._lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._run, name='slow-query-explain', daemon=True)
+                    self._worker.start()
+
+    def _run(self):
+        conn = None
+        while True:
+            entry, sql, params, prepared = self._explain_queue.get()
+            try:
+                if conn is None or conn.closed:
+                    conn = self.connect()
+                with conn.cursor() as cursor:
+                    if prepared:
+                        cursor.execute(f'PREPARE slow_query_explain AS {sql}')
+                        placeholders = f" ({', '.join(['%s'] * len(params))})" if params else ''
+                        cursor.execute(f'EXPLAIN (ANALYZE, BUFFERS) EXECUTE slow_query_explain{placeholders}', params)
+                    else:
+                        cursor.execute(f'EXPLAIN (ANALYZE, BUFFERS) {sql}', params)
+                    entry['plan'] = '\n'.join(row[0] for row in cursor.fetchall())
+            except Exception as e:
+                entry['plan'] = f"EXPLAIN failed: {e}"
+            finally:
+                if conn is not None and not conn.closed:
+                    try:
+                        # Undoes any writes EXPLAIN ANALYZE actually executed
+                        conn.rollback()
+                        if prepared:
+                            # PREPARE is not transactional: the statement outlives the rollback
+                            with conn.cursor() as cursor:
+                                cursor.execute('DEALLOCATE ALL')
+                            conn.rollback()
+                    except Exception:
+                        conn.close()
+
+    def snapshot(self, limit: Optional[int] = None) -> Dict[str, Any]:
+        """Most recent slow queries first"""
+        entries = list(self.entries)[::-1]
+        return {
+            'threshold_ms': self.threshold_ms,
+            'explain_sample_rate': self.sample_rate,
+            'total': self.total,
+            'entries': entries[:limit] if limit else entries
+        }
+
+
+class QueryStats:
+    """Call count and timing for one query"""
+
+    def __init__(self):
+        self.calls = 0
+        self.rows = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.prepares = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'calls': self.calls,
+            'rows': self.rows,
+            'prepares': self.prepares,
+            'total_ms': round(self.total_ms, 3),
+            'mean_ms': round(self.total_ms / self.calls, 3) if self.calls else 0.0,
+            'max_ms': round(self.max_ms, 3)
+        }
+
+
+class QueryRegistry:
+    """Named statements, prepared lazily on each connection, with per-query timing
+
+    A connection remembers which statements it has prepared in its `prepared`
+    set (see PreparedConnection in database.py). Queries that cannot be
+    prepared, such as those read through server-side cursors, report their
+    timing with `record`.
+    """
+
+    def __init__(self, queries: Dict[str, str], slow_log: Optional[SlowQueryLog] = None):
+        self.queries = dict(queries)
+        self.stats: Dict[str, QueryStats] = {}
+        self.slow_log = slow_log or SlowQueryLog()
+        self._lock = threading.Lock()
+
+    def _stats(self, name: str) -> QueryStats:
+        stats = self.stats.get(name)
+        if stats is None:
+            with self._lock:
+                stats = self.stats.setdefault(name, QueryStats())
+        return stats
+
+    def execute(self, cursor, name: str, params: Optional[Sequence[Any]] = None):
+        """Run a registered statement on the cursor, preparing it on first use"""
+        conn = cursor.connection
+        prepared = conn.prepared
+        if conn.stale_statements:
+            cursor.execute('DEALLOCATE ALL')
+            prepared.clear()
+            conn.stale_statements = False
+        if name not in prepared:
+            cursor.execute(f'PREPARE {name} AS {self.queries[name]}')
+            prepared.add(name)
+            self._stats(name).prepares += 1
+
+        statement = f"EXECUTE {name} ({', '.join(['%s'] * len(params))})" if params else f'EXECUTE {name}'
+        start = time.perf_counter()
+        try:
+            cursor.execute(statement, params)
+        except Exception as e:
+            if getattr(e, 'pgcode', None) in STALE_STATEMENT_CODES:
+                # Re-prepare everything on this connection's next use
+                conn.stale_statements = True
+            raise
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        rows = max(cursor.rowcount, 0)
+        self.record(name, elapsed_ms, rows)
+        self.slow_log.observe(name, self.queries[name], params, elapsed_ms, rows, prepared=True)
+
+    def record(self, name: str, elapsed_ms: float, rows: int = 0, sql: Optional[str] = None,
+               params: Optional[Sequence[Any]] = None):
+        """Add one execution to a query's stats
+
+        Pass the %s-style `sql` and `params` of unregistered queries so slow
+        ones can be explained.
+        """
+        stats = self._stats(name)
+        stats.calls += 1
+        stats.rows += rows
+        stats.total_ms += elapsed_ms
+        stats.max_ms = max(stats.max_ms, elapsed_ms)
+        if sql is not None:
+            self.slow_log.observe(name, sql, params, elapsed_ms, rows, prepared=False)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Per-query stats, most total time first"""
+        result = [dict(stats.snapshot(), name=name) for name, stats in list(self.stats.items())]
+        return sorted(result, key=lambda item: item['total_ms'], reverse=True)
+
+
+# Global query registry for this process
+queries = QueryRegistry(QUERIES)
@@ -4,7 +4,7 @@ import logging
 import os
 import uuid
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Callable, Optional
 
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import HTMLResponse
@@ -17,13 +17,25 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 if current_dir not in sys.path:
     sys.path.insert(0, current_dir)
 
-from database import db_manager
+from startup_timing import startup_timer
+from structured_logging import logging_pipeline, request_context_middleware, outgoing_headers
+from health import health_monitor
+from circuit_breaker import circuit_breakers, CircuitOpenError
+from single_flight import single_flight, payload_key
+from admission import admission, AdmissionRejected, parse_priority
+from database import db_manager, PoolExhausted
+from tool_schema import build_mcp_tool, json_content, text_content
+from answer_templates import validate_template
+from fast_json import FastJSONResponse
+from compression import CompressionMiddleware
+from deadlines import Deadline, ClientDisconnected, MAX_DEADLINE, cancel_on_disconnect
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+logging_pipeline.configure('server_a')
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="MCP Server A", description="MCP Server A running on port 3001")
+app = FastAPI(title="MCP Server A", description="MCP Server A running on port 3001",
+              default_response_class=FastJSONResponse)
 
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -34,6 +46,8 @@ app.add_middleware(
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
 )
+app.add_middleware(CompressionMiddleware)
+app.middleware("http")(request_context_middleware)
 
 class MCPServerA:
     def __init__(self, server_id: str):
@@ -68,41 +82,13 @@ class MCPServerA:
     async def list_tools(self) -> Dict[str, List[Dict[str, Any]]]:
         """List available tools for this server"""
         try:
-            tools = db_manager.get_active_tools_by_server(self.server_id)
-
-            mcp_tools = []
-            for tool in tools:
-                mcp_tool = {
-                    'id': tool['id'],
-                    'name': tool['name'],
-                    'description': tool['description'] or f"Tool: {tool['name']}",
-                    'parameters': tool['parameters'],
-                    'api_url': tool['api_url'],
-                    'http_method': tool['http_method'],
-                    'inputSchema': {
-                        'type': 'object',
-                        'properties': {
-                            'operation': {
-                                'type': 'string',
-                                'description': 'Operation to perform',
-                                'enum': ['execute', 'info']
-                            }
-                        },
-                        'required': ['operation']
-                    }
-                }
-
-                # Add tool parameters to schema
-                for param in tool['parameters']:
-                    mcp_tool['inputSchema']['properties'][param['name']] = {
-                        'type': param['type'],
-                        'description': param['description']
-                    }
-                    if param['required']:
-                        mcp_tool['inputSchema']['required'].append(param['name'])
-
-                mcp_tool['server_name'] = 'server_a'
-                mcp_tools.append(mcp_tool)
+            # Concurrent listings share one database query
+            tools = await single_flight.do(
+                ('list_tools', self.server_id),
+                lambda: asyncio.to_thread(db_manager.get_active_tools_by_server, self.server_id)
+            )
+
+            mcp_tools = [build_mcp_tool(tool, 'server_a') for tool in tools]
 
             return {'tools': mcp_tools}
 
@@ -116,7 +102,7 @@ class MCPServerA:
 
         try:
             # Find the tool in database
-            tool = db_manager.get_tool_by_name(self.server_id, tool_name)
+            tool = await asyncio.to_thread(db_manager.get_tool_by_name, self.server_id, tool_name)
             if not tool:
                 raise HTTPException(status_code=404, detail=f"Tool '{tool_name}' not found")
 
@@ -125,7 +111,8 @@ class MCPServerA:
             execution_time = (datetime.now() - start_time).total_seconds() * 1000
 
             # Log successful execution
-            db_manager.log_tool_execution(
+            await asyncio.to_thread(
+                db_manager.log_tool_execution,
                 tool['id'],
                 self.server_id,
                 args,
@@ -135,17 +122,21 @@ class MCPServerA:
             )
 
             return {
-                'content': [json.dumps(result, indent=2)],
+                'content': [json_content(result)],
                 'success': True
             }
 
+        except (AdmissionRejected, CircuitOpenError, PoolExhausted):
+            # Load shedding, not a tool failure: call_tool turns these into 429/503 with Retry-After
+            raise
         except Exception as e:
             execution_time = (datetime.now() - start_time).total_seconds() * 1000
 
             # Log failed execution
-            tool = db_manager.get_tool_by_name(self.server_id, tool_name)
+            tool = await asyncio.to_thread(db_manager.get_tool_by_name, self.server_id, tool_name)
             if tool:
-                db_manager.log_tool_execution(
+                await asyncio.to_thread(
+                    db_manager.log_tool_execution,
                     tool['id'],
                     self.server_id,
                     args,
@@ -155,7 +146,7 @@ class MCPServerA:
                 )
 
             return {
-                'content': [f"Error: {str(e)}"],
+                'content': [text_content(f"Error: {str(e)}")],
                 'success': False,
                 'isError': True
             }
@@ -165,15 +156,21 @@ class MCPServerA:
         if tool.get('api_url'):
             import httpx
             api_url = tool['api_url'].format(**args)
-            async with httpx.AsyncClient() as client:
-                if tool['http_method'] == 'GET':
-                    response = await client.get(api_url, params=args)
-                elif tool['http_method'] == 'POST':
-                    response = await client.post(api_url, json=args)
-                else:
-                    raise ValueError(f"Unsupported HTTP method: {tool['http_method']}")
-                response.raise_for_status()
-                return response.json()
+            if tool['http_method'] not in ('GET', 'POST'):
+                raise ValueError(f"Unsupported HTTP method: {tool['http_method']}")
+
+            async def request_upstream(timeout: float) -> Dict[str, Any]:
+                async with httpx.AsyncClient() as client:
+                    if tool['http_method'] == 'GET':
+                        response = await client.get(api_url, params=args, timeout=timeout, headers=outgoing_headers())
+                    else:
+                        response = await client.post(api_url, json=args, timeout=timeout, headers=outgoing_headers())
+                    response.raise_for_status()
+                    return response.json()
+
+            # Fails fast while the upstream host's breaker is open; 5s is the httpx default
+            async with admission.admit([('host', circuit_breakers.endpoint(api_url))]):
+                return await circuit_breakers.get(api_url).call(request_upstream, max_timeout=5.0)
         else:
             operation = args.get('operation', 'execute')
             if tool['name'] == 'file_reader':
@@ -293,29 +290,73 @@ class MCPServerA:
 # Global MCP server instance
 mcp_server_a = None
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize server on startup"""
+def initialize_server() -> Optional[MCPServerA]:
+    """Look up this server in the database and create the MCP server instance"""
     global mcp_server_a
 
-    # Test database connection
-    if db_manager.test_connection():
-        logger.info("✅ Database connected successfully")
-
+    if mcp_server_a is None:
         # Get or create server info
-        server_info = db_manager.get_server_by_name('server_a')
+        with startup_timer.phase('get_server_by_name'):
+            server_info = db_manager.get_server_by_name('server_a')
         if server_info:
             mcp_server_a = MCPServerA(server_info['id'])
             logger.info(f"🚀 MCP Server A initialized with server_id: {server_info['id']}")
         else:
             logger.error("❌ Server A not found in database")
+    return mcp_server_a
+
+def warm_up():
+    """Run the startup database checks off the event loop"""
+    with startup_timer.phase('test_connection'):
+        connected = db_manager.test_connection()
+    if connected:
+        logger.info("✅ Database connected successfully")
+        initialize_server()
     else:
         logger.error("❌ Database connection failed")
+    startup_timer.log_report('MCP Server A')
+
+async def get_mcp_server_a() -> MCPServerA:
+    """Return the MCP server instance, initializing it if warm-up has not finished yet"""
+    if mcp_server_a is None:
+        await asyncio.to_thread(initialize_server)
+    if mcp_server_a is None:
+        raise HTTPException(status_code=500, detail="MCP Server A not initialized")
+    return mcp_server_a
+
+async def db_call(fn: Callable[..., Any], *args) -> Any:
+    """Run a blocking db_manager call in a worker thread; an exhausted pool is a 503"""
+    try:
+        return await asyncio.to_thread(fn, *args)
+    except PoolExhausted as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+@app.on_event("startup")
+async def startup_event():
+    """Bind immediately and finish initialization in the background"""
+    startup_timer.mark_ready()
+    asyncio.get_running_loop().run_in_executor(None, warm_up)
+
+    health_monitor.add_check('database', lambda: asyncio.to_thread(db_manager.test_connection))
+    health_monitor.add_check('mcp_server', lambda: mcp_server_a is not None)
+    health_monitor.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background work"""
+    await health_monitor.stop()
+    db_manager.close_pool()
+    logging_pipeline.stop()
+
+@app.get("/startup")
+async def startup_report():
+    """Startup timing breakdown for this process"""
+    return startup_timer.report()
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    db_connected = db_manager.test_connection()
+    """Health check endpoint (served from the cached health state)"""
+    db_connected = health_monitor.is_ok('database')
     return {
         'status': 'healthy',
         'server': 'Server A',
@@ -324,38 +365,53 @@ async def health_check():
         'timestamp': datetime.now().isoformat()
     }
 
+@app.get("/livez")
+async def liveness_probe():
+    """Liveness probe: the process is up and serving requests"""
+    return health_monitor.liveness()
+
+@app.get("/readyz")
+async def readiness_probe():
+    """Readiness probe: cached database and initialization state"""
+    ready, details = health_monitor.readiness()
+    details['server'] = 'Server A'
+    details['circuit_breakers'] = circuit_breakers.snapshot()
+    details['admission'] = admission.snapshot()
+    return FastJSONResponse(content=details, status_code=200 if ready else 503)
+
 @app.get("/info")
 async def server_info():
     """Server information endpoint"""
     try:
-        server = db_manager.get_server_by_name('server_a')
+        server = await db_call(db_manager.get_server_by_name, 'server_a')
         if not server:
             raise HTTPException(status_code=404, detail="Server not found")
 
-        tools_count = db_manager.get_server_tools_count(server['id'])
+        tools_count = await db_call(db_manager.get_server_tools_count, server['id'])
 
         return {
             'server': server,
             'tools_count': tools_count,
-            'active_tools': db_manager.get_active_tools_by_server(server['id'])
+            'active_tools': await db_call(db_manager.get_active_tools_by_server, server['id']),
+            'circuit_breakers': circuit_breakers.snapshot()
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch server info: {str(e)}")
 
 @app.get("/tools")
 async def list_tools_endpoint():
     """List all tools for this server"""
-    if not mcp_server_a:
-        raise HTTPException(status_code=500, detail="MCP Server A not initialized")
-    return await mcp_server_a.list_tools()
+    mcp_server = await get_mcp_server_a()
+    return await mcp_server.list_tools()
 
 @app.get("/check-tools")
 async def check_tools_endpoint():
     """Check all available tools for this server"""
-    if not mcp_server_a:
-        raise HTTPException(status_code=500, detail="MCP Server A not initialized")
-    
-    tools_data = await mcp_server_a.list_tools()
+    mcp_server = await get_mcp_server_a()
+
+    tools_data = await mcp_server.list_tools()
     
     # Simplify the output to only include essential information
     simplified_tools = []
@@ -376,7 +432,11 @@ async def check_tools_endpoint():
 async def register_tool(tool_data: Dict[str, Any]):
     """Register a new tool"""
     try:
-        server = db_manager.get_server_by_name('server_a')
+        validate_template(tool_data.get('answer_template'))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        server = await db_call(db_manager.get_server_by_name, 'server_a')
         if not server:
             raise HTTPException(status_code=404, detail="Server not found")
 
@@ -384,8 +444,10 @@ async def register_tool(tool_data: Dict[str, Any]):
         tool_data['id'] = str(uuid.uuid4())
         tool_data['server_id'] = server['id']
 
-        tool = db_manager.register_tool(tool_data)
+        tool = await db_call(db_manager.register_tool, tool_data)
         return {'tool': tool}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to register tool: {str(e)}")
 
@@ -393,10 +455,16 @@ async def register_tool(tool_data: Dict[str, Any]):
 async def update_tool(tool_id: str, tool_data: Dict[str, Any]):
     """Update an existing tool"""
     try:
-        updated_tool = db_manager.update_tool(tool_id, tool_data)
+        validate_template(tool_data.get('answer_template'))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        updated_tool = await db_call(db_manager.update_tool, tool_id, tool_data)
         if not updated_tool:
             raise HTTPException(status_code=404, detail="Tool not found or could not be updated")
         return updated_tool
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update tool: {str(e)}")
 
@@ -404,37 +472,62 @@ async def update_tool(tool_id: str, tool_data: Dict[str, Any]):
 async def delete_tool(tool_id: str):
     """Delete a tool"""
     try:
-        success = db_manager.delete_tool(tool_id)
+        success = await db_call(db_manager.delete_tool, tool_id)
         if not success:
             raise HTTPException(status_code=404, detail="Tool not found or could not be deleted")
         return {"message": "Tool deleted successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete tool: {str(e)}")
 
 @app.get("/sse")
 async def sse_endpoint(request: Request):
     """SSE endpoint for MCP client connections"""
-    if mcp_server_a:
-        return await mcp_server_a.handle_sse_connection(request)
-    else:
-        raise HTTPException(status_code=500, detail="MCP Server A not initialized")
+    mcp_server = await get_mcp_server_a()
+    return await mcp_server.handle_sse_connection(request)
 
 @app.post("/tools/call")
-async def call_tool(request: Dict[str, Any]):
-    """Call/execute a tool"""
-    if not mcp_server_a:
-        raise HTTPException(status_code=500, detail="MCP Server A not initialized")
+async def call_tool(http_request: Request):
+    """Call/execute a tool
 
+    Stops when the caller's deadline (DEADLINE_HEADER) passes or the caller
+    disconnects; the execution itself is cancelled once no caller is waiting.
+    """
+    mcp_server = await get_mcp_server_a()
+
+    request = await http_request.json()
     tool_name = request.get('name')
     args = request.get('arguments', {})
 
     if not tool_name:
         raise HTTPException(status_code=400, detail="Tool name is required")
 
-    result = await mcp_server_a.execute_tool(tool_name, args)
+    deadline = Deadline.from_headers(http_request.headers, default=MAX_DEADLINE)
+
+    async def execute_admitted() -> Dict[str, Any]:
+        async with admission.admit([('tool', tool_name)], parse_priority(request.get('priority'))):
+            return await mcp_server.execute_tool(tool_name, args)
+
+    # Identical calls already in flight share one execution
+    try:
+        result = await cancel_on_disconnect(
+            http_request,
+            single_flight.do(payload_key('call', tool_name, args), execute_admitted),
+            timeout=deadline.remaining()
+        )
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.reason, headers={"Retry-After": str(e.retry_after)})
+    except (CircuitOpenError, PoolExhausted) as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"Tool '{tool_name}' did not finish before the deadline")
+    except ClientDisconnected:
+        # Nobody is left to read the response
+        raise HTTPException(status_code=499, detail="Client closed request")
     return result
 
 if __name__ == "__main__":
     port = int(os.getenv('PORT_A', 3001))
     logger.info(f"🚀 Starting MCP Server A on port {port}")
-    uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=port, log_config=None)
\ No newline at end of file
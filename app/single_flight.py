@@ -0,0 +1,56 @@
+import asyncio
+import json
+from typing import Dict, Any, Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    """Share one in-flight execution between concurrent callers with the same key
+
+    The first caller starts the work; callers arriving while it runs await the
+    same task and get the same result (or exception). Nothing is cached once
+    the task finishes. The shared result is the same object for every caller,
+    so callers must not mutate it. The work is cancelled once every caller
+    waiting for it has been cancelled.
+    """
+
+    def __init__(self):
+        self.in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.waiters: Dict[asyncio.Task, int] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn() unless an identical call is already in flight, and return its result"""
+        task = self.in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self.in_flight[key] = task
+            self.waiters[task] = 0
+            task.add_done_callback(lambda done: self._forget(key, done))
+        self.waiters[task] += 1
+        try:
+            # shield: one caller going away must not cancel the work for the others
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and self.waiters.get(task) == 1:
+                # Nobody else is waiting for the result
+                task.cancel()
+            raise
+        finally:
+            if task in self.waiters:
+                self.waiters[task] -= 1
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self.in_flight.get(key) is task:
+            del self.in_flight[key]
+        self.waiters.pop(task, None)
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every caller went away
+            task.exception()
+
+
+def payload_key(*parts: Any) -> str:
+    """Stable key for a JSON-like payload (dict key order does not matter)"""
+    return json.dumps(parts, sort_keys=True, default=str)
+
+
+# Global single-flight group for this process
+single_flight = SingleFlight()
@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Dict, Any, Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Tools started speculatively per question
+SPECULATION_MAX_CANDIDATES = int(os.getenv('SPECULATION_MAX_CANDIDATES', 1))
+# Minimum local ranker score for a tool to be started before the model picks it
+SPECULATION_MIN_SCORE = float(os.getenv('SPECULATION_MIN_SCORE', 1.0))
+SPECULATION_ENABLED = os.getenv('SPECULATION_ENABLED', '1') not in ('0', 'false', 'no')
+
+
+def call_key(tool_name: str, server_name: Optional[str], arguments: Dict[str, Any]) -> tuple:
+    """Identity of a call for matching a speculation with the model's choice
+
+    Arguments left empty count as absent, since the model often spells out
+    optional parameters as null or "".
+    """
+    given = {key: value for key, value in (arguments or {}).items() if value not in (None, '', [], {})}
+    return tool_name, server_name, repr(sorted(given.items()))
+
+
+class SpeculationStats:
+    """How often speculative calls were used, and the time they saved or wasted"""
+
+    def __init__(self):
+        self.launched = 0
+        self.hits = 0
+        self.misses = 0
+        # Of the misses: calls that had already finished, so their whole cost was spent for nothing
+        self.wasted_calls = 0
+        self.saved_ms = 0.0
+        self.wasted_ms = 0.0
+        self.tools: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def _tool(self, tool_name: str) -> Dict[str, int]:
+        return self.tools.setdefault(tool_name, {'launched': 0, 'hits': 0, 'misses': 0})
+
+    def launched_call(self, tool_name: str):
+        with self._lock:
+            self.launched += 1
+            self._tool(tool_name)['launched'] += 1
+
+    def hit(self, tool_name: str, saved_ms: float):
+        with self._lock:
+            self.hits += 1
+            self.saved_ms += saved_ms
+            self._tool(tool_name)['hits'] += 1
+
+    def miss(self, tool_name: str, finished: bool, spent_ms: float):
+        with self._lock:
+            self.misses += 1
+            self.wasted_ms += spent_ms
+            if finished:
+                self.wasted_calls += 1
+            self._tool(tool_name)['misses'] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        settled = self.hits + self.misses
+        return {
+            'enabled': SPECULATION_ENABLED,
+            'launched': self.launched,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / settled, 3) if settled else None,
+            'wasted_calls': self.wasted_calls,
+            'saved_ms': round(self.saved_ms, 1),
+            'wasted_ms': round(self.wasted_ms, 1),
+            'tools': {name: dict(counts) for name, counts in self.tools.items()}
+        }
+
+
+class Speculation:
+    """Tool calls started on a guess while the model is still choosing, for one question
+
+    `start` launches the guesses. Once the plan is known, `settle` cancels
+    the guesses no planned call matches, and `claim` hands a matching call
+    the guess's task instead of a new call. `close` cancels whatever is left
+    (for example when selection failed). Every guess ends up counted as a
+    hit or a miss.
+    """
+
+    def __init__(self, stats: SpeculationStats):
+        self.stats = stats
+        # key -> {'tool_name', 'task', 'started', 'finished'}
+        self.calls: Dict[tuple, Dict[str, Any]] = {}
+        self.settled_at: Optional[float] = None
+
+    def start(self, candidates: List[Dict[str, Any]], launch: Callable[[Dict[str, Any]], Awaitable[Any]]):
+        """Launch each candidate (tool_name, server_name, arguments) with `launch(candidate)`"""
+        for candidate in candidates:
+            key = call_key(candidate['tool_name'], candidate['server_name'], candidate['arguments'])
+            if key in self.calls:
+                continue
+            entry = {'tool_name': candidate['tool_name'], 'task': asyncio.ensure_future(launch(candidate)),
+                     'started': time.perf_counter(), 'finished': None}
+
+            def finished(task: asyncio.Task, entry=entry):
+                entry['finished'] = time.perf_counter()
+                # Failures surface when (if) the result is claimed
+                if not task.cancelled():
+                    task.exception()
+
+            entry['task'].add_done_callback(finished)
+            self.calls[key] = entry
+            self.stats.launched_call(candidate['tool_name'])
+
+    def settle(self, planned: List[Dict[str, Any]]):
+        """Keep the guesses some planned call (with literal arguments) matches; cancel the rest"""
+        self.settled_at = time.perf_counter()
+        wanted = {call_key(call['tool_name'], call['server_name'], call['arguments']) for call in planned}
+        for key in [key for key in self.calls if key not in wanted]:
+            self._drop(key)
+
+    def claim(self, tool_name: str, server_name: Optional[str], arguments: Dict[str, Any]) -> Optional[asyncio.Task]:
+        """The running or finished guess for this call, if there is one"""
+        entry = self.calls.pop(call_key(tool_name, server_name, arguments), None)
+        if entry is None:
+            return None
+        # The time the call had been running before the plan asked for it
+        now = time.perf_counter()
+        head_start = min(self.settled_at or now, entry['finished'] or now) - entry['started']
+        self.stats.hit(tool_name, max(head_start, 0.0) * 1000)
+        return entry['task']
+
+    def close(self):
+        for key in list(self.calls):
+            self._drop(key)
+
+    def _drop(self, key: tuple):
+        entry = self.calls.pop(key)
+        finished = entry['finished'] is not None
+        if not finished:
+            entry['task'].cancel()
+        spent = (entry['finished'] or time.perf_counter()) - entry['started']
+        self.stats.miss(entry['tool_name'], finished, spent * 1000)
+
+
+# Global speculation statistics for this process
+speculation_stats = SpeculationStats()
@@ -0,0 +1,81 @@
+import importlib
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Any
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """Record how long each import and init phase takes while a service boots"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Start timing from now (used by forked service processes)"""
+        self.started_at = time.perf_counter()
+        self.phases: List[Dict[str, Any]] = []
+        self.ready_at = None
+
+    @contextmanager
+    def phase(self, name: str, kind: str = 'init'):
+        """Time a block of startup work"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start, kind)
+
+    def record(self, name: str, seconds: float, kind: str = 'init'):
+        """Record a phase that was timed elsewhere"""
+        self.phases.append({
+            'name': name,
+            'kind': kind,
+            'ms': round(seconds * 1000, 2)
+        })
+
+    def measure_imports(self, *module_names: str):
+        """Import modules one by one so each gets its own cost in the report"""
+        for module_name in module_names:
+            if module_name in sys.modules:
+                continue
+            start = time.perf_counter()
+            try:
+                importlib.import_module(module_name)
+            except ImportError as e:
+                logger.warning(f"Could not import {module_name}: {e}")
+                continue
+            self.record(module_name, time.perf_counter() - start, 'import')
+
+    def mark_ready(self):
+        """Mark the moment the service can take traffic"""
+        if self.ready_at is None:
+            self.ready_at = time.perf_counter()
+
+    def report(self) -> Dict[str, Any]:
+        """Return the startup breakdown"""
+        totals: Dict[str, float] = {}
+        for phase in self.phases:
+            totals[phase['kind']] = round(totals.get(phase['kind'], 0) + phase['ms'], 2)
+
+        return {
+            'pid': os.getpid(),
+            'phases': list(self.phases),
+            'totals_ms': totals,
+            'time_to_ready_ms': round((self.ready_at - self.started_at) * 1000, 2) if self.ready_at else None
+        }
+
+    def log_report(self, service: str):
+        """Log the startup breakdown, slowest phases first"""
+        report = self.report()
+        logger.info(f"⏱️ {service} ready in {report['time_to_ready_ms']}ms (totals: {report['totals_ms']})")
+        for phase in sorted(self.phases, key=lambda p: p['ms'], reverse=True):
+            logger.info(f"⏱️   {phase['kind']:<6} {phase['name']:<40} {phase['ms']:>9.2f}ms")
+
+
+# Global startup timer for this process
+startup_timer = StartupTimer()
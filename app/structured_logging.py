@@ -0,0 +1,220 @@
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, Tuple
+
+# Per-request logging context, set by request_context_middleware
+request_id_var: ContextVar[Optional[str]] = ContextVar('request_id', default=None)
+route_var: ContextVar[Optional[str]] = ContextVar('route', default=None)
+sampled_var: ContextVar[bool] = ContextVar('log_sampled', default=True)
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+
+# Attributes every LogRecord has; anything else was passed with extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+
+# Probes are polled constantly and their INFO records (access log included) say nothing new
+DEFAULT_SAMPLING = {'/livez': 0.0, '/readyz': 0.0}
+
+
+def _load_sampling() -> Dict[str, float]:
+    raw = os.getenv('LOG_SAMPLING')
+    if not raw:
+        return dict(DEFAULT_SAMPLING)
+    try:
+        return {str(prefix): float(rate) for prefix, rate in json.loads(raw).items()}
+    except (ValueError, AttributeError) as e:
+        print(f"Ignoring invalid LOG_SAMPLING: {e}", file=sys.stderr)
+        return {}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the request context and any extra= fields"""
+
+    def __init__(self, service: str):
+        super().__init__()
+        self.service = service
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'service': self.service,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+            'route': getattr(record, 'route', None)
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key not in entry:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class ContextFilter(logging.Filter):
+    """Attach the request context, drop unsampled requests' INFO/DEBUG records and rate-limit noisy call sites
+
+    Runs in the caller's thread before the record is queued, so it only reads
+    context variables and counters. Each call site (file and line) may emit
+    `rate` records per second below ERROR; the number suppressed is reported
+    on the next record it emits.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.buckets: Dict[Tuple[str, int], list] = {}
+        self.suppressed_total = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        record.route = route_var.get()
+
+        if record.levelno < logging.WARNING and not sampled_var.get():
+            return False
+        if record.levelno >= logging.ERROR or self.rate <= 0:
+            return True
+
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                # tokens, last update, suppressed since last emitted record
+                bucket = self.buckets[key] = [float(self.burst), now, 0]
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                self.suppressed_total += 1
+                return False
+            bucket[0] -= 1
+            if bucket[2]:
+                record.suppressed = bucket[2]
+                bucket[2] = 0
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LoggingPipeline:
+    """Root logging for one process: a bounded queue drained by a listener thread"""
+
+    def __init__(self):
+        self.pid = None
+        self.listener: Optional[logging.handlers.QueueListener] = None
+        self.handler: Optional[DroppingQueueHandler] = None
+        self.context_filter: Optional[ContextFilter] = None
+        self.sampling: Dict[str, float] = {}
+
+    def configure(self, service: str):
+        """Replace the root handlers with the queue pipeline (once per process)
+
+        LOG_LEVEL, LOG_FORMAT (json or text), LOG_QUEUE_SIZE, LOG_RATE_LIMIT
+        (records/second per call site) and LOG_SAMPLING (route prefix to the
+        fraction of requests whose INFO/DEBUG records are kept, e.g.
+        {"/tools/call": 0.1, "/livez": 0}) come from the environment.
+        """
+        if self.pid == os.getpid():
+            return
+        self.pid = os.getpid()
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+
+        output = logging.StreamHandler(sys.stdout)
+        if os.getenv('LOG_FORMAT', 'json') == 'json':
+            output.setFormatter(JsonFormatter(service))
+        else:
+            output.setFormatter(logging.Formatter(
+                '%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s'
+            ))
+
+        rate = float(os.getenv('LOG_RATE_LIMIT', 50))
+        self.context_filter = ContextFilter(rate, burst=max(1, int(rate * 2)))
+        self.handler = DroppingQueueHandler(queue.Queue(maxsize=int(os.getenv('LOG_QUEUE_SIZE', 10000))))
+        self.handler.addFilter(self.context_filter)
+        root.addHandler(self.handler)
+
+        self.sampling = _load_sampling()
+        # A forked child inherits the parent's listener object but not its thread
+        self.listener = logging.handlers.QueueListener(self.handler.queue, output, respect_handler_level=True)
+        self.listener.start()
+
+    def sample_rate(self, path: str) -> float:
+        """Sampling rate of the longest configured prefix of `path`"""
+        best = None
+        for prefix in self.sampling:
+            if path.startswith(prefix) and (best is None or len(prefix) > len(best)):
+                best = prefix
+        return self.sampling[best] if best is not None else 1.0
+
+    def stop(self):
+        """Flush queued records"""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'queued': self.handler.queue.qsize() if self.handler else 0,
+            'dropped': self.handler.dropped if self.handler else 0,
+            'suppressed': self.context_filter.suppressed_total if self.context_filter else 0,
+            'sampling': self.sampling
+        }
+
+
+async def request_context_middleware(request, call_next):
+    """Set the request ID (from X-Request-ID or a new one) and the sampling decision for this request
+
+    Each request runs in its own task context, so the values are not reset;
+    that keeps them set for the access log written after the response.
+    """
+    request_id = request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex
+    path = request.url.path
+    rate = logging_pipeline.sample_rate(path)
+    request_id_var.set(request_id)
+    route_var.set(f"{request.method} {path}")
+    sampled_var.set(rate >= 1 or random.random() < rate)
+
+    response = await call_next(request)
+    response.headers[REQUEST_ID_HEADER] = request_id
+    return response
+
+
+def outgoing_headers() -> Dict[str, str]:
+    """Headers that carry the current request ID to another service"""
+    request_id = request_id_var.get()
+    return {REQUEST_ID_HEADER: request_id} if request_id else {}
+
+
+# Global logging pipeline for this process
+logging_pipeline = LoggingPipeline()
@@ -0,0 +1,215 @@
+import csv
+import io
+import json
+import uuid
+from typing import Dict, Any, IO, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from answer_templates import validate_template
+
+# Columns written by COPY, in order
+COPY_COLUMNS = ('id', 'name', 'description', 'parameters', 'server_id', 'api_url', 'http_method',
+                'request_headers', 'request_body', 'speculative', 'answer_template')
+
+# Columns in CSV exports; JSON-valued columns are JSON strings
+EXPORT_COLUMNS = ('id', 'name', 'description', 'parameters', 'server_id', 'api_url', 'http_method',
+                  'request_headers', 'request_body', 'speculative', 'answer_template',
+                  'created_at', 'updated_at')
+
+JSON_COLUMNS = ('parameters', 'request_headers', 'request_body')
+
+# The methods the MCP servers' executors support (_execute_tool_logic)
+HTTP_METHODS = ('GET', 'POST')
+
+# JSON schema types a tool parameter may have
+PARAMETER_TYPES = ('string', 'number', 'integer', 'boolean', 'array', 'object')
+
+FORMATS = ('ndjson', 'csv')
+
+# Errors reported back per import; the rest are only counted
+MAX_REPORTED_ERRORS = 1000
+
+
+def read_rows(stream: IO[bytes], fmt: str) -> Iterator[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+    """Yield (line number, row, parse error) from an NDJSON or CSV upload"""
+    text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row, None
+        return
+
+    for line_no, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_no, None, f"Invalid JSON: {e.msg}"
+            continue
+        if not isinstance(row, dict):
+            yield line_no, None, "Each line must be a JSON object"
+            continue
+        yield line_no, row, None
+
+
+def _json_field(row: Dict[str, Any], field: str, errors: List[str]) -> Any:
+    """JSON column value; CSV cells (and NDJSON strings) hold JSON text"""
+    value = row.get(field)
+    if value in (None, ''):
+        return None
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            errors.append(f"{field} is not valid JSON")
+            return None
+    return value
+
+
+def _bool_field(row: Dict[str, Any], field: str, errors: List[str]) -> bool:
+    """Boolean column value; CSV cells hold true/false text"""
+    value = row.get(field)
+    if value in (None, ''):
+        return False
+    if isinstance(value, str) and value.strip().lower() in ('true', 'false'):
+        return value.strip().lower() == 'true'
+    if not isinstance(value, bool):
+        errors.append(f"{field} must be true or false")
+        return False
+    return value
+
+
+def _parameters(row: Dict[str, Any], errors: List[str]) -> List[Dict[str, Any]]:
+    """Tool parameters with every key build_mcp_tool reads: name, type, description and required"""
+    parameters = _json_field(row, 'parameters', errors) or []
+    if not isinstance(parameters, list):
+        errors.append("parameters must be a list")
+        return []
+
+    normalised = []
+    for position, param in enumerate(parameters, 1):
+        if not isinstance(param, dict) or not param.get('name') or not isinstance(param['name'], str):
+            errors.append(f"parameter {position} must be an object with a name")
+            continue
+        label = f"parameter '{param['name']}'"
+        if param.get('type') not in PARAMETER_TYPES:
+            errors.append(f"{label} type must be one of {', '.join(PARAMETER_TYPES)}")
+        if not isinstance(param.get('description', ''), str):
+            errors.append(f"{label} description must be a string")
+        if not isinstance(param.get('required', False), bool):
+            errors.append(f"{label} required must be true or false")
+        normalised.append(dict(param, description=param.get('description', ''),
+                               required=param.get('required', False)))
+    return normalised
+
+
+def validate_tool(row: Dict[str, Any], servers: Dict[str, str],
+                  default_server_id: Optional[str]) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+    """Check one imported row and normalise it to the tools columns
+
+    `servers` maps server ids and server_a/server_b names to server ids.
+    Returns (tool, []) or (None, errors).
+    """
+    errors = []
+
+    name = (row.get('name') or '').strip()
+    if not name:
+        errors.append("name is required")
+
+    server_ref = row.get('server_id') or row.get('server_name') or default_server_id
+    server_id = servers.get(server_ref) if server_ref else None
+    if not server_ref:
+        errors.append("server_id or server_name is required")
+    elif server_id is None:
+        errors.append(f"Unknown server '{server_ref}'")
+
+    http_method = (row.get('http_method') or 'GET').upper()
+    if http_method not in HTTP_METHODS:
+        errors.append(f"http_method must be one of {', '.join(HTTP_METHODS)}")
+
+    api_url = row.get('api_url') or None
+    if api_url and urlparse(api_url).scheme not in ('http', 'https'):
+        errors.append("api_url must be an http(s) URL")
+
+    parameters = _parameters(row, errors)
+
+    request_headers = _json_field(row, 'request_headers', errors)
+    if request_headers is not None and not isinstance(request_headers, dict):
+        errors.append("request_headers must be an object")
+    request_body = _json_field(row, 'request_body', errors)
+
+    speculative = _bool_field(row, 'speculative', errors)
+
+    answer_template = row.get('answer_template') or None
+    if answer_template is not None and not isinstance(answer_template, str):
+        errors.append("answer_template must be a string")
+    elif answer_template is not None:
+        try:
+            validate_template(answer_template)
+        except ValueError as e:
+            errors.append(str(e))
+
+    if errors:
+        return None, errors
+
+    return {
+        'id': str(row.get('id') or uuid.uuid4()),
+        'name': name,
+        'description': row.get('description') or None,
+        'parameters': parameters,
+        'server_id': server_id,
+        'api_url': api_url,
+        'http_method': http_method,
+        'request_headers': request_headers,
+        'request_body': request_body,
+        'speculative': speculative,
+        'answer_template': answer_template
+    }, []
+
+
+def _copy_value(value: Any) -> str:
+    """Value in COPY text format"""
+    if value is None:
+        return '\\N'
+    if not isinstance(value, str):
+        value = json.dumps(value)
+    return (value.replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def copy_line(tool: Dict[str, Any]) -> str:
+    """A validated tool as one COPY text-format line"""
+    values = []
+    for column in COPY_COLUMNS:
+        value = tool[column]
+        if column in JSON_COLUMNS and value is not None:
+            value = json.dumps(value)
+        values.append(_copy_value(value))
+    return '\t'.join(values) + '\n'
+
+
+def export_ndjson(rows: Iterator[Dict[str, Any]]) -> Iterator[str]:
+    """Serialized tool rows as NDJSON lines"""
+    for row in rows:
+        yield json.dumps(row) + '\n'
+
+
+def export_csv(rows: Iterator[Dict[str, Any]], batch_size: int = 500) -> Iterator[str]:
+    """Serialized tool rows as CSV, a batch of rows per chunk"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    count = 0
+    for row in rows:
+        writer.writerow([
+            json.dumps(row.get(column)) if column in JSON_COLUMNS and row.get(column) is not None
+            else row.get(column)
+            for column in EXPORT_COLUMNS
+        ])
+        count += 1
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
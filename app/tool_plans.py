@@ -0,0 +1,226 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from typing import Dict, Any, Awaitable, Callable, List, Optional
+
+from deadlines import Deadline
+
+logger = logging.getLogger(__name__)
+
+# Tool calls one plan may contain
+PLAN_MAX_CALLS = int(os.getenv('PLAN_MAX_CALLS', 6))
+# Seconds all of a plan's tool calls together may take
+PLAN_DEADLINE = float(os.getenv('PLAN_DEADLINE', 20))
+
+# Outcomes of a planned call
+OK = 'ok'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+TIMED_OUT = 'timed_out'
+
+# "{{c1.result.path}}" in an argument refers to (part of) an earlier call's result
+_REFERENCE = re.compile(r'\{\{\s*([A-Za-z0-9_-]+)((?:\.[A-Za-z0-9_-]+)*)\s*\}\}')
+_JSON_BLOCK = re.compile(r"```(?:json)?\s*(.*?)\s*```", re.DOTALL)
+
+PLAN_INSTRUCTIONS = """
+    Plan the tool calls needed to answer the question; use several calls when it asks for several things.
+    You must respond with a JSON object with one key, "calls", a list of objects with the keys:
+    "id": a short unique id such as "c1",
+    "tool_name": the name of the selected tool,
+    "server_name": the name of the server where the tool is located,
+    "arguments": an object with the tool's arguments, extracted from the user's question,
+    "depends_on": ids of earlier calls whose results this call needs (usually empty).
+    An argument may be "{{c1.field}}" to use a field of call c1's result; only do that when the value cannot be known in advance.
+    Calls without dependencies run at the same time.
+    If no tool is suitable, respond with {"calls": []}.
+    """
+
+
+class PlanError(ValueError):
+    """The model's plan could not be parsed or is not executable"""
+
+
+def parse_plan(text: str) -> List[Dict[str, Any]]:
+    """Validated calls from the model's response
+
+    Also accepts the single-call {"tool_name", "arguments", "server_name"}
+    form. Each call gets an id, arguments and depends_on; dependencies must
+    name other calls in the plan and must not form a cycle.
+    """
+    match = _JSON_BLOCK.search(text or '')
+    try:
+        data = json.loads(match.group(1) if match else text)
+    except (TypeError, ValueError):
+        raise PlanError("The model did not return valid JSON")
+
+    if isinstance(data, dict) and 'calls' in data:
+        raw_calls = data['calls']
+    elif isinstance(data, dict) and 'tool_name' in data:
+        raw_calls = [] if data.get('tool_name') in (None, '', 'none') else [data]
+    else:
+        raise PlanError("The model did not return a plan")
+    if not isinstance(raw_calls, list):
+        raise PlanError("'calls' must be a list")
+    if len(raw_calls) > PLAN_MAX_CALLS:
+        raise PlanError(f"A plan may have at most {PLAN_MAX_CALLS} calls")
+
+    calls = []
+    for position, raw in enumerate(raw_calls, 1):
+        if not isinstance(raw, dict) or not raw.get('tool_name') or raw.get('tool_name') == 'none':
+            raise PlanError(f"Call {position} has no tool_name")
+        arguments = raw.get('arguments') or {}
+        depends_on = raw.get('depends_on') or []
+        if not isinstance(arguments, dict) or not isinstance(depends_on, list):
+            raise PlanError(f"Call {position} has malformed arguments or depends_on")
+        calls.append({
+            'id': str(raw.get('id') or f'c{position}'),
+            'tool_name': raw['tool_name'],
+            'server_name': raw.get('server_name'),
+            'arguments': arguments,
+            'depends_on': [str(dependency) for dependency in depends_on]
+        })
+
+    ids = [call['id'] for call in calls]
+    if len(set(ids)) != len(ids):
+        raise PlanError("Call ids must be unique")
+    for call in calls:
+        # References in arguments are dependencies too, even if the model forgot to list them
+        for dependency in references(call['arguments']):
+            if dependency not in call['depends_on']:
+                call['depends_on'].append(dependency)
+        for dependency in call['depends_on']:
+            if dependency not in ids or dependency == call['id']:
+                raise PlanError(f"Call {call['id']} depends on unknown call {dependency}")
+    _check_acyclic(calls)
+    return calls
+
+
+def references(value: Any) -> List[str]:
+    """Ids of the calls referred to anywhere in an argument value"""
+    if isinstance(value, str):
+        return [match.group(1) for match in _REFERENCE.finditer(value)]
+    if isinstance(value, dict):
+        return [ref for item in value.values() for ref in references(item)]
+    if isinstance(value, list):
+        return [ref for item in value for ref in references(item)]
+    return []
+
+
+def _check_acyclic(calls: List[Dict[str, Any]]):
+    depends_on = {call['id']: call['depends_on'] for call in calls}
+    state: Dict[str, int] = {}
+
+    def visit(call_id: str):
+        if state.get(call_id) == 1:
+            raise PlanError(f"Calls depend on each other in a cycle through {call_id}")
+        if state.get(call_id) == 2:
+            return
+        state[call_id] = 1
+        for dependency in depends_on[call_id]:
+            visit(dependency)
+        state[call_id] = 2
+
+    for call_id in depends_on:
+        visit(call_id)
+
+
+def _lookup(result: Any, path: str) -> Any:
+    for key in filter(None, path.split('.')):
+        if isinstance(result, dict) and key in result:
+            result = result[key]
+        elif isinstance(result, list) and key.isdigit() and int(key) < len(result):
+            result = result[int(key)]
+        else:
+            raise PlanError(f"Result has no field '{path.lstrip('.')}'")
+    return result
+
+
+def resolve_arguments(value: Any, results: Dict[str, Any]) -> Any:
+    """Arguments with references to earlier results filled in
+
+    A string that is exactly one reference takes the referenced value as is;
+    references inside longer strings are formatted as text.
+    """
+    if isinstance(value, str):
+        whole = _REFERENCE.fullmatch(value.strip())
+        if whole:
+            return _lookup(results[whole.group(1)], whole.group(2))
+
+        def text(match):
+            found = _lookup(results[match.group(1)], match.group(2))
+            return found if isinstance(found, str) else json.dumps(found)
+        return _REFERENCE.sub(text, value)
+    if isinstance(value, dict):
+        return {key: resolve_arguments(item, results) for key, item in value.items()}
+    if isinstance(value, list):
+        return [resolve_arguments(item, results) for item in value]
+    return value
+
+
+async def execute_plan(calls: List[Dict[str, Any]],
+                       run: Callable[[Dict[str, Any], Dict[str, Any], Deadline], Awaitable[Any]],
+                       deadline: Deadline) -> List[Dict[str, Any]]:
+    """Run every call as soon as its dependencies have succeeded, all within `deadline`
+
+    `run(call, arguments, deadline)` performs one call. Returns one outcome
+    per call, in plan order: status (ok, failed, skipped when a dependency
+    did not succeed, timed_out when the deadline passed first), result or
+    error, and elapsed_ms. One call failing never fails the plan.
+    """
+    results: Dict[str, Any] = {}
+    outcomes: Dict[str, Dict[str, Any]] = {
+        call['id']: {'id': call['id'], 'tool_name': call['tool_name'], 'server_name': call['server_name'],
+                     'status': TIMED_OUT}
+        for call in calls
+    }
+    tasks: Dict[str, asyncio.Task] = {}
+
+    async def perform(call: Dict[str, Any]):
+        outcome = outcomes[call['id']]
+        if call['depends_on']:
+            await asyncio.gather(*(tasks[dependency] for dependency in call['depends_on']))
+            failed = [dependency for dependency in call['depends_on'] if dependency not in results]
+            if failed:
+                outcome.update(status=SKIPPED, error=f"Depends on {', '.join(failed)}, which did not succeed")
+                return
+        start = time.perf_counter()
+        try:
+            arguments = resolve_arguments(call['arguments'], results)
+            outcome['arguments'] = arguments
+            result = await run(call, arguments, deadline)
+        except asyncio.CancelledError:
+            outcome['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 1)
+            raise
+        except Exception as e:
+            outcome.update(status=FAILED, error=getattr(e, 'detail', None) or str(e) or type(e).__name__)
+        else:
+            results[call['id']] = result
+            outcome.update(status=OK, result=result)
+        outcome['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 1)
+
+    # Tasks are created in plan order but a call's dependencies may come later in the list
+    pending = {call['id']: call for call in calls}
+    while pending:
+        for call_id, call in list(pending.items()):
+            if all(dependency in tasks for dependency in call['depends_on']):
+                tasks[call_id] = asyncio.ensure_future(perform(call))
+                del pending[call_id]
+
+    try:
+        done, not_done = await asyncio.wait(tasks.values(), timeout=deadline.remaining())
+    except asyncio.CancelledError:
+        for task in tasks.values():
+            task.cancel()
+        raise
+    for task in not_done:
+        task.cancel()
+    if not_done:
+        await asyncio.gather(*not_done, return_exceptions=True)
+        logger.warning(f"Plan deadline passed with {len(not_done)} of {len(calls)} calls unfinished")
+    for outcome in outcomes.values():
+        if outcome['status'] == TIMED_OUT:
+            outcome['error'] = "The plan's deadline passed before this call finished"
+    return [outcomes[call['id']] for call in calls]
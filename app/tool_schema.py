@@ -0,0 +1,53 @@
+from typing import Dict, Any
+
+
+def build_mcp_tool(tool: Dict[str, Any], server_name: str) -> Dict[str, Any]:
+    """Turn a tools row into the MCP tool description served by /tools"""
+    mcp_tool = {
+        'id': tool['id'],
+        'name': tool['name'],
+        'description': tool['description'] or f"Tool: {tool['name']}",
+        'parameters': tool['parameters'],
+        'api_url': tool['api_url'],
+        'http_method': tool['http_method'],
+        'inputSchema': {
+            'type': 'object',
+            'properties': {
+                'operation': {
+                    'type': 'string',
+                    'description': 'Operation to perform',
+                    'enum': ['execute', 'info']
+                }
+            },
+            'required': ['operation']
+        }
+    }
+
+    # Add tool parameters to schema; rows written before imports were validated may lack keys
+    for param in tool['parameters'] or []:
+        mcp_tool['inputSchema']['properties'][param['name']] = {
+            'type': param.get('type', 'string'),
+            'description': param.get('description', '')
+        }
+        if param.get('required'):
+            mcp_tool['inputSchema']['required'].append(param['name'])
+
+    # Opted in to being started before the model has chosen it (frontend_api.speculative_candidates)
+    if tool.get('speculative'):
+        mcp_tool['speculative'] = True
+    # Renders answers from this tool's results without a model call (answer_templates.py)
+    if tool.get('answer_template'):
+        mcp_tool['answer_template'] = tool['answer_template']
+
+    mcp_tool['server_name'] = server_name
+    return mcp_tool
+
+
+def json_content(value: Any) -> Dict[str, Any]:
+    """MCP content block carrying a structured tool result (not a pre-serialised string)"""
+    return {'type': 'json', 'json': value}
+
+
+def text_content(text: str) -> Dict[str, Any]:
+    """MCP text content block"""
+    return {'type': 'text', 'text': text}
@@ -0,0 +1,332 @@
+import heapq
+import logging
+import math
+import queue
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Dict, Any, Callable, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Field weights: a query word in the name counts three times as much as in the description
+NAME_WEIGHT = 3.0
+DESCRIPTION_WEIGHT = 1.0
+
+# Query words shorter than this are not matched fuzzily, and fuzzy matches
+# must share at least this fraction of trigrams with the query word (as pg_trgm)
+FUZZY_MIN_LENGTH = 4
+FUZZY_MIN_SIMILARITY = 0.3
+# Vocabulary terms considered per query word for prefix and fuzzy matching
+MAX_EXPANSIONS = 50
+
+# Scales of a prefix or fuzzy match relative to an exact one
+PREFIX_FACTOR = 0.7
+FUZZY_FACTOR = 0.5
+
+# Terms in more than this share of tools (and at least COMMON_TERM_MIN of
+# them) are common: on their own they only find tools with the term in the
+# name, since their description matches are both numerous and uninformative
+COMMON_TERM_SHARE = 0.02
+COMMON_TERM_MIN = 1000
+
+_CAMEL_CASE = re.compile(r'([a-z0-9])([A-Z])')
+_WORD = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lowercase words of a name or description; get_weather and getWeather both give get, weather"""
+    if not text:
+        return []
+    return _WORD.findall(_CAMEL_CASE.sub(r'\1 \2', text).lower())
+
+
+def prefix_tsquery(query: str) -> str:
+    """Postgres tsquery text matching tools that have any query word as a word prefix
+
+    Like ToolSearchIndex.search, a tool need not match every word; ts_rank
+    puts tools matching more of them first.
+    """
+    return ' | '.join(f'{word}:*' for word in dict.fromkeys(tokenize(query)))
+
+
+def trigrams(term: str) -> Set[str]:
+    padded = f'  {term} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ToolSearchIndex:
+    """In-memory inverted index over tool names and descriptions
+
+    Matches each query word exactly, as a prefix of indexed words, and
+    fuzzily (trigram similarity) for typos, scoring by field weight and
+    inverse document frequency. Tools are added and removed one at a time,
+    so the index can follow catalog changes without a rebuild.
+    """
+
+    def __init__(self):
+        self.tools: Dict[str, Dict[str, Any]] = {}
+        # term -> {tool id: weight of the term in that tool}
+        self.postings: Dict[str, Dict[str, float]] = {}
+        # term -> ids of the tools with the term in their name
+        self.name_postings: Dict[str, Set[str]] = {}
+        # tool id -> its name's words joined by spaces, for phrase bonuses
+        self.phrases: Dict[str, str] = {}
+        # All terms, sorted, for prefix lookups
+        self.terms: List[str] = []
+        # trigram -> terms containing it, for fuzzy lookups
+        self.trigram_terms: Dict[str, Set[str]] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.tools)
+
+    @staticmethod
+    def _weights(tool: Dict[str, Any]) -> Dict[str, float]:
+        weights: Dict[str, float] = {}
+        for term in set(tokenize(tool.get('name'))):
+            weights[term] = NAME_WEIGHT
+        for term, count in Counter(tokenize(tool.get('description'))).items():
+            weights[term] = weights.get(term, 0.0) + DESCRIPTION_WEIGHT * min(count, 2)
+        return weights
+
+    def add(self, tool: Dict[str, Any]):
+        """Index a tool (id, name, description, server_id), replacing any earlier version"""
+        tool_id = str(tool['id'])
+        summary = {
+            'id': tool_id,
+            'name': tool.get('name'),
+            'description': tool.get('description'),
+            'server_id': tool.get('server_id')
+        }
+        with self._lock:
+            self.remove(tool_id)
+            self.tools[tool_id] = summary
+            self.phrases[tool_id] = ' '.join(tokenize(summary['name']))
+            for term in set(tokenize(summary['name'])):
+                self.name_postings.setdefault(term, set()).add(tool_id)
+            for term, weight in self._weights(summary).items():
+                posting = self.postings.get(term)
+                if posting is None:
+                    posting = self.postings[term] = {}
+                    insort(self.terms, term)
+                    for trigram in trigrams(term):
+                        self.trigram_terms.setdefault(trigram, set()).add(term)
+                posting[tool_id] = weight
+
+    def remove(self, tool_id: str):
+        with self._lock:
+            tool = self.tools.pop(str(tool_id), None)
+            if tool is None:
+                return
+            self.phrases.pop(tool['id'], None)
+            for term in set(tokenize(tool['name'])):
+                ids = self.name_postings.get(term)
+                if ids is not None:
+                    ids.discard(tool['id'])
+                    if not ids:
+                        del self.name_postings[term]
+            for term in self._weights(tool):
+                posting = self.postings.get(term)
+                if posting is None:
+                    continue
+                posting.pop(tool['id'], None)
+                if not posting:
+                    del self.postings[term]
+                    index = bisect_left(self.terms, term)
+                    if index < len(self.terms) and self.terms[index] == term:
+                        del self.terms[index]
+                    for trigram in trigrams(term):
+                        terms = self.trigram_terms.get(trigram)
+                        if terms is not None:
+                            terms.discard(term)
+                            if not terms:
+                                del self.trigram_terms[trigram]
+
+    def _idf(self, term: str) -> float:
+        return math.log(1 + len(self.tools) / len(self.postings[term]))
+
+    def _expansions(self, word: str) -> Dict[str, float]:
+        """Indexed terms matching one query word, with the factor each match is worth"""
+        matches: Dict[str, float] = {}
+        if word in self.postings:
+            matches[word] = 1.0
+
+        index = bisect_left(self.terms, word)
+        while index < len(self.terms) and len(matches) < MAX_EXPANSIONS and self.terms[index].startswith(word):
+            matches.setdefault(self.terms[index], PREFIX_FACTOR)
+            index += 1
+
+        # Typos only: a word that matches something as typed is not also matched fuzzily
+        if not matches and len(word) >= FUZZY_MIN_LENGTH:
+            word_trigrams = trigrams(word)
+            shared: Counter = Counter()
+            for trigram in word_trigrams:
+                shared.update(self.trigram_terms.get(trigram, ()))
+            for term, count in shared.most_common(MAX_EXPANSIONS):
+                similarity = count / (len(word_trigrams) + len(trigrams(term)) - count)
+                if similarity >= FUZZY_MIN_SIMILARITY and term not in matches:
+                    matches[term] = FUZZY_FACTOR * similarity
+        return matches
+
+    def search(self, query: str, server_ids: Optional[Set[str]] = None, tool_ids: Optional[Set[str]] = None,
+               limit: int = 20) -> List[Dict[str, Any]]:
+        """Best matching tools, highest score first
+
+        `server_ids` and `tool_ids` restrict the results. Tools matching
+        more of the query words rank above tools matching fewer.
+        """
+        words = list(dict.fromkeys(tokenize(query)))
+        if not words:
+            return []
+        phrase = ' '.join(words)
+
+        with self._lock:
+            common = max(COMMON_TERM_MIN, COMMON_TERM_SHARE * len(self.tools))
+            expanded = [self._expansions(word) for word in words]
+            # Rarest words first: once they have produced candidates, common
+            # words only add to those candidates' scores instead of pulling
+            # in (and scoring) a large share of the catalog
+            expanded.sort(key=lambda matches: sum(len(self.postings[term]) for term in matches))
+
+            scores: Dict[str, float] = {}
+            matched: Dict[str, int] = {}
+            for matches in expanded:
+                size = sum(len(self.postings[term]) for term in matches)
+                restrict = bool(scores) and size > len(scores)
+                best: Dict[str, float] = {}
+                for term, factor in matches.items():
+                    posting = self.postings[term]
+                    scale = factor * self._idf(term)
+                    if restrict:
+                        pairs = ((tool_id, posting[tool_id]) for tool_id in scores if tool_id in posting)
+                    elif len(posting) > common:
+                        pairs = ((tool_id, posting[tool_id]) for tool_id in self.name_postings.get(term, ()))
+                    else:
+                        pairs = posting.items()
+                    for tool_id, weight in pairs:
+                        score = scale * weight
+                        if score > best.get(tool_id, 0.0):
+                            best[tool_id] = score
+                for tool_id, score in best.items():
+                    scores[tool_id] = scores.get(tool_id, 0.0) + score
+                    matched[tool_id] = matched.get(tool_id, 0) + 1
+
+            results = []
+            for tool_id, score in scores.items():
+                tool = self.tools[tool_id]
+                if server_ids is not None and tool['server_id'] not in server_ids:
+                    continue
+                if tool_ids is not None and tool_id not in tool_ids:
+                    continue
+                score *= (matched[tool_id] / len(words)) ** 2
+                name = self.phrases[tool_id]
+                if name == phrase:
+                    score *= 2
+                elif name.startswith(phrase):
+                    score *= 1.5
+                results.append((score, tool_id))
+
+            return [dict(self.tools[tool_id], score=round(score, 4))
+                    for score, tool_id in heapq.nlargest(limit, results)]
+
+
+# Queue entry asking for a full rebuild instead of a single tool refresh
+_REBUILD = object()
+
+
+class ToolSearchService:
+    """Keeps a ToolSearchIndex in step with the catalog from a background thread
+
+    The index is built from `load_all` when the thread starts and on every
+    change without a tool id (bulk imports, reconnects). Changes to one tool
+    reload just that tool with `load_one`. Until the first build finishes,
+    `ready` is False and callers should search the database instead.
+    """
+
+    def __init__(self, load_all: Callable[[], Iterable[Dict[str, Any]]],
+                 load_one: Callable[[str], Optional[Dict[str, Any]]]):
+        self.load_all = load_all
+        self.load_one = load_one
+        self.index = ToolSearchIndex()
+        self.ready = False
+        self.built_at: Optional[float] = None
+        self.build_ms = 0.0
+        self.updates = 0
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        self._queue.put(_REBUILD)
+        self._thread = threading.Thread(target=self._run, name='tool-search-index', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._queue.put(None)
+
+    def on_catalog_change(self, entity: Optional[str], entity_id: Optional[str]):
+        """Catalog listener: queue the changed tool, or a rebuild when the change is not specific"""
+        if entity == 'tool' and entity_id:
+            self._queue.put(str(entity_id))
+        elif entity in ('tool', None):
+            self._queue.put(_REBUILD)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            batch = [self._queue.get()]
+            # Coalesce everything queued meanwhile
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                return
+            try:
+                if any(item is _REBUILD for item in batch):
+                    self._rebuild()
+                else:
+                    for tool_id in dict.fromkeys(batch):
+                        self._refresh(tool_id)
+            except Exception as e:
+                logger.error(f"Tool search index update failed: {e}; rebuilding in 5s")
+                self._stopped.wait(5)
+                self._queue.put(_REBUILD)
+
+    def _rebuild(self):
+        start = time.perf_counter()
+        index = ToolSearchIndex()
+        for tool in self.load_all():
+            index.add(tool)
+        # Searches keep using the old index until the new one is complete
+        self.index = index
+        self.ready = True
+        self.built_at = time.time()
+        self.build_ms = (time.perf_counter() - start) * 1000
+        logger.info(f"Tool search index built with {len(index)} tools in {self.build_ms:.0f}ms")
+
+    def _refresh(self, tool_id: str):
+        tool = self.load_one(tool_id)
+        if tool is None:
+            self.index.remove(tool_id)
+        else:
+            self.index.add(tool)
+        self.updates += 1
+
+    def search(self, query: str, **options) -> List[Dict[str, Any]]:
+        return self.index.search(query, **options)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'ready': self.ready,
+            'tools': len(self.index),
+            'terms': len(self.index.terms),
+            'build_ms': round(self.build_ms, 1),
+            'built_at': self.built_at,
+            'incremental_updates': self.updates,
+            'pending': self._queue.qsize()
+        }
@@ -14,6 +14,133 @@ document.addEventListener('DOMContentLoaded', () => {
         messageElement.textContent = message;
         chatContainer.appendChild(messageElement);
         chatContainer.scrollTop = chatContainer.scrollHeight;
+        return messageElement;
+    };
+
+    const agentId = document.getElementById('agent-servers').dataset.agentId;
+
+    // The server keeps this conversation's history, so follow-up questions have context;
+    // the id lasts as long as the tab, across reconnects and the HTTP fallback
+    const conversationKey = `conversation:${agentId}`;
+    let conversationId = sessionStorage.getItem(conversationKey);
+    if (!conversationId) {
+        conversationId = window.crypto && crypto.randomUUID
+            ? crypto.randomUUID().replace(/-/g, '')
+            : `${Date.now().toString(36)}${Math.random().toString(36).slice(2)}`;
+        sessionStorage.setItem(conversationKey, conversationId);
+    }
+    // The server starts a conversation under another id when ours belongs to a different agent
+    const useConversation = (id) => {
+        if (id && id !== conversationId) {
+            conversationId = id;
+            sessionStorage.setItem(conversationKey, conversationId);
+        }
+    };
+
+    const STAGE_TEXT = {
+        selecting_tool: () => 'Choosing a tool...',
+        executing_tool: (update) => `Running '${update.tool}' on '${update.server}'...`,
+        summarizing: () => 'Writing the answer...'
+    };
+
+    // One socket per page carries every question; replies are matched by message id
+    const pending = new Map();
+    let socket = null;
+    let socketReady = null;
+    let nextId = 1;
+    // Leaving the page closes the socket, which cancels whatever is still in flight
+    let leaving = false;
+    window.addEventListener('pagehide', () => { leaving = true; });
+
+    const openSocket = () => {
+        const scheme = window.location.protocol === 'https:' ? 'wss' : 'ws';
+        socket = new WebSocket(`${scheme}://${window.location.host}/ws/chat/${encodeURIComponent(agentId)}?conversation=${conversationId}`);
+        socketReady = new Promise((resolve, reject) => {
+            socket.addEventListener('message', function onReady(event) {
+                const message = JSON.parse(event.data);
+                if (message.type === 'ready') {
+                    useConversation(message.conversation_id);
+                    socket.removeEventListener('message', onReady);
+                    resolve(socket);
+                }
+            });
+            socket.addEventListener('close', () => reject(new Error('Chat connection closed')));
+        });
+        socketReady.catch(() => {});
+
+        socket.addEventListener('message', (event) => {
+            const update = JSON.parse(event.data);
+            const entry = pending.get(update.id);
+            if (!entry) return;
+            if (update.type === 'progress') {
+                const text = STAGE_TEXT[update.stage];
+                if (text) entry.element.textContent = text(update);
+                return;
+            }
+            pending.delete(update.id);
+            if (update.type === 'answer') {
+                entry.resolve(update);
+            } else if (update.type === 'cancelled') {
+                entry.resolve({ answer: 'Cancelled.' });
+            } else {
+                entry.reject(new Error(update.detail || 'Request failed'));
+            }
+        });
+
+        socket.addEventListener('close', () => {
+            // A tool call already under way may still finish upstream, so asking again
+            // automatically could run it twice; the user decides whether to retry
+            const orphans = Array.from(pending.values());
+            pending.clear();
+            socket = null;
+            if (leaving) return;
+            orphans.forEach(entry => entry.reject(new ConnectionLost()));
+        });
+    };
+
+    class ConnectionLost extends Error {
+        constructor() {
+            super('The chat connection was lost before the answer arrived');
+        }
+    }
+
+    const askOverHttp = async (question) => {
+        const response = await fetch('/ask', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                question: question,
+                agent_id: agentId,
+                conversation_id: conversationId
+            }),
+        });
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        const data = await response.json();
+        useConversation(data.conversation_id);
+        return data;
+    };
+
+    const ask = async (question, element) => {
+        if (!socket) openSocket();
+        let ready;
+        try {
+            ready = await socketReady;
+        } catch (error) {
+            return askOverHttp(question);
+        }
+        const id = String(nextId++);
+        return new Promise((resolve, reject) => {
+            pending.set(id, { question, element, resolve, reject });
+            ready.send(JSON.stringify({ type: 'ask', id, question }));
+            element.title = 'Click to cancel';
+            element.addEventListener('click', () => {
+                if (pending.has(id)) ready.send(JSON.stringify({ type: 'cancel', id }));
+            }, { once: true });
+        });
     };
 
     chatForm.addEventListener('submit', async (e) => {
@@ -24,34 +151,104 @@ document.addEventListener('DOMContentLoaded', () => {
         addMessage(message, 'user');
         messageInput.value = '';
 
-        const pathParts = window.location.pathname.split('/');
-        const agentId = pathParts[pathParts.length - 1];
+        // Questions do not wait for each other: each answer fills in its own placeholder
+        answerInto(message, addMessage('Thinking...', 'bot'));
+    });
 
+    const answerInto = async (message, placeholder) => {
         try {
-            const response = await fetch('/ask', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({ 
-                    question: message,
-                    agent_id: agentId
-                }),
-            });
+            const data = await ask(message, placeholder);
+            placeholder.textContent = data.answer || 'Sorry, I could not get a response.';
+            placeholder.removeAttribute('title');
+        } catch (error) {
+            console.error('Error sending message:', error);
+            if (error instanceof ConnectionLost) {
+                placeholder.textContent = `${error.message}. Click to ask again.`;
+                placeholder.title = 'Click to ask again';
+                placeholder.addEventListener('click', () => {
+                    placeholder.textContent = 'Thinking...';
+                    answerInto(message, placeholder);
+                }, { once: true });
+            } else {
+                placeholder.textContent = 'An error occurred while sending your message.';
+                placeholder.removeAttribute('title');
+            }
+        }
+        chatContainer.scrollTop = chatContainer.scrollHeight;
+    };
+
+    // Tool panels load after the page has painted; each server's panel
+    // fills in on its own, so one slow server does not hold up the others
+    const serversPanel = document.getElementById('agent-servers');
+
+    const renderToolList = (list, tools) => {
+        list.innerHTML = '';
+        if (!tools || tools.length === 0) {
+            const item = document.createElement('li');
+            item.textContent = 'No tools found for this server.';
+            list.appendChild(item);
+            return;
+        }
+        tools.forEach(tool => {
+            const item = document.createElement('li');
+            item.textContent = tool.name;
+            list.appendChild(item);
+        });
+    };
+
+    const renderServer = (agentId, server) => {
+        const panel = document.createElement('div');
+        panel.classList.add('mt-4', 'p-2', 'border', 'rounded');
+
+        const name = document.createElement('p');
+        name.classList.add('font-bold');
+        name.textContent = server.name;
+        const url = document.createElement('p');
+        url.classList.add('text-sm', 'text-gray-600');
+        url.textContent = server.url;
+        const heading = document.createElement('h4');
+        heading.classList.add('text-lg', 'font-semibold', 'mt-2');
+        heading.textContent = 'Tools';
+        const list = document.createElement('ul');
+        list.classList.add('list-disc', 'list-inside');
+
+        panel.append(name, url, heading, list);
+        serversPanel.appendChild(panel);
 
+        if (server.tools && server.tools.length > 0) {
+            renderToolList(list, server.tools);
+            return;
+        }
+
+        // Tools not in our database are fetched from the server itself
+        list.innerHTML = '<li class="text-gray-500">Loading tools...</li>';
+        fetch(`/agents/${agentId}/servers/${encodeURIComponent(server.id)}/tools`)
+            .then(response => response.ok ? response.json() : { tools: [] })
+            .then(data => renderToolList(list, data.tools))
+            .catch(() => renderToolList(list, []));
+    };
+
+    const loadServers = async () => {
+        try {
+            const response = await fetch(`/agents/${agentId}/context`);
             if (!response.ok) {
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
-
-            const data = await response.json();
-            const botMessage = data.answer || 'Sorry, I could not get a response.';
-            addMessage(botMessage, 'bot');
-
+            const context = await response.json();
+            serversPanel.innerHTML = '';
+            if (!context.servers || context.servers.length === 0) {
+                serversPanel.innerHTML = '<p class="mt-4">No servers connected to this agent.</p>';
+                return;
+            }
+            context.servers.forEach(server => renderServer(agentId, server));
         } catch (error) {
-            console.error('Error sending message:', error);
-            addMessage('An error occurred while sending your message.', 'bot');
+            console.error('Error loading servers:', error);
+            serversPanel.innerHTML = '<p class="mt-4 text-red-500">Could not load servers.</p>';
         }
-    });
+    };
+
+    loadServers();
+    openSocket();
 
     // Initial message from the bot
     addMessage(`Welcome! You can ask me anything.`, 'bot');
@@ -1,5 +1,8 @@
 document.addEventListener('DOMContentLoaded', () => {
     const toolList = document.getElementById('tool-list');
+    const toolListSpacer = document.getElementById('tool-list-spacer');
+    const toolCount = document.getElementById('tool-count');
+    const toolSearch = document.getElementById('tool-search');
     const addToolForm = document.getElementById('add-tool-form');
 
     const editToolModal = document.getElementById('edit-tool-modal');
@@ -15,37 +18,204 @@ document.addEventListener('DOMContentLoaded', () => {
 
     closeModalBtn.addEventListener('click', hideModal);
 
-    const renderTools = (tools) => {
-        toolList.innerHTML = '';
-        if (tools && tools.length > 0) {
-            tools.forEach(tool => {
-                const toolCard = `
-                    <div class="bg-white p-6 rounded-lg shadow-md">
-                        <h6 class="text-lg font-bold">${tool.name}</h6>
-                        <p class="text-gray-600">${tool.description}</p>
-                        <div class="mt-4">
-                            <button class="bg-gray-500 hover:bg-gray-700 text-white font-bold py-2 px-4 rounded edit-tool-btn" data-tool='${JSON.stringify(tool)}'>Edit</button>
-                            <button class="bg-red-500 hover:bg-red-700 text-white font-bold py-2 px-4 rounded delete-tool-btn" data-tool-id="${tool.id}">Delete</button>
-                        </div>
-                    </div>
-                `;
-                toolList.insertAdjacentHTML('beforeend', toolCard);
-            });
-        } else {
-            toolList.innerHTML = '<p class="text-gray-500">No tools found for this server.</p>';
+    // Rows have a fixed height, so the visible window follows from scrollTop alone
+    const ROW_HEIGHT = 88;
+    const OVERSCAN = 10;
+    const PAGE_SIZE = 200;
+
+    // Loaded tools in listing order (name, id), fetched a page at a time
+    let tools = [];
+    let total = null;
+    let nextCursor = null;
+    let loading = null;
+    let prefix = '';
+    // Row elements currently in the DOM, by index into `tools`
+    let rendered = new Map();
+
+    const listingUrl = (cursor) => {
+        const params = new URLSearchParams({ limit: PAGE_SIZE });
+        if (cursor) params.set('cursor', cursor);
+        if (prefix) params.set('prefix', prefix);
+        return `/servers/${encodeURIComponent(serverName)}/tools?${params}`;
+    };
+
+    const buildRow = (tool, index) => {
+        const row = document.createElement('div');
+        row.className = 'absolute left-0 right-0 px-6 py-3 border-b flex justify-between items-center';
+        row.style.top = `${index * ROW_HEIGHT}px`;
+        row.style.height = `${ROW_HEIGHT}px`;
+        row.dataset.toolId = tool.id;
+
+        const text = document.createElement('div');
+        text.className = 'min-w-0 mr-4';
+        const name = document.createElement('h6');
+        name.className = 'text-lg font-bold truncate';
+        name.textContent = tool.name;
+        const description = document.createElement('p');
+        description.className = 'text-gray-600 truncate';
+        description.textContent = tool.description || '';
+        text.append(name, description);
+
+        const actions = document.createElement('div');
+        actions.className = 'flex-shrink-0';
+        actions.innerHTML = `
+            <button class="bg-gray-500 hover:bg-gray-700 text-white font-bold py-2 px-4 rounded edit-tool-btn">Edit</button>
+            <button class="bg-red-500 hover:bg-red-700 text-white font-bold py-2 px-4 rounded delete-tool-btn">Delete</button>
+        `;
+
+        row.append(text, actions);
+        return row;
+    };
+
+    const updateCount = () => {
+        const known = total !== null && !prefix ? total : tools.length;
+        toolCount.textContent = nextCursor && (total === null || prefix) ? `(${known}+)` : `(${known})`;
+    };
+
+    // Put exactly the rows in view (plus some overscan) in the DOM
+    const renderWindow = (force = false) => {
+        const rows = total !== null && !prefix ? Math.max(total, tools.length) : tools.length;
+        toolListSpacer.style.height = `${rows * ROW_HEIGHT}px`;
+        updateCount();
+
+        if (tools.length === 0 && !loading) {
+            rendered.forEach(row => row.remove());
+            rendered = new Map();
+            toolListSpacer.innerHTML = '<p class="p-6 text-gray-500">No tools found for this server.</p>';
+            return;
+        }
+        toolListSpacer.innerHTML = '';
+
+        const first = Math.max(0, Math.floor(toolList.scrollTop / ROW_HEIGHT) - OVERSCAN);
+        const last = Math.min(tools.length, Math.ceil((toolList.scrollTop + toolList.clientHeight) / ROW_HEIGHT) + OVERSCAN);
+
+        const next = new Map();
+        for (let index = first; index < last; index++) {
+            let row = rendered.get(index);
+            if (force || !row || row.dataset.toolId !== tools[index].id) {
+                if (row) row.remove();
+                row = buildRow(tools[index], index);
+                toolList.appendChild(row);
+            }
+            next.set(index, row);
+        }
+        rendered.forEach((row, index) => {
+            if (next.get(index) !== row) row.remove();
+        });
+        rendered = next;
+
+        // Fetch the next page before the user reaches the end of what is loaded
+        if (nextCursor && !loading && last + OVERSCAN >= tools.length) {
+            loadPage();
         }
     };
 
-    const loadTools = async () => {
+    const loadPage = async () => {
+        const requested = prefix;
+        loading = fetch(listingUrl(tools.length ? nextCursor : null))
+            .then(response => {
+                if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+                return response.json();
+            });
         try {
-            const response = await fetch(serverInfo.server.url + '/tools');
-            const data = await response.json();
-            renderTools(data.tools);
+            const data = await loading;
+            if (requested !== prefix) return;  // A newer search replaced this listing
+            if (tools.length === 0 && data.total !== null && data.total !== undefined) total = data.total;
+            tools = tools.concat(data.tools);
+            nextCursor = data.next_cursor;
         } catch (error) {
             console.error('Error loading tools:', error);
+            nextCursor = null;
+        } finally {
+            loading = null;
         }
+        renderWindow();
     };
 
+    const reload = () => {
+        tools = [];
+        total = null;
+        nextCursor = null;
+        toolList.scrollTop = 0;
+        rendered.forEach(row => row.remove());
+        rendered = new Map();
+        loadPage();
+    };
+
+    const compareTools = (a, b) => {
+        if (a.name !== b.name) return a.name < b.name ? -1 : 1;
+        return a.id < b.id ? -1 : a.id > b.id ? 1 : 0;
+    };
+
+    const indexOfTool = (toolId) => tools.findIndex(tool => tool.id === toolId);
+
+    // Incremental updates after an edit: only rows in view are rebuilt
+
+    const insertTool = (tool) => {
+        if (prefix && !(tool.name || '').startsWith(prefix)) return;
+        let index = tools.findIndex(existing => compareTools(tool, existing) < 0);
+        if (index === -1) {
+            // Past the loaded range it will arrive with a later page
+            if (nextCursor) {
+                if (total !== null) total += 1;
+                renderWindow();
+                return;
+            }
+            index = tools.length;
+        }
+        tools.splice(index, 0, tool);
+        if (total !== null) total += 1;
+        renderWindow(true);
+    };
+
+    const replaceTool = (tool) => {
+        const index = indexOfTool(tool.id);
+        if (index === -1) return;
+        const moved = (index > 0 && compareTools(tools[index - 1], tool) > 0) ||
+                      (index < tools.length - 1 && compareTools(tool, tools[index + 1]) > 0);
+        if (moved) {
+            // Renamed: take it out and put it back where it now sorts
+            tools.splice(index, 1);
+            if (total !== null) total -= 1;
+            insertTool(tool);
+            return;
+        }
+        tools[index] = tool;
+        const row = rendered.get(index);
+        if (row) {
+            const replacement = buildRow(tool, index);
+            row.replaceWith(replacement);
+            rendered.set(index, replacement);
+        }
+    };
+
+    const removeTool = (toolId) => {
+        const index = indexOfTool(toolId);
+        if (index === -1) return;
+        tools.splice(index, 1);
+        if (total !== null) total -= 1;
+        renderWindow(true);
+    };
+
+    let scheduled = false;
+    toolList.addEventListener('scroll', () => {
+        if (scheduled) return;
+        scheduled = true;
+        requestAnimationFrame(() => {
+            scheduled = false;
+            renderWindow();
+        });
+    });
+
+    let searchTimer = null;
+    toolSearch.addEventListener('input', () => {
+        clearTimeout(searchTimer);
+        searchTimer = setTimeout(() => {
+            prefix = toolSearch.value.trim();
+            reload();
+        }, 250);
+    });
+
     addToolForm.addEventListener('submit', async (e) => {
         e.preventDefault();
         const name = document.getElementById('tool-name').value;
@@ -53,15 +223,18 @@ document.addEventListener('DOMContentLoaded', () => {
         const parameters = JSON.parse(document.getElementById('tool-parameters').value);
         const apiUrl = document.getElementById('tool-api-url').value;
         const httpMethod = document.getElementById('tool-http-method').value;
+        const speculative = document.getElementById('tool-speculative').checked;
+        const answerTemplate = document.getElementById('tool-answer-template').value;
 
         try {
             const response = await fetch(serverInfo.server.url + '/tools', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ name, description, parameters, api_url: apiUrl, http_method: httpMethod })
+                body: JSON.stringify({ name, description, parameters, api_url: apiUrl, http_method: httpMethod, speculative, answer_template: answerTemplate })
             });
             if (response.ok) {
-                loadTools();
+                const data = await response.json();
+                if (data.tool) insertTool(data.tool);
                 addToolForm.reset();
             } else {
                 alert('Failed to add tool.');
@@ -72,13 +245,16 @@ document.addEventListener('DOMContentLoaded', () => {
     });
 
     toolList.addEventListener('click', async (e) => {
+        const row = e.target.closest('[data-tool-id]');
+        if (!row) return;
+        const toolId = row.dataset.toolId;
+
         if (e.target.classList.contains('delete-tool-btn')) {
-            const toolId = e.target.dataset.toolId;
             if (confirm('Are you sure you want to delete this tool?')) {
                 try {
                     const response = await fetch(`${serverInfo.server.url}/tools/${toolId}`, { method: 'DELETE' });
                     if (response.ok) {
-                        loadTools();
+                        removeTool(toolId);
                     } else {
                         alert('Failed to delete tool.');
                     }
@@ -89,13 +265,16 @@ document.addEventListener('DOMContentLoaded', () => {
         }
 
         if (e.target.classList.contains('edit-tool-btn')) {
-            const tool = JSON.parse(e.target.dataset.tool);
+            const tool = tools[indexOfTool(toolId)];
+            if (!tool) return;
             editToolId.value = tool.id;
             editToolName.value = tool.name;
             editToolDescription.value = tool.description;
             editToolParameters.value = JSON.stringify(tool.parameters, null, 2);
             document.getElementById('edit-tool-api-url').value = tool.api_url;
             document.getElementById('edit-tool-http-method').value = tool.http_method;
+            document.getElementById('edit-tool-speculative').checked = Boolean(tool.speculative);
+            document.getElementById('edit-tool-answer-template').value = tool.answer_template || '';
             showModal();
         }
     });
@@ -108,16 +287,19 @@ document.addEventListener('DOMContentLoaded', () => {
         const parameters = JSON.parse(editToolParameters.value);
         const apiUrl = document.getElementById('edit-tool-api-url').value;
         const httpMethod = document.getElementById('edit-tool-http-method').value;
+        const speculative = document.getElementById('edit-tool-speculative').checked;
+        const answerTemplate = document.getElementById('edit-tool-answer-template').value;
 
         try {
             const response = await fetch(`${serverInfo.server.url}/tools/${toolId}`, {
                 method: 'PUT',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ name, description, parameters, api_url: apiUrl, http_method: httpMethod })
+                body: JSON.stringify({ name, description, parameters, api_url: apiUrl, http_method: httpMethod, speculative, answer_template: answerTemplate })
             });
             if (response.ok) {
                 hideModal();
-                loadTools();
+                const tool = await response.json();
+                replaceTool(Object.assign({}, tools[indexOfTool(toolId)], tool, { id: toolId }));
             } else {
                 alert('Failed to update tool.');
             }
@@ -126,6 +308,6 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
 
-    // Initial load of tools
-    renderTools(initialTools);
-});
\ No newline at end of file
+    // Initial load from the frontend's cached listing, after the page has painted
+    loadPage();
+});
@@ -0,0 +1,113 @@
+"""Bytes saved versus CPU spent compressing typical responses at each gzip
+level and brotli quality.
+
+Payloads are a generated /tools catalog (as served by the MCP servers), a
+/servers/{name}/status-style listing and the files under app/web/static:
+
+    python benchmarks/bench_compression.py --tools 500 --iterations 50
+
+The dynamic defaults (GZIP_LEVEL, BROTLI_QUALITY in app/compression.py)
+should sit where the ratio stops improving much while time keeps growing.
+"""
+import argparse
+import gzip
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'app'))
+
+from tool_schema import build_mcp_tool
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_LEVELS = (1, 3, 5, 6, 9)
+BROTLI_QUALITIES = (1, 4, 5, 6, 9, 11)
+
+
+def tool_row(i: int):
+    return {
+        'id': f'tool-{i:07d}',
+        'name': f'tool_{i:07d}',
+        'description': f'Generated tool number {i} that looks up records in an upstream API',
+        'parameters': [
+            {'name': 'location', 'type': 'string', 'description': 'Location parameter', 'required': True},
+            {'name': 'limit', 'type': 'integer', 'description': 'Number of results', 'required': False},
+            {'name': 'query', 'type': 'string', 'description': 'Free text filter', 'required': False}
+        ],
+        'api_url': f'https://api.example.com/v1/resources/{i}',
+        'http_method': 'GET'
+    }
+
+
+def payloads(tools: int):
+    """Name -> bytes of each benchmarked body"""
+    rows = [tool_row(i) for i in range(tools)]
+    result = {
+        f'/tools ({tools} tools)': json.dumps(
+            {'tools': [build_mcp_tool(row, 'server_a') for row in rows]}, separators=(',', ':')
+        ).encode(),
+        f'status ({tools} tools)': json.dumps(
+            {'tools': [dict(row, ready=True) for row in rows]}, separators=(',', ':')
+        ).encode()
+    }
+    static_dir = os.path.join(ROOT, 'app', 'web', 'static')
+    for root, _, files in os.walk(static_dir):
+        for filename in sorted(files):
+            with open(os.path.join(root, filename), 'rb') as f:
+                result[os.path.relpath(os.path.join(root, filename), static_dir)] = f.read()
+    return result
+
+
+def encoders():
+    """(label, compress function) for every level"""
+    result = [(f'gzip-{level}', lambda data, level=level: gzip.compress(data, compresslevel=level, mtime=0))
+              for level in GZIP_LEVELS]
+    if brotli is not None:
+        result += [(f'br-{quality}', lambda data, quality=quality: brotli.compress(data, quality=quality))
+                   for quality in BROTLI_QUALITIES]
+    return result
+
+
+def measure(data: bytes, compress, iterations: int):
+    """Compressed size and median compression time in milliseconds"""
+    timings = []
+    compressed = b''
+    for _ in range(iterations):
+        start = time.perf_counter()
+        compressed = compress(data)
+        timings.append((time.perf_counter() - start) * 1000)
+    return len(compressed), statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tools', type=int, default=500)
+    parser.add_argument('--iterations', type=int, default=50)
+    args = parser.parse_args()
+
+    if brotli is None:
+        print("brotli is not installed; only gzip is measured\n")
+
+    for name, data in payloads(args.tools).items():
+        if not data:
+            continue
+        print(f"=== {name}: {len(data)} bytes")
+        print(f"{'encoding':<10}{'bytes':>10}{'ratio':>8}{'saved':>10}{'ms':>9}{'MB/s':>9}{'KB saved/ms':>13}")
+        for label, compress in encoders():
+            size, ms = measure(data, compress, args.iterations)
+            saved = len(data) - size
+            throughput = len(data) / 1e6 / (ms / 1000) if ms else float('inf')
+            print(f"{label:<10}{size:>10}{size / len(data):>8.3f}{saved:>10}{ms:>9.3f}{throughput:>9.1f}"
+                  f"{saved / 1024 / max(ms, 1e-6):>13.1f}")
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+"""Query plans and timings for the hot config-table queries, before and after
+the 0001 migration, on a generated catalog.
+
+Runs in a scratch schema (dropped afterwards unless --keep) of the database
+in BENCH_DATABASE_URL or DATABASE_URL:
+
+    python benchmarks/bench_schema.py --tools 100000 --servers 50
+"""
+import argparse
+import glob
+import importlib.util
+import io
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+
+import psycopg2
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'app'))
+
+from database import DatabaseManager
+
+SCHEMA = 'bench_schema'
+
+# Tables as created by dump-mcp_config-*.sql
+BASELINE_DDL = """
+CREATE TABLE agents (
+    id uuid DEFAULT gen_random_uuid() NOT NULL PRIMARY KEY,
+    name character varying(255) NOT NULL,
+    description text,
+    created_at timestamp with time zone DEFAULT CURRENT_TIMESTAMP,
+    updated_at timestamp with time zone DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE mcp_servers (
+    id character varying NOT NULL PRIMARY KEY,
+    name character varying,
+    url character varying,
+    status character varying,
+    enabled boolean,
+    created_at timestamp with time zone DEFAULT now(),
+    updated_at timestamp with time zone DEFAULT now()
+);
+CREATE TABLE tools (
+    id character varying NOT NULL PRIMARY KEY,
+    name character varying,
+    description text,
+    parameters json,
+    server_id character varying REFERENCES mcp_servers(id),
+    created_at timestamp with time zone DEFAULT now(),
+    updated_at timestamp with time zone DEFAULT now(),
+    api_url text,
+    http_method text DEFAULT 'GET'::text,
+    request_headers json,
+    request_body json
+);
+CREATE TABLE agent_mcp_servers (
+    agent_id uuid NOT NULL REFERENCES agents(id) ON DELETE CASCADE,
+    server_id character varying(255) NOT NULL REFERENCES mcp_servers(id) ON DELETE CASCADE,
+    PRIMARY KEY (agent_id, server_id)
+);
+CREATE INDEX ix_mcp_servers_id ON mcp_servers USING btree (id);
+CREATE INDEX ix_mcp_servers_name ON mcp_servers USING btree (name);
+CREATE INDEX ix_tools_id ON tools USING btree (id);
+CREATE INDEX ix_tools_name ON tools USING btree (name);
+"""
+
+PARAMETERS = json.dumps([
+    {"name": "location", "type": "string", "description": "Location parameter", "required": True},
+    {"name": "limit", "type": "integer", "description": "Number of results", "required": False}
+])
+
+
+def load_migration(revision: str):
+    """Import a migration module by revision prefix"""
+    path = glob.glob(os.path.join(ROOT, 'migrations', 'versions', f'{revision}_*.py'))[0]
+    spec = importlib.util.spec_from_file_location(f'migration_{revision}', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def seed(cursor, tools: int, servers: int, agents: int):
+    """Generate servers, agents and tools with COPY"""
+    server_ids = [f'server-{i:04d}' for i in range(servers)]
+    buffer = io.StringIO()
+    for i, server_id in enumerate(server_ids):
+        buffer.write(f'{server_id}\tServer {i}\thttp://10.0.{i // 250}.{i % 250}:3001\tconnected\tt\n')
+    buffer.seek(0)
+    cursor.copy_expert('COPY mcp_servers (id, name, url, status, enabled) FROM STDIN', buffer)
+
+    agent_ids = [str(uuid.uuid4()) for _ in range(agents)]
+    buffer = io.StringIO()
+    for i, agent_id in enumerate(agent_ids):
+        buffer.write(f'{agent_id}\tAgent {i}\tGenerated agent\n')
+    buffer.seek(0)
+    cursor.copy_expert('COPY agents (id, name, description) FROM STDIN', buffer)
+
+    buffer = io.StringIO()
+    for i, agent_id in enumerate(agent_ids):
+        for j in range(3):
+            buffer.write(f'{agent_id}\t{server_ids[(i * 3 + j) % servers]}\n')
+    buffer.seek(0)
+    cursor.copy_expert('COPY agent_mcp_servers (agent_id, server_id) FROM STDIN', buffer)
+
+    buffer = io.StringIO()
+    for i in range(tools):
+        server_id = server_ids[i % servers]
+        buffer.write(f'tool-{i:07d}\ttool_{i:07d}\tGenerated tool number {i}\t{PARAMETERS}\t{server_id}\t\\N\tGET\n')
+    buffer.seek(0)
+    cursor.copy_expert(
+        'COPY tools (id, name, description, parameters, server_id, api_url, http_method) FROM STDIN', buffer
+    )
+    cursor.execute('ANALYZE')
+    return server_ids, agent_ids
+
+
+def hot_queries(server_ids, agent_ids, tools: int, servers: int):
+    """The queries DatabaseManager runs on every request, with realistic parameters"""
+    last_tool = tools - 1
+    return {
+        'get_tool_by_name': (
+            'SELECT * FROM tools WHERE server_id = %s AND name = %s',
+            [server_ids[last_tool % servers], f'tool_{last_tool:07d}']
+        ),
+        'get_tools_by_server': (
+            'SELECT * FROM tools WHERE server_id = %s ORDER BY name',
+            [server_ids[0]]
+        ),
+        'get_servers_for_agent': (
+            '''SELECT s.* FROM mcp_servers s
+               JOIN agent_mcp_servers ams ON s.id = ams.server_id
+               WHERE ams.agent_id = %s''',
+            [agent_ids[-1]]
+        ),
+        'get_server_by_url': (
+            'SELECT * FROM mcp_servers WHERE url = %s',
+            ['http://10.0.0.1:3001']
+        ),
+    }
+
+
+def measure(cursor, queries, iterations: int):
+    """EXPLAIN (ANALYZE, BUFFERS) once, then time repeated executions"""
+    results = {}
+    for name, (sql, params) in queries.items():
+        cursor.execute('EXPLAIN (ANALYZE, BUFFERS) ' + sql, params)
+        plan = '\n'.join(row[0] for row in cursor.fetchall())
+
+        timings = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            cursor.execute(sql, params)
+            cursor.fetchall()
+            timings.append((time.perf_counter() - start) * 1000)
+
+        results[name] = {
+            'plan': plan,
+            'median_ms': statistics.median(timings),
+            'p95_ms': sorted(timings)[int(len(timings) * 0.95) - 1]
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tools', type=int, default=100000)
+    parser.add_argument('--servers', type=int, default=50)
+    parser.add_argument('--agents', type=int, default=1000)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--keep', action='store_true', help='keep the scratch schema')
+    args = parser.parse_args()
+
+    if os.getenv('BENCH_DATABASE_URL'):
+        os.environ['DATABASE_URL'] = os.environ['BENCH_DATABASE_URL']
+    conn = psycopg2.connect(**DatabaseManager().connection_params)
+    conn.autocommit = True
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE')
+        cursor.execute(f'CREATE SCHEMA {SCHEMA}')
+        cursor.execute(f'SET search_path TO {SCHEMA}, public')
+        cursor.execute(BASELINE_DDL)
+
+        start = time.perf_counter()
+        server_ids, agent_ids = seed(cursor, args.tools, args.servers, args.agents)
+        print(f"Seeded {args.tools} tools, {args.servers} servers, {args.agents} agents "
+              f"in {time.perf_counter() - start:.1f}s\n")
+
+        queries = hot_queries(server_ids, agent_ids, args.tools, args.servers)
+        before = measure(cursor, queries, args.iterations)
+
+        start = time.perf_counter()
+        for statement in load_migration('0001').UPGRADE_STATEMENTS:
+            cursor.execute(statement)
+        cursor.execute('ANALYZE')
+        print(f"Applied migration 0001 in {time.perf_counter() - start:.1f}s\n")
+
+        after = measure(cursor, queries, args.iterations)
+
+        for name in queries:
+            print(f"=== {name}")
+            print(f"--- before: median {before[name]['median_ms']:.3f}ms, p95 {before[name]['p95_ms']:.3f}ms")
+            print(before[name]['plan'])
+            print(f"--- after: median {after[name]['median_ms']:.3f}ms, p95 {after[name]['p95_ms']:.3f}ms")
+            print(after[name]['plan'])
+            print()
+
+        print(f"{'query':<24}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+        for name in queries:
+            speedup = before[name]['median_ms'] / max(after[name]['median_ms'], 1e-6)
+            print(f"{name:<24}{before[name]['median_ms']:>12.3f}{after[name]['median_ms']:>12.3f}{speedup:>9.1f}x")
+    finally:
+        if not args.keep:
+            cursor.execute(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE')
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
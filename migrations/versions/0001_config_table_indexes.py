@@ -0,0 +1,64 @@
+"""Indexes, constraints and jsonb for the config tables
+
+Applies on top of the schema in dump-mcp_config-*.sql.
+
+- tools(server_id, name) gets a unique constraint; its index serves
+  get_tool_by_name and get_tools_by_server (including ORDER BY name).
+  The upgrade fails if a server already has two tools with the same name;
+  remove the duplicates first.
+- agent_mcp_servers is already indexed on agent_id through its primary key
+  (agent_id, server_id), which is what get_servers_for_agent uses. The
+  missing index is on server_id, needed by the ON DELETE CASCADE from
+  mcp_servers and by lookups of the agents using a server.
+- mcp_servers(url) is indexed for get_server_by_url.
+- ix_tools_id and ix_mcp_servers_id duplicate the primary key indexes and
+  only cost writes, so they are dropped.
+- tools.parameters, request_headers and request_body become jsonb.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# Kept as plain statements so benchmarks/bench_schema.py can apply exactly
+# the same changes to its scratch schema
+UPGRADE_STATEMENTS = [
+    'CREATE UNIQUE INDEX ix_tools_server_id_name ON tools (server_id, name)',
+    'ALTER TABLE tools ADD CONSTRAINT uq_tools_server_id_name UNIQUE USING INDEX ix_tools_server_id_name',
+    'CREATE INDEX ix_agent_mcp_servers_server_id ON agent_mcp_servers (server_id)',
+    'CREATE INDEX ix_mcp_servers_url ON mcp_servers (url)',
+    'DROP INDEX IF EXISTS ix_tools_id',
+    'DROP INDEX IF EXISTS ix_mcp_servers_id',
+    'ALTER TABLE tools ALTER COLUMN parameters TYPE jsonb USING parameters::jsonb',
+    'ALTER TABLE tools ALTER COLUMN request_headers TYPE jsonb USING request_headers::jsonb',
+    'ALTER TABLE tools ALTER COLUMN request_body TYPE jsonb USING request_body::jsonb',
+]
+
+DOWNGRADE_STATEMENTS = [
+    'ALTER TABLE tools ALTER COLUMN request_body TYPE json USING request_body::json',
+    'ALTER TABLE tools ALTER COLUMN request_headers TYPE json USING request_headers::json',
+    'ALTER TABLE tools ALTER COLUMN parameters TYPE json USING parameters::json',
+    'CREATE INDEX ix_mcp_servers_id ON mcp_servers (id)',
+    'CREATE INDEX ix_tools_id ON tools (id)',
+    'DROP INDEX IF EXISTS ix_mcp_servers_url',
+    'DROP INDEX IF EXISTS ix_agent_mcp_servers_server_id',
+    'ALTER TABLE tools DROP CONSTRAINT IF EXISTS uq_tools_server_id_name',
+]
+
+
+def upgrade():
+    for statement in UPGRADE_STATEMENTS:
+        op.execute(statement)
+
+
+def downgrade():
+    for statement in DOWNGRADE_STATEMENTS:
+        op.execute(statement)
@@ -0,0 +1,47 @@
+"""Indexes for keyset-paginated listings
+
+Listings page through agents, servers and tools ordered by (name, id) and
+filter by name prefix (DatabaseManager.list_page).
+
+- agents has no name index; (name, id) serves both the ordering and the
+  keyset condition.
+- Prefix filters use LIKE 'prefix%', which can only use a btree index built
+  with the pattern operator class unless the database uses the C collation.
+  tools gets (server_id, name) so prefix searches stay within one server.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+UPGRADE_STATEMENTS = [
+    'CREATE INDEX ix_agents_name_id ON agents (name, id)',
+    'CREATE INDEX ix_agents_name_pattern ON agents (name varchar_pattern_ops)',
+    'CREATE INDEX ix_mcp_servers_name_pattern ON mcp_servers (name varchar_pattern_ops)',
+    'CREATE INDEX ix_tools_server_id_name_pattern ON tools (server_id, name varchar_pattern_ops)',
+]
+
+DOWNGRADE_STATEMENTS = [
+    'DROP INDEX IF EXISTS ix_tools_server_id_name_pattern',
+    'DROP INDEX IF EXISTS ix_mcp_servers_name_pattern',
+    'DROP INDEX IF EXISTS ix_agents_name_pattern',
+    'DROP INDEX IF EXISTS ix_agents_name_id',
+]
+
+
+def upgrade():
+    for statement in UPGRADE_STATEMENTS:
+        op.execute(statement)
+
+
+def downgrade():
+    for statement in DOWNGRADE_STATEMENTS:
+        op.execute(statement)
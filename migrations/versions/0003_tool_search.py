@@ -0,0 +1,51 @@
+"""Full-text and trigram indexes for tool search
+
+DatabaseManager.search_tools matches query words as prefixes of the words
+in a tool's name and description, and tool names similar to the query (for
+typos), ranking by both.
+
+- search_vector is a stored generated column with name words weighted
+  above description words. It uses the 'simple' configuration, so words
+  are not stemmed and prefix matching behaves the same as in the
+  in-process index (tool_search.py).
+- The trigram index serves both similarity (name % query) and
+  ILIKE '%...%' on tool names.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+UPGRADE_STATEMENTS = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    """ALTER TABLE tools ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+           setweight(to_tsvector('simple', coalesce(name, '')), 'A')
+           || setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+       ) STORED""",
+    'CREATE INDEX ix_tools_search_vector ON tools USING gin (search_vector)',
+    'CREATE INDEX ix_tools_name_trgm ON tools USING gin (name gin_trgm_ops)',
+]
+
+DOWNGRADE_STATEMENTS = [
+    'DROP INDEX IF EXISTS ix_tools_name_trgm',
+    'DROP INDEX IF EXISTS ix_tools_search_vector',
+    'ALTER TABLE tools DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def upgrade():
+    for statement in UPGRADE_STATEMENTS:
+        op.execute(statement)
+
+
+def downgrade():
+    for statement in DOWNGRADE_STATEMENTS:
+        op.execute(statement)
@@ -0,0 +1,45 @@
+"""Table for conversations spilled from memory
+
+With CONVERSATION_SPILL=postgres, conversations evicted from a process's
+in-memory store (conversations.py) are written here, so a later question in
+the same conversation can resume it from any process.
+
+- data holds the running summary and the recent turns as JSON.
+- The updated_at index serves the periodic expiry of idle conversations.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+UPGRADE_STATEMENTS = [
+    """CREATE TABLE conversations (
+           id varchar(64) PRIMARY KEY,
+           agent_id varchar(64) NOT NULL,
+           data jsonb NOT NULL,
+           updated_at timestamptz NOT NULL DEFAULT now()
+       )""",
+    'CREATE INDEX ix_conversations_updated_at ON conversations (updated_at)',
+]
+
+DOWNGRADE_STATEMENTS = [
+    'DROP TABLE IF EXISTS conversations',
+]
+
+
+def upgrade():
+    for statement in UPGRADE_STATEMENTS:
+        op.execute(statement)
+
+
+def downgrade():
+    for statement in DOWNGRADE_STATEMENTS:
+        op.execute(statement)
@@ -0,0 +1,36 @@
+"""Per-tool opt-in for speculative execution
+
+The frontend may start a tool marked speculative while Gemini is still
+choosing tools, and throw the result away if it chooses differently, so only
+cheap, idempotent tools should be marked (frontend_api.speculative_candidates).
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+UPGRADE_STATEMENTS = [
+    'ALTER TABLE tools ADD COLUMN speculative boolean NOT NULL DEFAULT false',
+]
+
+DOWNGRADE_STATEMENTS = [
+    'ALTER TABLE tools DROP COLUMN IF EXISTS speculative',
+]
+
+
+def upgrade():
+    for statement in UPGRADE_STATEMENTS:
+        op.execute(statement)
+
+
+def downgrade():
+    for statement in DOWNGRADE_STATEMENTS:
+        op.execute(statement)
@@ -0,0 +1,36 @@
+"""Per-tool answer templates
+
+A tool's answer_template is a Jinja template rendered (sandboxed) from the
+tool's result to answer a question directly, instead of asking Gemini to
+summarise the result (answer_templates.py). NULL means no template.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+UPGRADE_STATEMENTS = [
+    'ALTER TABLE tools ADD COLUMN answer_template text',
+]
+
+DOWNGRADE_STATEMENTS = [
+    'ALTER TABLE tools DROP COLUMN IF EXISTS answer_template',
+]
+
+
+def upgrade():
+    for statement in UPGRADE_STATEMENTS:
+        op.execute(statement)
+
+
+def downgrade():
+    for statement in DOWNGRADE_STATEMENTS:
+        op.execute(statement)
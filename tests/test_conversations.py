@@ -0,0 +1,25 @@
+from conversations import ConversationStore
+
+
+def test_other_agents_conversation_id_starts_a_separate_conversation():
+    store = ConversationStore()
+    original = store.for_agent('shared', 'agent-a', store.cached('shared'))
+    store.record(original, 'What is the weather?', 'Sunny.')
+
+    other = store.for_agent('shared', 'agent-b', store.cached('shared'))
+    assert other.id != 'shared'
+    assert other.agent_id == 'agent-b'
+    assert other.turns == []
+
+    kept = store.cached('shared')
+    assert kept is original
+    assert kept.agent_id == 'agent-a'
+    assert len(kept.turns) == 1
+    assert store.snapshot()['agent_mismatches'] == 1
+
+
+def test_same_agent_continues_its_conversation():
+    store = ConversationStore()
+    conversation = store.for_agent('c1', 'agent-a', None)
+    assert conversation.id == 'c1'
+    assert store.for_agent('c1', 'agent-a', store.cached('c1')) is conversation
@@ -0,0 +1,71 @@
+import json
+
+from tool_bulk import copy_line, validate_tool
+from tool_schema import build_mcp_tool
+
+SERVERS = {'server_a': 'a0000000-0000-0000-0000-000000000001'}
+
+
+def test_minimal_parameter_round_trips_to_mcp_tool():
+    row = {'name': 'lookup', 'server_name': 'server_a', 'parameters': '[{"name": "q", "type": "string"}]'}
+    tool, errors = validate_tool(row, SERVERS, None)
+    assert errors == []
+    assert tool['parameters'] == [{'name': 'q', 'type': 'string', 'description': '', 'required': False}]
+
+    mcp_tool = build_mcp_tool(tool, 'server_a')
+    assert mcp_tool['inputSchema']['properties']['q'] == {'type': 'string', 'description': ''}
+    assert mcp_tool['inputSchema']['required'] == ['operation']
+
+
+def test_required_parameter_is_required_in_schema():
+    row = {'name': 'lookup', 'server_name': 'server_a',
+           'parameters': [{'name': 'q', 'type': 'string', 'description': 'Query', 'required': True}]}
+    tool, errors = validate_tool(row, SERVERS, None)
+    assert errors == []
+    assert build_mcp_tool(tool, 'server_a')['inputSchema']['required'] == ['operation', 'q']
+
+
+def test_parameter_without_type_is_rejected():
+    tool, errors = validate_tool({'name': 'lookup', 'server_name': 'server_a', 'parameters': '[{"name": "q"}]'},
+                                 SERVERS, None)
+    assert tool is None
+    assert any("parameter 'q' type" in error for error in errors)
+
+
+def test_malformed_parameter_fields_are_rejected():
+    parameters = [{'name': 'q', 'type': 'text', 'description': 3, 'required': 'yes'}]
+    tool, errors = validate_tool({'name': 'lookup', 'server_name': 'server_a', 'parameters': json.dumps(parameters)},
+                                 SERVERS, None)
+    assert tool is None
+    assert len(errors) == 3
+
+
+def test_http_method_must_be_supported_by_the_executors():
+    tool, errors = validate_tool({'name': 'lookup', 'server_name': 'server_a', 'http_method': 'delete'},
+                                 SERVERS, None)
+    assert tool is None
+    assert errors == ["http_method must be one of GET, POST"]
+
+
+def test_answer_template_is_validated_and_kept():
+    tool, errors = validate_tool({'name': 'lookup', 'server_name': 'server_a', 'answer_template': '{{ q }} found'},
+                                 SERVERS, None)
+    assert errors == []
+    assert tool['answer_template'] == '{{ q }} found'
+
+    tool, errors = validate_tool({'name': 'lookup', 'server_name': 'server_a', 'answer_template': '{% if %}'},
+                                 SERVERS, None)
+    assert tool is None
+    assert errors[0].startswith("Invalid answer template")
+
+
+def test_speculative_flag_survives_csv_text_and_copy():
+    tool, errors = validate_tool({'name': 'lookup', 'server_name': 'server_a', 'speculative': 'True'}, SERVERS, None)
+    assert errors == []
+    assert tool['speculative'] is True
+    assert '\ttrue\t' in copy_line(tool)
+
+    tool, errors = validate_tool({'name': 'lookup', 'server_name': 'server_a', 'speculative': 'sometimes'},
+                                 SERVERS, None)
+    assert tool is None
+    assert errors == ["speculative must be true or false"]
@@ -0,0 +1,11 @@
+from tool_search import ToolSearchIndex, prefix_tsquery
+
+
+def test_database_query_matches_any_word_like_the_index():
+    assert prefix_tsquery('get Weather forecast') == 'get:* | weather:* | forecast:*'
+
+    index = ToolSearchIndex()
+    index.add({'id': '1', 'name': 'get_weather', 'description': 'Current weather', 'server_id': 's'})
+    index.add({'id': '2', 'name': 'get_time', 'description': 'Current time', 'server_id': 's'})
+    results = index.search('weather forecast')
+    assert [tool['id'] for tool in results] == ['1']